@@ -0,0 +1,492 @@
+from __future__ import annotations
+
+import asyncio
+import re
+from typing import TYPE_CHECKING, Any
+
+import kurrentdbclient.exceptions
+from eventsourcing.persistence import (
+    IntegrityError,
+    Notification,
+    PersistenceError,
+    ProgrammingError,
+    StoredEvent,
+)
+from kurrentdbclient import (
+    AsyncKurrentDBClient,
+    NewEvent,
+)
+
+from eventsourcing_kurrentdb.notifications import NotificationBatch
+from eventsourcing_kurrentdb.recorders import (
+    BadlyFormedUUIDStringError,
+    KurrentDBRecorder,
+    StreamTail,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Sequence
+    from uuid import UUID
+
+    from kurrentdbclient import RecordedEvent
+    from kurrentdbclient.common import AbstractAsyncCatchupSubscription
+    from typing_extensions import Self
+
+
+class AsyncKurrentDBAggregateRecorder(KurrentDBRecorder):
+    """
+    Aggregate recorder that uses the asyncio KurrentDB client, so that
+    events can be stored and retrieved without blocking an event loop.
+    """
+
+    def __init__(
+        self,
+        client: AsyncKurrentDBClient,
+        *args: Any,
+        for_snapshotting: bool = False,
+        read_page_size: int = 1000,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, for_snapshotting=for_snapshotting, **kwargs)
+        self.client = client
+        self.read_page_size = read_page_size
+
+    async def insert_events(
+        self, stored_events: Sequence[StoredEvent], **kwargs: Any
+    ) -> Sequence[int] | None:
+        await self._insert_events(stored_events, **kwargs)
+        return None
+
+    async def _insert_events(
+        self, stored_events: Sequence[StoredEvent], **kwargs: Any
+    ) -> Sequence[int] | None:
+        if self.for_snapshotting:
+            assert len(stored_events) == 1, len(stored_events)
+            return await self._insert_snapshot(stored_events[0])
+
+        streams = self._group_stored_events(stored_events)
+        if len(streams) == 0:
+            return []
+        if len(streams) == 1:
+            return await self._append_to_stream(stored_events)
+        return await self._append_to_streams(stored_events, streams)
+
+    async def _insert_snapshot(self, stored_event: StoredEvent) -> list[int]:
+        # See KurrentDBAggregateRecorder._insert_snapshot().
+        stream_name = self._get_stream_name(stored_event.originator_id)
+        while True:
+            last_snapshot = self._snapshot_cache.get(stream_name)
+            if last_snapshot is None:
+                last_snapshot = await self._read_last_snapshot(stream_name)
+            if self._is_older_than(stored_event, last_snapshot):
+                return []
+            current_version, next_position = self._get_snapshot_positions(last_snapshot)
+            try:
+                commit_position = await self.client.append_events(
+                    stream_name=stream_name,
+                    current_version=current_version,
+                    events=self._construct_new_events([stored_event]),
+                    timeout=self.deadlines.append,
+                )
+            except kurrentdbclient.exceptions.WrongCurrentVersionError:
+                self._snapshot_cache.pop(stream_name)
+                continue
+            except Exception as e:
+                raise PersistenceError(e) from e
+            self._snapshot_cache.put(
+                stream_name, (next_position, stored_event.originator_version)
+            )
+            return [commit_position]
+
+    async def _read_last_snapshot(self, stream_name: str) -> tuple[int, int] | None:
+        try:
+            recorded_events = await self.client.read_stream(
+                stream_name=stream_name,
+                backwards=True,
+                limit=1,
+                timeout=self.deadlines.read_stream,
+            )
+            async for ev in recorded_events:
+                return self._cache_last_snapshot(ev)
+        except kurrentdbclient.exceptions.NotFoundError:
+            pass
+        return None
+
+    async def _append_to_stream(
+        self, stored_events: Sequence[StoredEvent]
+    ) -> list[int]:
+        new_events = self._construct_new_events(stored_events)
+        try:
+            commit_position = await self.client.append_events(
+                stream_name=self._get_stream_name(stored_events[0].originator_id),
+                current_version=self._get_current_version(stored_events),
+                events=new_events,
+                timeout=self.deadlines.append,
+            )
+        except kurrentdbclient.exceptions.WrongCurrentVersionError as e:
+            raise IntegrityError(e) from e
+        except Exception as e:
+            raise PersistenceError(e) from e
+        return await self._get_commit_positions(new_events, commit_position)
+
+    async def _get_commit_positions(
+        self, new_events: Sequence[NewEvent], commit_position: int
+    ) -> list[int]:
+        # See KurrentDBAggregateRecorder._get_commit_positions().
+        if len(new_events) == 1:
+            return [commit_position]
+        try:
+            recorded_events = await self.client.read_all(
+                commit_position=commit_position,
+                backwards=True,
+                filter_exclude=(),
+                limit=len(new_events) - 1,
+                timeout=self.deadlines.read_all,
+            )
+            commit_positions = self._match_commit_positions(
+                new_events[:-1], [e async for e in recorded_events]
+            )
+        except kurrentdbclient.exceptions.KurrentDBClientError:
+            # The events were recorded, so don't raise an error.
+            commit_positions = None
+        if commit_positions is None:
+            return [commit_position] * len(new_events)
+        return [*commit_positions, commit_position]
+
+    async def _append_to_streams(
+        self,
+        stored_events: Sequence[StoredEvent],
+        streams: dict[UUID | str, list[StoredEvent]],
+    ) -> list[int]:
+        if self._is_multi_stream_append_supported:
+            multi_stream_events = self._construct_multi_stream_events(streams)
+            try:
+                commit_position = await self.client.multi_append_to_stream(
+                    multi_stream_events, timeout=self.deadlines.append
+                )
+            except kurrentdbclient.exceptions.WrongCurrentVersionError as e:
+                raise IntegrityError(e) from e
+            except kurrentdbclient.exceptions.GrpcError as e:
+                if not self._is_unimplemented_error(e):
+                    raise PersistenceError(e) from e
+                # Server doesn't support multi-stream appends, so fall back.
+                self._is_multi_stream_append_supported = False
+            except Exception as e:
+                raise PersistenceError(e) from e
+            else:
+                commit_positions = await self._get_commit_positions(
+                    [e for m in multi_stream_events for e in m.events],
+                    commit_position,
+                )
+                return self._map_commit_positions(
+                    stored_events, streams, commit_positions
+                )
+
+        # Not atomic: some streams may be appended when others fail.
+        results = await asyncio.gather(
+            *(self._append_to_stream(e) for e in streams.values()),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            # Prefer to raise an IntegrityError, if there was a conflict.
+            errors.sort(key=lambda e: not isinstance(e, IntegrityError))
+            raise errors[0]
+        return self._map_commit_positions(
+            stored_events,
+            streams,
+            [p for r in results if not isinstance(r, BaseException) for p in r],
+        )
+
+    async def select_events(
+        self,
+        originator_id: UUID | str,
+        *,
+        gt: int | None = None,
+        lte: int | None = None,
+        desc: bool = False,
+        limit: int | None = None,
+    ) -> list[StoredEvent]:
+        self.last_round_trips = 0
+        plan = self._plan_stream_read(
+            originator_id, gt=gt, lte=lte, desc=desc, limit=limit
+        )
+        if plan is None:
+            return []
+        self.last_round_trips += 1
+        stored_events: list[StoredEvent] = []
+        try:
+            async with await self.client.read_stream(
+                stream_name=plan.stream_name,
+                stream_position=plan.position,
+                backwards=plan.backwards,
+                limit=plan.limit,
+                timeout=self.deadlines.read_stream,
+            ) as recorded_events:
+                async for ev in recorded_events:
+                    stored_event = self._construct_selected_event(
+                        originator_id, ev, plan, is_first=not stored_events
+                    )
+                    if stored_event is None:
+                        break
+                    stored_events.append(stored_event)
+        except kurrentdbclient.exceptions.NotFoundError:
+            return []
+        return stored_events
+
+    async def iter_events(
+        self,
+        originator_id: UUID | str,
+        *,
+        gt: int | None = None,
+        lte: int | None = None,
+        desc: bool = False,
+        limit: int | None = None,
+        page_size: int | None = None,
+    ) -> AsyncIterator[StoredEvent]:
+        """
+        Like select_events(), but yields the stored events whilst the stream
+        is read in pages (see KurrentDBAggregateRecorder).
+        """
+        page_size = page_size or self.read_page_size
+        plan = self._plan_stream_read(
+            originator_id, gt=gt, lte=lte, desc=desc, limit=limit
+        )
+        is_first = True
+        while plan is not None:
+            num_read = 0
+            last_event = None
+            try:
+                async with await self.client.read_stream(
+                    stream_name=plan.stream_name,
+                    stream_position=plan.position,
+                    backwards=plan.backwards,
+                    limit=min(page_size, plan.limit),
+                    timeout=self.deadlines.read_stream,
+                ) as recorded_events:
+                    async for last_event in recorded_events:
+                        num_read += 1
+                        stored_event = self._construct_selected_event(
+                            originator_id, last_event, plan, is_first=is_first
+                        )
+                        if stored_event is None:
+                            return
+                        is_first = False
+                        yield stored_event
+            except kurrentdbclient.exceptions.NotFoundError:
+                return
+            if last_event is None or num_read < min(page_size, plan.limit):
+                return
+            plan = self._next_page_plan(plan, num_read, last_event)
+
+    async def select_events_after(
+        self,
+        originator_id: UUID | str,
+        version: int | None,
+        *,
+        page_size: int = 10,
+    ) -> StreamTail:
+        """
+        Returns the events after 'version' (all events if None), and the current
+        version of the stream (see KurrentDBAggregateRecorder).
+        """
+        if self.for_snapshotting:
+            msg = "Can't select events after a version from snapshot streams"
+            raise ProgrammingError(msg)
+        stream_name = self.stream_naming.stream_name(originator_id)
+        first_position = 0 if version is None else version + 1
+        self.last_round_trips = 1
+        try:
+            recorded_events = await self.client.read_stream(
+                stream_name=stream_name,
+                stream_position=first_position,
+                limit=page_size,
+                timeout=self.deadlines.read_stream,
+            )
+            tail = [ev async for ev in recorded_events]
+            if len(tail) == page_size:
+                # Read the other new events.
+                self.last_round_trips += 1
+                recorded_events = await self.client.read_stream(
+                    stream_name=stream_name,
+                    stream_position=tail[-1].stream_position + 1,
+                    timeout=self.deadlines.read_stream,
+                )
+                tail += [ev async for ev in recorded_events]
+        except kurrentdbclient.exceptions.NotFoundError:
+            return StreamTail(events=[], current_version=None)
+        return StreamTail(
+            events=[
+                StoredEvent(
+                    originator_id=originator_id,
+                    originator_version=ev.stream_position,
+                    topic=ev.type,
+                    state=ev.data,
+                )
+                for ev in tail
+            ],
+            current_version=tail[-1].stream_position if tail else version,
+        )
+
+
+class AsyncKurrentDBApplicationRecorder(AsyncKurrentDBAggregateRecorder):
+    """
+    Application recorder that uses the asyncio KurrentDB client.
+    """
+
+    async def insert_events(
+        self, stored_events: Sequence[StoredEvent], **kwargs: Any
+    ) -> Sequence[int] | None:
+        return await self._insert_events(stored_events, **kwargs)
+
+    async def select_notifications(
+        self,
+        start: int | None,
+        limit: int,
+        stop: int | None = None,
+        topics: Sequence[str] = (),
+        *,
+        inclusive_of_start: bool = True,
+    ) -> Sequence[Notification]:
+        original_limit = limit
+        if not inclusive_of_start:
+            limit += 1
+        recorded_events = self._read_all_notified_events(
+            commit_position=start, limit=limit, topics=topics
+        )
+
+        notifications = NotificationBatch(self._get_originator_id)
+        async for recorded_event in recorded_events:
+            # Maybe drop first event.
+            if (
+                not inclusive_of_start
+                and isinstance(start, int)
+                and recorded_event.commit_position == start
+            ):
+                continue
+
+            # Notification objects are constructed when they are accessed.
+            assert isinstance(recorded_event.commit_position, int)
+            notifications.append(recorded_event)
+
+            # Check we aren't going over the limit, in case we didn't drop the first.
+            if len(notifications) == original_limit:
+                break
+
+            # Stop if we reached the 'stop' position.
+            if stop is not None and recorded_event.commit_position >= stop:
+                break
+
+        return notifications
+
+    async def _read_all_notified_events(
+        self, *, commit_position: int | None, limit: int, topics: Sequence[str]
+    ) -> AsyncIterator[RecordedEvent]:
+        # See KurrentDBApplicationRecorder._read_all_notified_events().
+        options = self.notification_filter.options([re.escape(t) for t in topics])
+        last_position: int | None = None
+        while True:
+            num_read = 0
+            async for recorded_event in await self.client.read_all(
+                commit_position=commit_position,
+                **options,
+                limit=limit,
+                timeout=self.deadlines.read_all,
+            ):
+                num_read += 1
+                if last_position is not None and (
+                    recorded_event.commit_position <= last_position
+                ):
+                    continue
+                if not self.notification_filter.excludes(recorded_event):
+                    yield recorded_event
+            if num_read < limit:
+                return
+            # The next page starts with the last event of this page.
+            last_position = commit_position = recorded_event.commit_position
+
+    async def max_notification_id(self) -> int | None:
+        return await self.client.get_commit_position(
+            **self.notification_filter.options(regex=True),
+            timeout=self.deadlines.commit_position,
+        )
+
+    def subscribe(
+        self, gt: int | None = None, topics: Sequence[str] = ()
+    ) -> AsyncKurrentDBSubscription:
+        return AsyncKurrentDBSubscription(recorder=self, gt=gt, topics=topics)
+
+
+class AsyncKurrentDBSubscription:
+    """
+    Asynchronous iterator of notifications from an asyncio catch-up
+    subscription. The catch-up subscription is started when the iterator
+    is entered as an asynchronous context manager, or on the first
+    iteration.
+    """
+
+    def __init__(
+        self,
+        recorder: AsyncKurrentDBApplicationRecorder,
+        gt: int | None = None,
+        topics: Sequence[str] = (),
+    ):
+        self._recorder = recorder
+        self._last_notification_id = gt
+        self._topics = topics
+        self._has_been_stopped = False
+        self._esdb_subscription: AbstractAsyncCatchupSubscription | None = None
+
+    async def __aenter__(self) -> Self:
+        await self._start()
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.stop()
+
+    def __aiter__(self) -> Self:
+        return self
+
+    async def __anext__(self) -> Notification:
+        while not self._has_been_stopped:
+            try:
+                notification = await self._next_notification()
+                if notification is None:
+                    continue
+            except BadlyFormedUUIDStringError:
+                # See KurrentDBSubscription.__next__().
+                continue
+            except StopAsyncIteration:
+                break
+            else:
+                return notification
+
+        raise StopAsyncIteration
+
+    async def _start(self) -> AbstractAsyncCatchupSubscription:
+        if self._esdb_subscription is None:
+            self._esdb_subscription = await self._recorder.client.subscribe_to_all(
+                commit_position=self._last_notification_id,
+                **self._recorder.notification_filter.options(self._topics),
+            )
+        return self._esdb_subscription
+
+    async def _next_notification(self) -> Notification | None:
+        esdb_subscription = await self._start()
+        try:
+            recorded_event = await esdb_subscription.__anext__()
+        except kurrentdbclient.exceptions.ConsumerTooSlowError:  # pragma: no cover
+            # Sometimes the database drops the connection just after starting.
+            self._esdb_subscription = None
+            return None
+        else:
+            if self._recorder.notification_filter.excludes(recorded_event):
+                return None
+            notification = self._recorder.construct_notification(recorded_event)
+            self._last_notification_id = notification.id
+            return notification
+
+    async def stop(self) -> None:
+        self._has_been_stopped = True
+        if self._esdb_subscription is not None:
+            await self._esdb_subscription.stop()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from eventsourcing.persistence import ProgrammingError
+from kurrentdbclient import KurrentDBClient
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+@dataclass(frozen=True)
+class KurrentDBClientPoolStats:
+    num_clients: int
+    """Number of live clients (gRPC channels) in the pool."""
+    num_references: int
+    """Number of references to the live clients that have not been put back."""
+
+
+class KurrentDBClientPool:
+    """
+    Shares KurrentDBClient objects (and so gRPC channels) between users
+    of the same connection settings. Clients are reference counted, and
+    each client is closed when its last reference is put back in the pool.
+    """
+
+    def __init__(
+        self, client_class: Callable[..., KurrentDBClient] = KurrentDBClient
+    ) -> None:
+        self._client_class = client_class
+        self._lock = Lock()
+        self._clients: dict[tuple[str, str | None], KurrentDBClient] = {}
+        self._keys: dict[int, tuple[str, str | None]] = {}
+        self._ref_counts: dict[int, int] = {}
+
+    def get_client(
+        self, uri: str, root_certificates: str | None = None
+    ) -> KurrentDBClient:
+        key = (uri, root_certificates)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._client_class(
+                    uri=uri, root_certificates=root_certificates
+                )
+                self._clients[key] = client
+                self._keys[id(client)] = key
+                self._ref_counts[id(client)] = 0
+            self._ref_counts[id(client)] += 1
+            return client
+
+    def put_client(self, client: KurrentDBClient) -> None:
+        with self._lock:
+            if id(client) not in self._ref_counts:
+                msg = "Client not from this pool, or already closed"
+                raise ProgrammingError(msg)
+            self._ref_counts[id(client)] -= 1
+            if self._ref_counts[id(client)] > 0:
+                return
+            del self._ref_counts[id(client)]
+            del self._clients[self._keys.pop(id(client))]
+        client.close()
+
+    def stats(self) -> KurrentDBClientPoolStats:
+        with self._lock:
+            return KurrentDBClientPoolStats(
+                num_clients=len(self._clients),
+                num_references=sum(self._ref_counts.values()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._keys.clear()
+            self._ref_counts.clear()
+        for client in clients:
+            client.close()
+
+
+DEFAULT_CLIENT_POOL = KurrentDBClientPool()
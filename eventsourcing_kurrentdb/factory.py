@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, TypeVar, cast
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 from eventsourcing.persistence import (
     AggregateRecorder,
@@ -8,26 +9,99 @@ from eventsourcing.persistence import (
     InfrastructureFactory,
     InfrastructureFactoryError,
     ProcessRecorder,
-    TrackingRecorder,
 )
-from kurrentdbclient import KurrentDBClient
+from eventsourcing.utils import resolve_topic, strtobool
+from kurrentdbclient import AsyncKurrentDBClient
+from kurrentdbclient.connection_spec import VALID_NODE_PREFERENCES
 
+from eventsourcing_kurrentdb.asyncio_recorders import (
+    AsyncKurrentDBAggregateRecorder,
+    AsyncKurrentDBApplicationRecorder,
+)
+from eventsourcing_kurrentdb.clients import DEFAULT_CLIENT_POOL, KurrentDBClientPool
+from eventsourcing_kurrentdb.filters import NotificationFilter
+from eventsourcing_kurrentdb.hedging import HedgedReader
+from eventsourcing_kurrentdb.hub import (
+    DEFAULT_SUBSCRIPTION_HUB_POOL,
+    KurrentDBSubscriptionHub,
+    KurrentDBSubscriptionHubPool,
+)
+from eventsourcing_kurrentdb.naming import CategoryStreamNaming
 from eventsourcing_kurrentdb.recorders import (
     KurrentDBAggregateRecorder,
     KurrentDBApplicationRecorder,
+    KurrentDBDeadlines,
+    KurrentDBProcessRecorder,
+    KurrentDBTrackingRecorder,
 )
 
 if TYPE_CHECKING:
     from eventsourcing.utils import Environment
+    from kurrentdbclient import KurrentDBClient
+
+    from eventsourcing_kurrentdb.readahead import NotificationReadAhead
+    from eventsourcing_kurrentdb.snapshots import KurrentDBSnapshotWriter
+    from eventsourcing_kurrentdb.streamcache import KurrentDBStreamCache
+
+TKurrentDBTrackingRecorder = TypeVar(
+    "TKurrentDBTrackingRecorder", bound=KurrentDBTrackingRecorder
+)
 
 
-class KurrentDBFactory(InfrastructureFactory[TrackingRecorder]):
+class KurrentDBFactory(InfrastructureFactory[KurrentDBTrackingRecorder]):
     """
     Infrastructure factory for KurrentDB infrastructure.
     """
 
     KURRENTDB_URI = "KURRENTDB_URI"
     KURRENTDB_ROOT_CERTIFICATES = "KURRENTDB_ROOT_CERTIFICATES"
+    KURRENTDB_READER_URI = "KURRENTDB_READER_URI"
+    KURRENTDB_READER_NODE_PREFERENCE = "KURRENTDB_READER_NODE_PREFERENCE"
+    KURRENTDB_READ_YOUR_WRITES = "KURRENTDB_READ_YOUR_WRITES"
+    KURRENTDB_HEDGED_READS = "KURRENTDB_HEDGED_READS"
+    KURRENTDB_HEDGE_PERCENTILE = "KURRENTDB_HEDGE_PERCENTILE"
+    KURRENTDB_HEDGE_MAX_DELAY = "KURRENTDB_HEDGE_MAX_DELAY"
+    KURRENTDB_MULTI_STREAM_APPENDS = "KURRENTDB_MULTI_STREAM_APPENDS"
+    KURRENTDB_NOTIFICATION_STREAM_PREFIXES = "KURRENTDB_NOTIFICATION_STREAM_PREFIXES"
+    KURRENTDB_NOTIFICATION_TYPE_PREFIXES = "KURRENTDB_NOTIFICATION_TYPE_PREFIXES"
+    KURRENTDB_STREAM_CATEGORY = "KURRENTDB_STREAM_CATEGORY"
+    KURRENTDB_SNAPSHOT_WRITER = "KURRENTDB_SNAPSHOT_WRITER"
+    KURRENTDB_SNAPSHOT_WRITER_MAXSIZE = "KURRENTDB_SNAPSHOT_WRITER_MAXSIZE"
+    KURRENTDB_EVENT_TYPE_STREAMS = "KURRENTDB_EVENT_TYPE_STREAMS"
+    KURRENTDB_STREAM_CACHE_MAX_BYTES = "KURRENTDB_STREAM_CACHE_MAX_BYTES"
+    KURRENTDB_READ_AHEAD_DEPTH = "KURRENTDB_READ_AHEAD_DEPTH"
+    KURRENTDB_READ_AHEAD_MAX_BYTES = "KURRENTDB_READ_AHEAD_MAX_BYTES"
+    KURRENTDB_PERSISTENT_SUBSCRIPTION_GROUP = "KURRENTDB_PERSISTENT_SUBSCRIPTION_GROUP"
+    KURRENTDB_PERSISTENT_SUBSCRIPTION_CONSUMER_STRATEGY = (
+        "KURRENTDB_PERSISTENT_SUBSCRIPTION_CONSUMER_STRATEGY"
+    )
+    KURRENTDB_PERSISTENT_SUBSCRIPTION_MAX_IN_FLIGHT = (
+        "KURRENTDB_PERSISTENT_SUBSCRIPTION_MAX_IN_FLIGHT"
+    )
+    KURRENTDB_SUBSCRIPTION_HUB = "KURRENTDB_SUBSCRIPTION_HUB"
+    KURRENTDB_SUBSCRIPTION_HUB_QUEUE_MAXSIZE = (
+        "KURRENTDB_SUBSCRIPTION_HUB_QUEUE_MAXSIZE"
+    )
+    KURRENTDB_SUBSCRIPTION_RECONNECT = "KURRENTDB_SUBSCRIPTION_RECONNECT"
+    KURRENTDB_SUBSCRIPTION_MAX_BACKOFF = "KURRENTDB_SUBSCRIPTION_MAX_BACKOFF"
+    KURRENTDB_SUBSCRIPTION_MAX_RECONNECT_ATTEMPTS = (
+        "KURRENTDB_SUBSCRIPTION_MAX_RECONNECT_ATTEMPTS"
+    )
+    KURRENTDB_SUBSCRIPTION_BUFFER_SIZE = "KURRENTDB_SUBSCRIPTION_BUFFER_SIZE"
+    KURRENTDB_SUBSCRIPTION_WINDOW_SIZE = "KURRENTDB_SUBSCRIPTION_WINDOW_SIZE"
+    KURRENTDB_READ_PAGE_SIZE = "KURRENTDB_READ_PAGE_SIZE"
+    KURRENTDB_APPEND_DEADLINE = "KURRENTDB_APPEND_DEADLINE"
+    KURRENTDB_READ_STREAM_DEADLINE = "KURRENTDB_READ_STREAM_DEADLINE"
+    KURRENTDB_READ_ALL_DEADLINE = "KURRENTDB_READ_ALL_DEADLINE"
+    KURRENTDB_COMMIT_POSITION_DEADLINE = "KURRENTDB_COMMIT_POSITION_DEADLINE"
+    KURRENTDB_CHECKPOINT_INTERVAL = "KURRENTDB_CHECKPOINT_INTERVAL"
+    KURRENTDB_CHECKPOINT_INTERVAL_MS = "KURRENTDB_CHECKPOINT_INTERVAL_MS"
+    KURRENTDB_CHECKPOINT_MAX_COUNT = "KURRENTDB_CHECKPOINT_MAX_COUNT"
+
+    client_pool: KurrentDBClientPool = DEFAULT_CLIENT_POOL
+    subscription_hub_pool: KurrentDBSubscriptionHubPool = DEFAULT_SUBSCRIPTION_HUB_POOL
+    async_client_class: type[AsyncKurrentDBClient] = AsyncKurrentDBClient
+    tracking_recorder_class: type[KurrentDBTrackingRecorder] = KurrentDBTrackingRecorder
 
     def __init__(self, env: Environment):
         super().__init__(env)
@@ -39,30 +113,465 @@ class KurrentDBFactory(InfrastructureFactory[TrackingRecorder]):
                 f"{', '.join(self.env.create_keys(self.KURRENTDB_URI))!r}"
             )
             raise InfrastructureFactoryError(msg)
+        # Settings are read and validated before a client is used.
+        self.subscription_options = self._get_subscription_options()
+        self.read_page_size = (
+            self._get_positive_int(self.KURRENTDB_READ_PAGE_SIZE) or 1000
+        )
+        self.deadlines = KurrentDBDeadlines(
+            append=self._get_deadline(self.KURRENTDB_APPEND_DEADLINE),
+            read_stream=self._get_deadline(self.KURRENTDB_READ_STREAM_DEADLINE),
+            read_all=self._get_deadline(self.KURRENTDB_READ_ALL_DEADLINE),
+            commit_position=self._get_deadline(self.KURRENTDB_COMMIT_POSITION_DEADLINE),
+        )
+        self.stream_naming = self._get_stream_naming()
+        self.notification_filter = self._get_notification_filter()
+        self.multi_stream_appends = strtobool(
+            self.env.get(self.KURRENTDB_MULTI_STREAM_APPENDS) or "no"
+        )
+        self.snapshot_writer_maxsize: int | None = None
+        if strtobool(self.env.get(self.KURRENTDB_SNAPSHOT_WRITER) or "no"):
+            self.snapshot_writer_maxsize = (
+                self._get_positive_int(self.KURRENTDB_SNAPSHOT_WRITER_MAXSIZE) or 1000
+            )
+        self.event_type_streams = strtobool(
+            self.env.get(self.KURRENTDB_EVENT_TYPE_STREAMS) or "no"
+        )
+        self.stream_cache_max_bytes = (
+            self._get_non_negative_int(self.KURRENTDB_STREAM_CACHE_MAX_BYTES) or 0
+        )
+        self.read_ahead_depth = (
+            self._get_non_negative_int(self.KURRENTDB_READ_AHEAD_DEPTH) or 0
+        )
+        self.read_ahead_max_bytes = (
+            self._get_positive_int(self.KURRENTDB_READ_AHEAD_MAX_BYTES)
+            or 16 * 1024 * 1024
+        )
+        self.persistent_subscription_group = (
+            self.env.get(self.KURRENTDB_PERSISTENT_SUBSCRIPTION_GROUP) or None
+        )
+        self.persistent_subscription_options = (
+            self._get_persistent_subscription_options()
+        )
+        self.subscription_hub = strtobool(
+            self.env.get(self.KURRENTDB_SUBSCRIPTION_HUB) or "no"
+        )
+        self.subscription_hub_queue_maxsize = (
+            self._get_positive_int(self.KURRENTDB_SUBSCRIPTION_HUB_QUEUE_MAXSIZE)
+            or 1000
+        )
+        self.checkpoint_interval = (
+            self._get_positive_int(self.KURRENTDB_CHECKPOINT_INTERVAL) or 100
+        )
+        self.checkpoint_interval_ms = (
+            self._get_positive_int(self.KURRENTDB_CHECKPOINT_INTERVAL_MS) or 1000
+        )
+        self.checkpoint_max_count = (
+            self._get_positive_int(self.KURRENTDB_CHECKPOINT_MAX_COUNT) or 10
+        )
+        self.read_your_writes = strtobool(
+            self.env.get(self.KURRENTDB_READ_YOUR_WRITES) or "yes"
+        )
+        reader_uri = self._get_reader_uri(eventstoredb_uri)
+        hedge_options = self._get_hedge_options()
         root_certificates = self.env.get(self.KURRENTDB_ROOT_CERTIFICATES)
-        self.client = KurrentDBClient(
+        self._uri = eventstoredb_uri
+        self._root_certificates = root_certificates
+        self._async_client: AsyncKurrentDBClient | None = None
+
+        # Everything that close() closes is defined before a client is used,
+        # so that the clients are put back if the constructor fails.
+        self._is_closed = False
+        self._recorders: list[KurrentDBAggregateRecorder] = []
+        self._snapshot_writers: list[KurrentDBSnapshotWriter] = []
+        self._stream_caches: list[KurrentDBStreamCache] = []
+        self._read_aheads: list[NotificationReadAhead] = []
+        self._subscription_hubs: list[KurrentDBSubscriptionHub] = []
+        self._tracking_recorders: list[KurrentDBTrackingRecorder] = []
+        self.reader_client: KurrentDBClient | None = None
+        self._hedge_client: KurrentDBClient | None = None
+        self.hedged_reader: HedgedReader | None = None
+        self.client = self.client_pool.get_client(
             uri=eventstoredb_uri,
             root_certificates=root_certificates,
         )
+        # Events are selected with the reader client, if there is one.
+        if reader_uri is not None:
+            self.reader_client = self.client_pool.get_client(
+                uri=reader_uri,
+                root_certificates=root_certificates,
+            )
+        # Slow reads of the reader client are hedged with the leader, and
+        # otherwise slow reads of the leader are hedged with a follower.
+        if hedge_options is not None:
+            hedge_client = self.client
+            if self.reader_client is None:
+                self._hedge_client = hedge_client = self.client_pool.get_client(
+                    uri=self._with_node_preference(eventstoredb_uri, "follower"),
+                    root_certificates=root_certificates,
+                )
+            self.hedged_reader = HedgedReader(hedge_client, **hedge_options)
+
+    def _get_subscription_options(self) -> dict[str, Any]:
+        subscription_options: dict[str, Any] = {}
+        if strtobool(self.env.get(self.KURRENTDB_SUBSCRIPTION_RECONNECT) or "no"):
+            subscription_options["reconnect"] = True
+        max_backoff = self._get_deadline(self.KURRENTDB_SUBSCRIPTION_MAX_BACKOFF)
+        if max_backoff is not None:
+            subscription_options["max_backoff"] = max_backoff
+        max_reconnect_attempts = self._get_non_negative_int(
+            self.KURRENTDB_SUBSCRIPTION_MAX_RECONNECT_ATTEMPTS
+        )
+        if max_reconnect_attempts is not None:
+            subscription_options["max_reconnect_attempts"] = max_reconnect_attempts
+        buffer_size = self._get_positive_int(self.KURRENTDB_SUBSCRIPTION_BUFFER_SIZE)
+        if buffer_size is not None:
+            subscription_options["buffer_size"] = buffer_size
+        window_size = self._get_positive_int(self.KURRENTDB_SUBSCRIPTION_WINDOW_SIZE)
+        if window_size is not None:
+            subscription_options["window_size"] = window_size
+        return subscription_options
+
+    def _get_persistent_subscription_options(self) -> dict[str, Any]:
+        persistent_subscription_options: dict[str, Any] = {}
+        consumer_strategy = self.env.get(
+            self.KURRENTDB_PERSISTENT_SUBSCRIPTION_CONSUMER_STRATEGY
+        )
+        if consumer_strategy:
+            persistent_subscription_options["consumer_strategy"] = consumer_strategy
+        max_in_flight = self._get_positive_int(
+            self.KURRENTDB_PERSISTENT_SUBSCRIPTION_MAX_IN_FLIGHT
+        )
+        if max_in_flight is not None:
+            persistent_subscription_options["max_in_flight"] = max_in_flight
+        return persistent_subscription_options
+
+    def _get_stream_naming(self) -> CategoryStreamNaming | None:
+        category = self.env.get(self.KURRENTDB_STREAM_CATEGORY)
+        if not category:
+            return None
+        try:
+            return CategoryStreamNaming(category)
+        except ValueError as e:
+            msg = f"{self.KURRENTDB_STREAM_CATEGORY!r} is invalid: {e}"
+            raise InfrastructureFactoryError(msg) from e
+
+    def _get_notification_filter(self) -> NotificationFilter | None:
+        # Prefixes are cheaper to match than the default regular expression.
+        stream_prefixes = self._get_prefixes(
+            self.KURRENTDB_NOTIFICATION_STREAM_PREFIXES
+        )
+        type_prefixes = self._get_prefixes(self.KURRENTDB_NOTIFICATION_TYPE_PREFIXES)
+        if stream_prefixes and type_prefixes:
+            msg = (
+                f"{self.KURRENTDB_NOTIFICATION_STREAM_PREFIXES!r} and "
+                f"{self.KURRENTDB_NOTIFICATION_TYPE_PREFIXES!r} can't both be set"
+            )
+            raise InfrastructureFactoryError(msg)
+        if stream_prefixes:
+            return NotificationFilter.include_stream_prefixes(*stream_prefixes)
+        if type_prefixes:
+            return NotificationFilter.include_type_prefixes(*type_prefixes)
+        if self.stream_naming is not None:
+            # Only the application's streams are selected.
+            assert isinstance(self.stream_naming.category, str)
+            return NotificationFilter.include_stream_prefixes(
+                self.stream_naming.category + self.stream_naming.SEPARATOR
+            )
+        return None
+
+    def _get_prefixes(self, name: str) -> list[str]:
+        value = self.env.get(name) or ""
+        return [p.strip() for p in value.split(",") if p.strip()]
+
+    def _get_reader_uri(self, uri: str) -> str | None:
+        reader_uri = self.env.get(self.KURRENTDB_READER_URI)
+        if reader_uri:
+            return reader_uri
+        node_preference = self.env.get(self.KURRENTDB_READER_NODE_PREFERENCE)
+        if not node_preference:
+            return None
+        if node_preference.lower() not in VALID_NODE_PREFERENCES:
+            msg = (
+                f"{self.KURRENTDB_READER_NODE_PREFERENCE!r} must be one of "
+                f"{', '.join(VALID_NODE_PREFERENCES)}: {node_preference!r}"
+            )
+            raise InfrastructureFactoryError(msg)
+        return self._with_node_preference(uri, node_preference.lower())
+
+    @staticmethod
+    def _with_node_preference(uri: str, node_preference: str) -> str:
+        # Same connection string, with another node preference.
+        parts = urlsplit(uri)
+        query = [
+            (k, v) for k, v in parse_qsl(parts.query) if k.lower() != "nodepreference"
+        ]
+        query.append(("NodePreference", node_preference))
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def _get_hedge_options(self) -> dict[str, Any] | None:
+        if not strtobool(self.env.get(self.KURRENTDB_HEDGED_READS) or "no"):
+            return None
+        hedge_options: dict[str, Any] = {}
+        percentile = self.env.get(self.KURRENTDB_HEDGE_PERCENTILE)
+        if percentile:
+            try:
+                hedge_options["percentile"] = float(percentile)
+            except ValueError:
+                hedge_options["percentile"] = 0.0
+            if not 0 < hedge_options["percentile"] < 100:
+                msg = (
+                    f"{self.KURRENTDB_HEDGE_PERCENTILE!r} must be between "
+                    f"0 and 100: {percentile!r}"
+                )
+                raise InfrastructureFactoryError(msg)
+        max_delay = self._get_deadline(self.KURRENTDB_HEDGE_MAX_DELAY)
+        if max_delay is not None:
+            hedge_options["max_delay"] = max_delay
+        return hedge_options
+
+    def _get_positive_int(self, name: str) -> int | None:
+        value = self.env.get(name)
+        if not value:
+            return None
+        try:
+            number = int(value)
+        except ValueError:
+            number = 0
+        if number <= 0:
+            msg = f"{name!r} must be a positive integer: {value!r}"
+            raise InfrastructureFactoryError(msg)
+        return number
+
+    def _get_non_negative_int(self, name: str) -> int | None:
+        value = self.env.get(name)
+        if not value:
+            return None
+        try:
+            number = int(value)
+        except ValueError:
+            number = -1
+        if number < 0:
+            msg = f"{name!r} must be a non-negative integer: {value!r}"
+            raise InfrastructureFactoryError(msg)
+        return number
+
+    def _get_deadline(self, name: str) -> float | None:
+        # Seconds, or None for no deadline.
+        value = self.env.get(name)
+        if not value:
+            return None
+        try:
+            deadline = float(value)
+        except ValueError:
+            deadline = 0.0
+        if not 0 < deadline < float("inf"):
+            msg = f"{name!r} must be a positive number of seconds: {value!r}"
+            raise InfrastructureFactoryError(msg)
+        return deadline
 
     def aggregate_recorder(self, purpose: str = "events") -> AggregateRecorder:
-        return KurrentDBAggregateRecorder(
+        recorder = KurrentDBAggregateRecorder(
             client=self.client,
             for_snapshotting=bool(purpose == "snapshots"),
+            multi_stream_appends=self.multi_stream_appends,
+            snapshot_writer_maxsize=self.snapshot_writer_maxsize,
+            stream_cache_max_bytes=self.stream_cache_max_bytes,
+            read_page_size=self.read_page_size,
+            deadlines=self.deadlines,
+            notification_filter=self.notification_filter,
+            stream_naming=self.stream_naming,
+            reader_client=self.reader_client,
+            read_your_writes=self.read_your_writes,
+            hedged_reader=self.hedged_reader,
         )
+        self._recorders.append(recorder)
+        if recorder.snapshot_writer is not None:
+            self._snapshot_writers.append(recorder.snapshot_writer)
+        if recorder.stream_cache is not None:
+            self._stream_caches.append(recorder.stream_cache)
+        return recorder
 
     def application_recorder(self) -> ApplicationRecorder:
-        return KurrentDBApplicationRecorder(self.client)
+        recorder = KurrentDBApplicationRecorder(
+            self.client,
+            multi_stream_appends=self.multi_stream_appends,
+            event_type_streams=self.event_type_streams,
+            read_ahead_depth=self.read_ahead_depth,
+            read_ahead_max_bytes=self.read_ahead_max_bytes,
+            persistent_subscription_group=self.persistent_subscription_group,
+            persistent_subscription_options=self.persistent_subscription_options,
+            subscription_options=self.subscription_options,
+            stream_cache_max_bytes=self.stream_cache_max_bytes,
+            read_page_size=self.read_page_size,
+            deadlines=self.deadlines,
+            notification_filter=self.notification_filter,
+            stream_naming=self.stream_naming,
+            reader_client=self.reader_client,
+            read_your_writes=self.read_your_writes,
+            hedged_reader=self.hedged_reader,
+        )
+        self._recorders.append(recorder)
+        if recorder.read_ahead is not None:
+            self._read_aheads.append(recorder.read_ahead)
+        if recorder.stream_cache is not None:
+            self._stream_caches.append(recorder.stream_cache)
+        self._use_subscription_hub(recorder)
+        return recorder
+
+    def _use_subscription_hub(self, recorder: KurrentDBApplicationRecorder) -> None:
+        # Recorders that use the same clients share a subscription hub.
+        if self.subscription_hub:
+            recorder.subscription_hub = self.subscription_hub_pool.get_hub(
+                recorder,
+                queue_maxsize=self.subscription_hub_queue_maxsize,
+                catch_up_page_size=self.read_page_size,
+                **{
+                    k: v
+                    for k, v in self.subscription_options.items()
+                    if k in ("max_backoff", "max_reconnect_attempts")
+                },
+            )
+            self._subscription_hubs.append(recorder.subscription_hub)
+
+    @property
+    def async_client(self) -> AsyncKurrentDBClient:
+        """
+        Asyncio client, constructed when first used. It connects to
+        the database when first awaited.
+        """
+        if self._async_client is None:
+            self._async_client = self.async_client_class(
+                uri=self._uri,
+                root_certificates=self._root_certificates,
+            )
+        return self._async_client
+
+    def async_aggregate_recorder(
+        self, purpose: str = "events"
+    ) -> AsyncKurrentDBAggregateRecorder:
+        return AsyncKurrentDBAggregateRecorder(
+            client=self.async_client,
+            for_snapshotting=bool(purpose == "snapshots"),
+            multi_stream_appends=self.multi_stream_appends,
+            read_page_size=self.read_page_size,
+            deadlines=self.deadlines,
+            notification_filter=self.notification_filter,
+            stream_naming=self.stream_naming,
+        )
+
+    def async_application_recorder(self) -> AsyncKurrentDBApplicationRecorder:
+        return AsyncKurrentDBApplicationRecorder(
+            self.async_client,
+            multi_stream_appends=self.multi_stream_appends,
+            read_page_size=self.read_page_size,
+            deadlines=self.deadlines,
+            notification_filter=self.notification_filter,
+            stream_naming=self.stream_naming,
+        )
 
     def tracking_recorder(
-        self, tracking_recorder_class: type[TrackingRecorder] | None = None
-    ) -> TrackingRecorder:
-        raise NotImplementedError
+        self, tracking_recorder_class: type[TKurrentDBTrackingRecorder] | None = None
+    ) -> TKurrentDBTrackingRecorder:
+        if tracking_recorder_class is None:
+            tracking_recorder_topic = self.env.get(self.TRACKING_RECORDER_TOPIC)
+            if tracking_recorder_topic:
+                tracking_recorder_class = resolve_topic(tracking_recorder_topic)
+            else:
+                tracking_recorder_class = cast(
+                    "type[TKurrentDBTrackingRecorder]",
+                    type(self).tracking_recorder_class,
+                )
+        assert tracking_recorder_class is not None
+        assert issubclass(tracking_recorder_class, KurrentDBTrackingRecorder)
+        recorder = tracking_recorder_class(
+            client=self.client,
+            name=self.env.name,
+            checkpoint_interval=self.checkpoint_interval,
+            checkpoint_interval_ms=self.checkpoint_interval_ms,
+            checkpoint_max_count=self.checkpoint_max_count,
+            deadlines=self.deadlines,
+        )
+        self._tracking_recorders.append(recorder)
+        return recorder
 
     def process_recorder(self) -> ProcessRecorder:
-        raise NotImplementedError
+        process_recorder_topic = self.env.get(self.PROCESS_RECORDER_TOPIC)
+        if process_recorder_topic:
+            process_recorder_class: type[KurrentDBProcessRecorder] = resolve_topic(
+                process_recorder_topic
+            )
+        else:
+            process_recorder_class = KurrentDBProcessRecorder
+        assert issubclass(process_recorder_class, KurrentDBProcessRecorder)
+        recorder = process_recorder_class(
+            self.client,
+            name=self.env.name,
+            checkpoint_max_count=self.checkpoint_max_count,
+            event_type_streams=self.event_type_streams,
+            read_ahead_depth=self.read_ahead_depth,
+            read_ahead_max_bytes=self.read_ahead_max_bytes,
+            persistent_subscription_group=self.persistent_subscription_group,
+            persistent_subscription_options=self.persistent_subscription_options,
+            subscription_options=self.subscription_options,
+            stream_cache_max_bytes=self.stream_cache_max_bytes,
+            read_page_size=self.read_page_size,
+            deadlines=self.deadlines,
+            notification_filter=self.notification_filter,
+            stream_naming=self.stream_naming,
+            reader_client=self.reader_client,
+            read_your_writes=self.read_your_writes,
+            hedged_reader=self.hedged_reader,
+        )
+        self._recorders.append(recorder)
+        if recorder.read_ahead is not None:
+            self._read_aheads.append(recorder.read_ahead)
+        if recorder.stream_cache is not None:
+            self._stream_caches.append(recorder.stream_cache)
+        self._use_subscription_hub(recorder)
+        return recorder
+
+    def close(self) -> None:
+        # Stop reading ahead, close stream caches, put back subscription hubs,
+        # write queued snapshots, shut down the recorders' append threads,
+        # write pending checkpoints, then put client back in the pool, which
+        # closes the client if it is no longer used.
+        if not self._is_closed:
+            self._is_closed = True
+            self._close_recorders()
+            if self.hedged_reader is not None:
+                self.hedged_reader.close()
+            if self._hedge_client is not None:
+                self.client_pool.put_client(self._hedge_client)
+            if self.reader_client is not None:
+                self.client_pool.put_client(self.reader_client)
+            self.client_pool.put_client(self.client)
+        super().close()
+
+    def _close_recorders(self) -> None:
+        for read_ahead in self._read_aheads:
+            read_ahead.cancel()
+        for stream_cache in self._stream_caches:
+            stream_cache.close()
+        for subscription_hub in self._subscription_hubs:
+            self.subscription_hub_pool.put_hub(subscription_hub)
+        self._subscription_hubs.clear()
+        for snapshot_writer in self._snapshot_writers:
+            snapshot_writer.close()
+        for recorder in self._recorders:
+            recorder.close()
+        for tracking_recorder in self._tracking_recorders:
+            tracking_recorder.close()
+
+    async def aclose(self) -> None:
+        """
+        Closes the asyncio client, if it was used. Must be awaited on the
+        event loop that used the asyncio recorders, before calling close().
+        """
+        if self._async_client is not None:
+            async_client, self._async_client = self._async_client, None
+            await async_client.close()
 
     def __del__(self) -> None:
         if hasattr(self, "client"):
-            del self.client
-            # self.client.close()
+            self.close()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
+
+from kurrentdbclient import DEFAULT_EXCLUDE_FILTER
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+    from kurrentdbclient import RecordedEvent
+
+_SYSTEM_EVENT_TYPE = re.compile(r"\$.+")
+
+
+@dataclass(frozen=True)
+class NotificationFilter:
+    """
+    Server-side filter that selects the notifications of an application from
+    the events in $all, without the snapshots, the checkpoints of tracking
+    streams, and the events of system streams.
+
+    The server tests every event in $all against the filter. Matching a
+    prefix is cheaper than matching a regular expression, so when all of the
+    application's streams, or all of its event types, start with known
+    prefixes, include_stream_prefixes() or include_type_prefixes() is the
+    cheapest filter. Otherwise exclude_streams() excludes the streams whose
+    names start with the given prefixes, with a regular expression that is
+    anchored at the start of the stream name, which doesn't depend on the
+    topics of the snapshots. Prefixes can only be used to include events,
+    and a filter that includes events ignores 'filter_exclude'.
+
+    The server filters either stream names or event types, so events with
+    system event types in other streams, such as the "$streamDeleted" events
+    of deleted streams, are excluded by exclude_streams() after they are
+    received (see excludes()).
+
+    The keyword arguments of the client methods are constructed once, and
+    cached, so each recorder should construct its filter once.
+    """
+
+    filter_exclude: tuple[str, ...] = DEFAULT_EXCLUDE_FILTER
+    filter_include: tuple[str, ...] = ()
+    filter_by_stream_name: bool = False
+    filter_by_prefix: bool = False
+    exclude_system_types: bool = False
+
+    def __post_init__(self) -> None:
+        if self.filter_by_prefix and not all(self.filter_include):
+            msg = f"Prefix filters must include prefixes: {self.filter_include!r}"
+            raise ValueError(msg)
+
+    @classmethod
+    def exclude_streams(cls, *prefixes: str) -> NotificationFilter:
+        """
+        Excludes system streams, and streams whose names start with 'prefixes'.
+        """
+        return cls(
+            filter_exclude=(r"\$.+", *(re.escape(p) + ".*" for p in prefixes)),
+            filter_by_stream_name=True,
+            exclude_system_types=True,
+        )
+
+    @classmethod
+    def exclude_types(cls, *patterns: str) -> NotificationFilter:
+        """
+        Excludes system event types, and event types that match 'patterns'.
+        """
+        return cls(filter_exclude=(*DEFAULT_EXCLUDE_FILTER, *patterns))
+
+    @classmethod
+    def include_stream_prefixes(cls, *prefixes: str) -> NotificationFilter:
+        """
+        Includes only streams whose names start with 'prefixes'.
+        """
+        return cls(
+            filter_include=prefixes, filter_by_stream_name=True, filter_by_prefix=True
+        )
+
+    @classmethod
+    def include_type_prefixes(cls, *prefixes: str) -> NotificationFilter:
+        """
+        Includes only event types that start with 'prefixes'.
+        """
+        return cls(filter_include=prefixes, filter_by_prefix=True)
+
+    def options(
+        self, filter_include: Sequence[str] = (), *, regex: bool = False
+    ) -> Mapping[str, Any]:
+        """
+        Returns the filter arguments of read_all() and subscribe_to_all(). Event
+        types that match 'filter_include' (normally topics) have priority. With
+        'regex', prefixes are matched with regular expressions, for the methods
+        that don't support prefixes, such as get_commit_position().
+        """
+        if filter_include:
+            return {"filter_include": tuple(filter_include)}
+        if regex:
+            return self._regex_options
+        return self._options
+
+    def excludes(self, recorded_event: RecordedEvent) -> bool:
+        """
+        Returns True if the recorded event passed the server-side filter, but
+        isn't a notification because it has a system event type.
+        """
+        return self.exclude_system_types and bool(
+            _SYSTEM_EVENT_TYPE.fullmatch(recorded_event.type)
+        )
+
+    @cached_property
+    def _options(self) -> Mapping[str, Any]:
+        options: dict[str, Any] = {
+            "filter_exclude": self.filter_exclude,
+            "filter_include": self.filter_include,
+            "filter_by_stream_name": self.filter_by_stream_name,
+        }
+        if self.filter_by_prefix:
+            options["filter_by_prefix"] = True
+        return options
+
+    @cached_property
+    def _regex_options(self) -> Mapping[str, Any]:
+        if not self.filter_by_prefix:
+            return self._options
+        return {
+            "filter_exclude": self.filter_exclude,
+            "filter_include": tuple(re.escape(p) + ".*" for p in self.filter_include),
+            "filter_by_stream_name": self.filter_by_stream_name,
+        }
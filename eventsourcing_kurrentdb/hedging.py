@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+from typing import TYPE_CHECKING
+
+from kurrentdbclient.exceptions import NotFoundError
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from kurrentdbclient import KurrentDBClient, RecordedEvent
+    from kurrentdbclient.streams import ReadResponse
+
+
+@dataclass(frozen=True)
+class HedgeMetrics:
+    num_reads: int
+    """Number of reads."""
+    num_hedges: int
+    """Number of reads for which a duplicate read was started."""
+    num_hedges_won: int
+    """Number of reads for which the duplicate read responded first."""
+    delay: float
+    """Seconds after which a duplicate read is started."""
+
+
+class _Attempt:
+    # A read with one of the clients, which can be cancelled.
+    def __init__(self, client: KurrentDBClient):
+        self.client = client
+        self.response: ReadResponse | None = None
+        self.is_cancelled = False
+        self.lock = Lock()
+
+    def cancel(self) -> None:
+        with self.lock:
+            self.is_cancelled = True
+            response = self.response
+        if response is not None:
+            response.stop()
+
+
+class HedgedReader:
+    """
+    Reduces the tail latency of reads, by starting a duplicate read with
+    another client (normally connected to another member of the cluster)
+    when a read hasn't responded within a delay. The response that arrives
+    first is used, and the other read is cancelled.
+
+    The delay is the 'percentile' of the durations of the last 'window'
+    reads that the primary read won, bounded by 'min_delay' and 'max_delay'
+    seconds, so that only the slowest reads are hedged. Until there are
+    'min_samples' durations, the delay is 'max_delay'. Reads are made by a
+    pool of up to 'max_workers' threads, which limits the number of
+    concurrent hedged reads.
+    """
+
+    def __init__(
+        self,
+        hedge_client: KurrentDBClient,
+        *,
+        percentile: float = 95.0,
+        min_delay: float = 0.001,
+        max_delay: float = 1.0,
+        window: int = 1000,
+        min_samples: int = 20,
+        max_workers: int = 100,
+    ):
+        if not 0 < percentile < 100:
+            msg = f"Percentile must be between 0 and 100: {percentile!r}"
+            raise ValueError(msg)
+        self.hedge_client = hedge_client
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.window = window
+        # Durations in the order they were recorded, and in sorted order.
+        self._durations: deque[float] = deque()
+        self._sorted_durations: list[float] = []
+        self._lock = Lock()
+        self._delay = max_delay
+        self._num_reads = 0
+        self._num_hedges = 0
+        self._num_hedges_won = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="kurrentdb-hedge"
+        )
+
+    def read(
+        self,
+        client: KurrentDBClient,
+        open_response: Callable[[KurrentDBClient], ReadResponse],
+    ) -> list[RecordedEvent]:
+        """
+        Returns the recorded events of the response opened with 'client',
+        or with the hedge client, whichever responds first.
+        """
+        started = monotonic()
+        with self._lock:
+            self._num_reads += 1
+            delay = self._delay
+        primary = _Attempt(client)
+        futures = {self._executor.submit(self._run, primary, open_response): primary}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            hedge = _Attempt(self.hedge_client)
+            futures[self._executor.submit(self._run, hedge, open_response)] = hedge
+            with self._lock:
+                self._num_hedges += 1
+        winner = self._wait_for_winner(futures)
+        for future, attempt in futures.items():
+            if future is not winner:
+                future.cancel()
+                attempt.cancel()
+        if futures[winner] is primary:
+            self._record_duration(monotonic() - started)
+        else:
+            # The duration of the cancelled primary read isn't known.
+            with self._lock:
+                self._num_hedges_won += 1
+        return winner.result()
+
+    def metrics(self) -> HedgeMetrics:
+        with self._lock:
+            return HedgeMetrics(
+                num_reads=self._num_reads,
+                num_hedges=self._num_hedges,
+                num_hedges_won=self._num_hedges_won,
+                delay=self._delay,
+            )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _run(
+        attempt: _Attempt, open_response: Callable[[KurrentDBClient], ReadResponse]
+    ) -> list[RecordedEvent]:
+        response = open_response(attempt.client)
+        with attempt.lock:
+            attempt.response = response
+            is_cancelled = attempt.is_cancelled
+        if is_cancelled:
+            response.stop()
+        with response:
+            return list(response)
+
+    @staticmethod
+    def _wait_for_winner(
+        futures: dict[Future[list[RecordedEvent]], _Attempt],
+    ) -> Future[list[RecordedEvent]]:
+        # The first read that responds wins. A stream that isn't found is a
+        # response, but other errors are only raised if all the reads fail.
+        pending = set(futures)
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None or isinstance(error, NotFoundError):
+                    return future
+            if not pending:
+                return next(iter(futures))
+
+    def _record_duration(self, duration: float) -> None:
+        # The durations are kept sorted, so the percentile doesn't need a sort.
+        with self._lock:
+            if len(self._durations) == self.window:
+                oldest = self._durations.popleft()
+                del self._sorted_durations[bisect_left(self._sorted_durations, oldest)]
+            self._durations.append(duration)
+            insort(self._sorted_durations, duration)
+            durations = self._sorted_durations
+            if len(durations) >= self.min_samples:
+                index = int(len(durations) * self.percentile / 100)
+                delay = durations[min(index, len(durations) - 1)]
+                self._delay = min(self.max_delay, max(self.min_delay, delay))
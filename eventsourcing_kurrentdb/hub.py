@@ -0,0 +1,456 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from threading import Condition, Lock, Thread
+from typing import TYPE_CHECKING, Any
+
+import kurrentdbclient.exceptions
+from eventsourcing.persistence import Notification, ProgrammingError, Subscription
+
+from eventsourcing_kurrentdb.recorders import (
+    BadlyFormedUUIDStringError,
+    KurrentDBApplicationRecorder,
+    get_subscription_backoff,
+    is_retryable_subscription_error,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from kurrentdbclient import KurrentDBClient, RecordedEvent
+    from kurrentdbclient.common import AbstractCatchupSubscription
+
+    from eventsourcing_kurrentdb.filters import NotificationFilter
+    from eventsourcing_kurrentdb.naming import StreamNaming
+
+
+@dataclass(frozen=True)
+class SubscriptionHubMetrics:
+    num_live: int
+    """Number of subscriptions that receive notifications from the hub."""
+    num_catching_up: int
+    """Number of subscriptions that are reading notifications from the database."""
+    num_detached: int
+    """Number of times a slow subscription has been detached from the hub."""
+    num_restarts: int
+    """Number of times the shared subscription has been started."""
+    num_disconnects: int
+    """Number of times the shared subscription failed with a retryable error."""
+
+
+@dataclass(eq=False)
+class HubConsumer:
+    """
+    State of a subscription to a subscription hub.
+    """
+
+    recorder: KurrentDBApplicationRecorder
+    """Recorder that constructs the consumer's notifications."""
+    topics: tuple[str, ...]
+    position: int | None
+    """Notifications at or before this position have been received."""
+    queue: deque[Notification] = field(default_factory=deque)
+    """Notifications dispatched by the hub."""
+    page: deque[Notification] = field(default_factory=deque)
+    """Notifications read from the database, whilst catching up."""
+    is_live: bool = False
+    is_stopped: bool = False
+
+    def is_wanted(self, notification: Notification) -> bool:
+        if self.position is not None and notification.id <= self.position:
+            return False
+        return not self.topics or notification.topic in self.topics
+
+
+class KurrentDBSubscriptionHub:
+    """
+    Shares one catch-up subscription to $all between many subscriptions in
+    a process, so that each recorded event is received and converted to a
+    notification once. The shared subscription is filtered by the union of
+    the topics of the subscriptions, and is restarted from its position when
+    a subscription with other topics is added.
+
+    The hub is shared by recorders that use the same reader client and
+    notification filter, and holds only these, so that it doesn't keep any
+    recorder alive. Notifications are constructed with the recorder of each
+    subscription, once for each way of naming streams and validating UUIDs,
+    so that each subscription has the originator IDs that its recorder would
+    select.
+
+    Each subscription has a bounded queue. The hub doesn't wait for a
+    subscription whose queue is full, but detaches it, so that one slow
+    consumer doesn't hold up the others. A new or detached subscription
+    reads notifications from the database until it has caught up with the
+    hub, and then receives notifications from the hub again.
+
+    The shared subscription is resumed from the hub's position after a
+    retryable error (see RETRYABLE_SUBSCRIPTION_ERRORS), with the same
+    backoff as KurrentDBSubscription. The subscriptions of the hub only fail
+    if the error isn't retryable, or after 'max_reconnect_attempts'
+    consecutive failed attempts to resubscribe (never if None).
+    """
+
+    def __init__(
+        self,
+        reader_client: KurrentDBClient,
+        notification_filter: NotificationFilter,
+        *,
+        queue_maxsize: int = 1000,
+        catch_up_page_size: int = 500,
+        initial_backoff: float = 0.1,
+        max_backoff: float = 10.0,
+        max_reconnect_attempts: int | None = None,
+    ):
+        self.reader_client = reader_client
+        self.notification_filter = notification_filter
+        self.queue_maxsize = queue_maxsize
+        self.catch_up_page_size = catch_up_page_size
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self._condition = Condition()
+        self._consumers: list[HubConsumer] = []
+        # Topics of the consumers, and whether any consumer has no topics.
+        self._topics: set[str] = set()
+        self._has_all_topics = False
+        # Topics of the shared subscription, or None if it hasn't been started.
+        self._live_topics: tuple[str, ...] | None = None
+        self._live_subscription: AbstractCatchupSubscription | None = None
+        # Notifications at or before this position have been dispatched.
+        self._position: int | None = None
+        self._is_restart_needed = False
+        self._is_stopped = False
+        self._error: BaseException | None = None
+        self._thread: Thread | None = None
+        self._num_detached = 0
+        self._num_restarts = 0
+        self._num_disconnects = 0
+
+    def subscribe(
+        self,
+        recorder: KurrentDBApplicationRecorder,
+        gt: int | None = None,
+        topics: Sequence[str] = (),
+    ) -> KurrentDBHubSubscription:
+        if (
+            recorder.reader_client is not self.reader_client
+            or recorder.notification_filter != self.notification_filter
+        ):
+            msg = "Recorder doesn't use the hub's reader client and notification filter"
+            raise ProgrammingError(msg)
+        consumer = HubConsumer(recorder=recorder, topics=tuple(topics), position=gt)
+        with self._condition:
+            if self._is_stopped:
+                msg = "Subscription hub has been stopped"
+                raise ProgrammingError(msg)
+            self._consumers.append(consumer)
+            if not topics:
+                is_new = not self._has_all_topics
+                self._has_all_topics = True
+            else:
+                is_new = not self._has_all_topics and not self._topics.issuperset(
+                    topics
+                )
+                self._topics.update(topics)
+            if self._thread is None:
+                self._position = recorder.max_notification_id() or None
+                self._thread = Thread(
+                    target=self._run, name="kurrentdb-subscription-hub", daemon=True
+                )
+                self._thread.start()
+            elif is_new:
+                # Restart the shared subscription with the new topics.
+                self._is_restart_needed = True
+                if self._live_subscription is not None:
+                    self._live_subscription.stop()
+        return KurrentDBHubSubscription(hub=self, consumer=consumer, gt=gt)
+
+    def next_notification(self, consumer: HubConsumer) -> Notification:
+        """
+        Returns the consumer's next notification, from the notifications read
+        from the database whilst catching up, or from the consumer's queue.
+        Raises StopIteration if the consumer has been stopped.
+        """
+        while True:
+            if consumer.page:
+                return consumer.page.popleft()
+            with self._condition:
+                if consumer.is_stopped:
+                    raise StopIteration
+                if consumer.queue:
+                    notification = consumer.queue.popleft()
+                    self._condition.notify_all()
+                    return notification
+                if self._error is not None:
+                    raise self._error
+                if consumer.is_live or self._merge(consumer):
+                    self._condition.wait()
+                    continue
+                stop = self._position
+                if self._has_caught_up(consumer, stop):
+                    # Wait for the shared subscription to include the topics.
+                    self._condition.wait()
+                    continue
+            assert stop is not None
+            self._catch_up(consumer, stop)
+
+    def unsubscribe(self, consumer: HubConsumer) -> None:
+        with self._condition:
+            consumer.is_stopped = True
+            if consumer in self._consumers:
+                self._consumers.remove(consumer)
+            self._condition.notify_all()
+
+    def metrics(self) -> SubscriptionHubMetrics:
+        with self._condition:
+            num_live = sum(1 for c in self._consumers if c.is_live)
+            return SubscriptionHubMetrics(
+                num_live=num_live,
+                num_catching_up=len(self._consumers) - num_live,
+                num_detached=self._num_detached,
+                num_restarts=self._num_restarts,
+                num_disconnects=self._num_disconnects,
+            )
+
+    def stop(self) -> None:
+        """
+        Stops the shared subscription, and the subscriptions of the hub.
+        """
+        with self._condition:
+            self._is_stopped = True
+            for consumer in self._consumers:
+                consumer.is_stopped = True
+            self._consumers.clear()
+            self._condition.notify_all()
+            live_subscription = self._live_subscription
+            thread = self._thread
+        if live_subscription is not None:
+            live_subscription.stop()
+        if thread is not None:
+            thread.join()
+
+    def _catch_up(self, consumer: HubConsumer, stop: int) -> None:
+        notifications = consumer.recorder.select_notifications(
+            start=consumer.position,
+            limit=self.catch_up_page_size,
+            stop=stop,
+            topics=consumer.topics,
+            inclusive_of_start=False,
+        )
+        consumer.page.extend(notifications)
+        with self._condition:
+            if len(notifications) < self.catch_up_page_size:
+                # There are no more notifications at or before 'stop'.
+                consumer.position = stop
+            else:
+                consumer.position = notifications[-1].id
+            self._merge(consumer)
+
+    def _merge(self, consumer: HubConsumer) -> bool:
+        # Called with the condition. The hub dispatches notifications after
+        # its position, so a consumer that has caught up can be merged, if
+        # its topics are included in the topics of the shared subscription.
+        if self._has_caught_up(consumer, self._position) and self._covers(
+            consumer.topics
+        ):
+            consumer.is_live = True
+        return consumer.is_live
+
+    @staticmethod
+    def _has_caught_up(consumer: HubConsumer, position: int | None) -> bool:
+        return position is None or (
+            consumer.position is not None and consumer.position >= position
+        )
+
+    def _covers(self, topics: Sequence[str]) -> bool:
+        if self._live_topics is None:
+            return False
+        if not self._live_topics:
+            return True
+        return bool(topics) and set(self._live_topics).issuperset(topics)
+
+    def _run(self) -> None:
+        # Number of consecutive failed attempts to subscribe.
+        attempt = 0
+        while True:
+            with self._condition:
+                if self._is_stopped:
+                    return
+                self._is_restart_needed = False
+                topics = () if self._has_all_topics else tuple(sorted(self._topics))
+                position = self._position
+            try:
+                live_subscription = self.reader_client.subscribe_to_all(
+                    commit_position=position,
+                    **self.notification_filter.options(topics),
+                )
+                attempt = 0
+                with self._condition:
+                    self._live_subscription = live_subscription
+                    self._live_topics = topics
+                    self._num_restarts += 1
+                    if self._is_stopped or self._is_restart_needed:
+                        live_subscription.stop()
+                    self._condition.notify_all()
+                self._dispatch_recorded_events(live_subscription)
+            except Exception as e:
+                if not self._wait_to_resubscribe(e, attempt):
+                    with self._condition:
+                        if not self._is_stopped:
+                            self._error = e
+                        self._condition.notify_all()
+                    return
+                attempt += 1
+
+    def _wait_to_resubscribe(self, error: Exception, attempt: int) -> bool:
+        # Returns False if the shared subscription can't be resumed.
+        if not is_retryable_subscription_error(error):
+            return False
+        if self.max_reconnect_attempts is not None and (
+            attempt >= self.max_reconnect_attempts
+        ):
+            return False
+        with self._condition:
+            if self._is_stopped:
+                return True
+            if attempt == 0:
+                self._num_disconnects += 1
+            self._condition.wait_for(
+                lambda: self._is_stopped,
+                timeout=get_subscription_backoff(
+                    attempt, self.initial_backoff, self.max_backoff
+                ),
+            )
+        return True
+
+    def _dispatch_recorded_events(
+        self, live_subscription: AbstractCatchupSubscription
+    ) -> None:
+        try:
+            for recorded_event in live_subscription:
+                self._dispatch(recorded_event)
+        except kurrentdbclient.exceptions.ConsumerTooSlowError:  # pragma: no cover
+            # Resubscribe from the position of the last dispatched notification.
+            pass
+
+    def _dispatch(self, recorded_event: RecordedEvent) -> None:
+        # Notifications constructed by the recorders of the live consumers,
+        # keyed by how the recorders name streams and validate UUIDs.
+        notifications: dict[tuple[StreamNaming, bool], Notification | None] = {}
+        is_excluded = self.notification_filter.excludes(recorded_event)
+        with self._condition:
+            for consumer in [] if is_excluded else list(self._consumers):
+                if not consumer.is_live:
+                    continue
+                recorder = consumer.recorder
+                key = (recorder.stream_naming, recorder.validate_uuids)
+                if key not in notifications:
+                    notifications[key] = self._construct_notification(
+                        recorder, recorded_event
+                    )
+                notification = notifications[key]
+                if notification is not None and consumer.is_wanted(notification):
+                    self._put(consumer, notification)
+            self._position = recorded_event.commit_position
+            self._condition.notify_all()
+
+    @staticmethod
+    def _construct_notification(
+        recorder: KurrentDBApplicationRecorder, recorded_event: RecordedEvent
+    ) -> Notification | None:
+        try:
+            return recorder.construct_notification(recorded_event)
+        except BadlyFormedUUIDStringError:
+            # See KurrentDBSubscription.__next__().
+            return None
+
+    def _put(self, consumer: HubConsumer, notification: Notification) -> None:
+        # Called with the condition, so it doesn't wait for a slow consumer.
+        if len(consumer.queue) >= self.queue_maxsize:
+            # The consumer will catch up from the database.
+            consumer.is_live = False
+            self._num_detached += 1
+            return
+        consumer.queue.append(notification)
+        consumer.position = notification.id
+
+
+class KurrentDBHubSubscription(Subscription[KurrentDBApplicationRecorder]):
+    """
+    Notifications from a subscription hub. Notifications are read from the
+    database until the subscription has caught up with the hub, and then
+    received from the hub.
+    """
+
+    def __init__(
+        self,
+        hub: KurrentDBSubscriptionHub,
+        consumer: HubConsumer,
+        gt: int | None = None,
+    ):
+        super().__init__(recorder=consumer.recorder, gt=gt, topics=consumer.topics)
+        self._hub = hub
+        self._consumer = consumer
+
+    def __next__(self) -> Notification:
+        notification = self._hub.next_notification(self._consumer)
+        self._last_notification_id = notification.id
+        return notification
+
+    def stop(self) -> None:
+        super().stop()
+        self._hub.unsubscribe(self._consumer)
+
+
+class KurrentDBSubscriptionHubPool:
+    """
+    Shares a subscription hub between the application recorders in a process
+    that use the same clients and notification filter, whatever their stream
+    naming and UUID validation (see KurrentDBSubscriptionHub). Hubs are reference
+    counted, and each hub is stopped, and dropped from the pool, when its last
+    reference is put back in the pool.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._hubs: dict[
+            tuple[int, int, NotificationFilter], KurrentDBSubscriptionHub
+        ] = {}
+        self._keys: dict[int, tuple[int, int, NotificationFilter]] = {}
+        self._ref_counts: dict[int, int] = {}
+
+    def get_hub(
+        self, recorder: KurrentDBApplicationRecorder, **kwargs: Any
+    ) -> KurrentDBSubscriptionHub:
+        key = (
+            id(recorder.client),
+            id(recorder.reader_client),
+            recorder.notification_filter,
+        )
+        with self._lock:
+            hub = self._hubs.get(key)
+            if hub is None:
+                hub = KurrentDBSubscriptionHub(
+                    recorder.reader_client, recorder.notification_filter, **kwargs
+                )
+                self._hubs[key] = hub
+                self._keys[id(hub)] = key
+                self._ref_counts[id(hub)] = 0
+            self._ref_counts[id(hub)] += 1
+            return hub
+
+    def put_hub(self, hub: KurrentDBSubscriptionHub) -> None:
+        with self._lock:
+            if id(hub) not in self._ref_counts:
+                msg = "Hub not from this pool, or already stopped"
+                raise ProgrammingError(msg)
+            self._ref_counts[id(hub)] -= 1
+            if self._ref_counts[id(hub)] > 0:
+                return
+            del self._ref_counts[id(hub)]
+            del self._hubs[self._keys.pop(id(hub))]
+        hub.stop()
+
+
+DEFAULT_SUBSCRIPTION_HUB_POOL = KurrentDBSubscriptionHubPool()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from uuid import UUID
+
+
+class StreamNaming:
+    """
+    Names the stream of each aggregate, and finds the ID of the aggregate from
+    the name of its stream. By default, the stream name is the aggregate ID.
+    """
+
+    def stream_name(self, originator_id: UUID | str) -> str:
+        return str(originator_id)
+
+    def originator_id(self, stream_name: str) -> str:
+        return stream_name
+
+    def __eq__(self, other: object) -> bool:
+        # Equal namings name streams in the same way.
+        return type(other) is type(self)
+
+    def __hash__(self) -> int:
+        return hash(type(self))
+
+
+class CategoryStreamNaming(StreamNaming):
+    """
+    Names streams "<category>-<id>", so that the server's $by_category system
+    projection links the events of each category of aggregate to a
+    "$ce-<category>" stream, and so that the events of a category can be
+    selected from $all with a stream name prefix filter.
+
+    The 'category' is either the category of all the aggregates, or a function
+    that returns the category of an aggregate ID. Categories can't contain "-",
+    which separates the category from the ID in the stream name.
+    """
+
+    SEPARATOR = "-"
+
+    def __init__(self, category: str | Callable[[UUID | str], str]):
+        if isinstance(category, str):
+            self.check_category(category)
+        self.category = category
+
+    def stream_name(self, originator_id: UUID | str) -> str:
+        if isinstance(self.category, str):
+            category = self.category
+        else:
+            category = self.check_category(self.category(originator_id))
+        return f"{category}{self.SEPARATOR}{originator_id}"
+
+    def originator_id(self, stream_name: str) -> str:
+        _, separator, originator_id = stream_name.partition(self.SEPARATOR)
+        return originator_id if separator else stream_name
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, CategoryStreamNaming)
+            and type(other) is type(self)
+            and other.category == self.category
+        )
+
+    def __hash__(self) -> int:
+        return hash((type(self), self.category))
+
+    @classmethod
+    def check_category(cls, category: str) -> str:
+        if not category or cls.SEPARATOR in category:
+            msg = f"Category is empty or contains {cls.SEPARATOR!r}: {category!r}"
+            raise ValueError(msg)
+        return category
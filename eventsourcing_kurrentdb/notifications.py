@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING, overload
+
+from eventsourcing.persistence import Notification
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from uuid import UUID
+
+    from kurrentdbclient import RecordedEvent
+
+
+class NotificationBatch(Sequence[Notification]):
+    """
+    Compact sequence of notifications, for reading the application log in bulk.
+    The commit positions and stream positions of the events are held in arrays,
+    the topics are interned, and the originator IDs and state are held by
+    reference. Notification objects are only constructed when items of the
+    sequence are accessed, so consumers that only need the positions, or that
+    skip most notifications, don't pay for them.
+
+    The originator ID of each notification is constructed from the name of the
+    stream with 'get_originator_id' when the event is appended, so that a badly
+    formed UUID is raised when the notifications are selected. It is usually
+    taken from the recorder's cache of originator IDs. A batch is equal to any
+    sequence of equal notifications, so it can be used where a list of
+    notifications was used.
+    """
+
+    __slots__ = (
+        "_get_originator_id",
+        "_ids",
+        "_originator_ids",
+        "_states",
+        "_topics",
+        "_versions",
+    )
+
+    def __init__(self, get_originator_id: Callable[[str], UUID | str]):
+        self._get_originator_id = get_originator_id
+        self._ids = array("Q")
+        self._versions = array("Q")
+        self._originator_ids: list[UUID | str] = []
+        self._topics: list[str] = []
+        self._states: list[bytes] = []
+
+    def append(self, recorded_event: RecordedEvent) -> None:
+        assert recorded_event.commit_position is not None
+        self._ids.append(recorded_event.commit_position)
+        self._versions.append(recorded_event.stream_position)
+        self._originator_ids.append(self._get_originator_id(recorded_event.stream_name))
+        self._topics.append(sys.intern(recorded_event.type))
+        self._states.append(recorded_event.data)
+
+    @property
+    def ids(self) -> array[int]:
+        """
+        Notification IDs (commit positions) of the notifications.
+        """
+        return self._ids
+
+    @property
+    def topics(self) -> Sequence[str]:
+        """
+        Topics of the notifications.
+        """
+        return self._topics
+
+    @property
+    def num_bytes(self) -> int:
+        """
+        Size of the state of the notifications.
+        """
+        return sum(map(len, self._states))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @overload
+    def __getitem__(self, index: int) -> Notification: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> NotificationBatch: ...
+
+    def __getitem__(self, index: int | slice) -> Notification | NotificationBatch:
+        if isinstance(index, slice):
+            batch = NotificationBatch(self._get_originator_id)
+            batch._ids = self._ids[index]
+            batch._versions = self._versions[index]
+            batch._originator_ids = self._originator_ids[index]
+            batch._topics = self._topics[index]
+            batch._states = self._states[index]
+            return batch
+        return Notification(
+            id=self._ids[index],
+            originator_id=self._originator_ids[index],
+            originator_version=self._versions[index],
+            topic=self._topics[index],
+            state=self._states[index],
+        )
+
+    def __iter__(self) -> Iterator[Notification]:
+        for id_, originator_id, version, topic, state in zip(
+            self._ids,
+            self._originator_ids,
+            self._versions,
+            self._topics,
+            self._states,
+            strict=True,
+        ):
+            yield Notification(
+                id=id_,
+                originator_id=originator_id,
+                originator_version=version,
+                topic=topic,
+                state=state,
+            )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            a == b for a, b in zip(self, other, strict=True)
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
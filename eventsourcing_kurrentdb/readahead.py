@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from threading import Condition, Thread
+from typing import TYPE_CHECKING, NamedTuple
+
+from eventsourcing_kurrentdb.notifications import NotificationBatch
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    from eventsourcing.persistence import Notification
+
+
+class _Query(NamedTuple):
+    # Limit, stop, and topics of a sequence of pages.
+    limit: int
+    stop: int | None
+    topics: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class ReadAheadMetrics:
+    num_hits: int
+    """Number of pages that had already been read."""
+    num_misses: int
+    """Number of pages that had to be read by the caller."""
+    num_pages: int
+    """Number of pages that have been read and not yet selected."""
+    num_bytes: int
+    """Size of the state of the notifications in those pages."""
+
+
+class NotificationReadAhead:
+    """
+    Reads pages of notifications on a background thread, whilst the caller
+    processes the page it has already selected. Pages are read ahead whilst
+    the caller selects the page after the previous page, with the same limit,
+    stop, and topics. Selecting any other page cancels the pages read ahead,
+    and that page is read by the caller.
+
+    Only full pages, and pages that reach the stop position, are read ahead,
+    because they will not change. When the end of the log is reached, the
+    caller reads the next page, so that new notifications are selected.
+    """
+
+    def __init__(
+        self,
+        select: Callable[..., Sequence[Notification]],
+        depth: int = 2,
+        max_bytes: int = 16 * 1024 * 1024,
+    ):
+        self._select = select
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self._condition = Condition()
+        self._query: _Query | None = None
+        # Position after which the caller is expected to select the next page.
+        self._next: int | None = None
+        # Position after which the background thread reads the next page.
+        self._read_from: int | None = None
+        self._pages: deque[Sequence[Notification]] = deque()
+        self._num_bytes = 0
+        self._is_reading = False
+        self._is_exhausted = True
+        self._is_cancelled = False
+        self._generation = 0
+        self._num_hits = 0
+        self._num_misses = 0
+        self._thread: Thread | None = None
+
+    def select_notifications(
+        self,
+        start: int | None,
+        limit: int,
+        stop: int | None = None,
+        topics: Sequence[str] = (),
+        *,
+        inclusive_of_start: bool = True,
+    ) -> Sequence[Notification]:
+        query = _Query(limit, stop, tuple(topics))
+        after = start if start is None or not inclusive_of_start else start - 1
+        with self._condition:
+            if query == self._query and after is not None and after == self._next:
+                self._condition.wait_for(
+                    lambda: self._pages
+                    or self._is_cancelled
+                    or not (self._is_reading or self._should_read())
+                )
+                if self._pages:
+                    page = self._pages.popleft()
+                    self._num_bytes -= self._size(page)
+                    self._num_hits += 1
+                    self._next = page[-1].id
+                    self._condition.notify_all()
+                    return page
+            # Seek, or the pages read ahead didn't include the next page.
+            self._generation += 1
+            self._query = None
+            self._pages.clear()
+            self._num_bytes = 0
+            self._num_misses += 1
+
+        page = self._select(
+            start=start,
+            limit=limit,
+            stop=stop,
+            topics=topics,
+            inclusive_of_start=inclusive_of_start,
+        )
+
+        with self._condition:
+            if not self._is_cancelled and self._is_complete(page, query):
+                self._query = query
+                self._next = self._read_from = page[-1].id
+                self._is_exhausted = self._is_stopped(page, query)
+                self._start_thread()
+                self._condition.notify_all()
+        return page
+
+    def cancel(self, timeout: float | None = None) -> None:
+        """
+        Stops reading ahead, and stops the background thread.
+        """
+        with self._condition:
+            self._is_cancelled = True
+            self._pages.clear()
+            self._num_bytes = 0
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+
+    def metrics(self) -> ReadAheadMetrics:
+        with self._condition:
+            return ReadAheadMetrics(
+                num_hits=self._num_hits,
+                num_misses=self._num_misses,
+                num_pages=len(self._pages),
+                num_bytes=self._num_bytes,
+            )
+
+    def _start_thread(self) -> None:
+        if self._thread is None:
+            self._thread = Thread(
+                target=self._read_ahead, name="kurrentdb-read-ahead", daemon=True
+            )
+            self._thread.start()
+
+    def _should_read(self) -> bool:
+        return (
+            self._query is not None
+            and not self._is_exhausted
+            and len(self._pages) < self.depth
+            and self._num_bytes < self.max_bytes
+        )
+
+    def _read_ahead(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._is_cancelled or self._should_read()
+                )
+                if self._is_cancelled:
+                    return
+                assert self._query is not None
+                limit, stop, topics = query = self._query
+                read_from = self._read_from
+                generation = self._generation
+                self._is_reading = True
+            try:
+                page: Sequence[Notification] | None = self._select(
+                    start=read_from,
+                    limit=limit,
+                    stop=stop,
+                    topics=topics,
+                    inclusive_of_start=False,
+                )
+            except Exception:
+                # The caller will read the page, and see the error.
+                page = None
+            with self._condition:
+                self._is_reading = False
+                if generation == self._generation:
+                    if page is not None and self._is_complete(page, query):
+                        self._pages.append(page)
+                        self._num_bytes += self._size(page)
+                        self._read_from = page[-1].id
+                        self._is_exhausted = self._is_stopped(page, query)
+                    else:
+                        self._is_exhausted = True
+                self._condition.notify_all()
+
+    @staticmethod
+    def _is_complete(page: Sequence[Notification], query: _Query) -> bool:
+        if not page:
+            return False
+        return len(page) == query.limit or (
+            query.stop is not None and page[-1].id >= query.stop
+        )
+
+    @staticmethod
+    def _is_stopped(page: Sequence[Notification], query: _Query) -> bool:
+        return query.stop is not None and page[-1].id >= query.stop
+
+    @staticmethod
+    def _size(page: Sequence[Notification]) -> int:
+        if isinstance(page, NotificationBatch):
+            return page.num_bytes
+        return sum(len(n.state) for n in page)
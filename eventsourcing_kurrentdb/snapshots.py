@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Condition, Thread
+from typing import TYPE_CHECKING, Any
+
+from eventsourcing.persistence import ProgrammingError
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+    from uuid import UUID
+
+    from eventsourcing.persistence import StoredEvent
+
+
+@dataclass(frozen=True)
+class SnapshotWriterMetrics:
+    queue_depth: int
+    """Number of snapshots waiting to be written."""
+    num_written: int
+    """Number of snapshots that have been written."""
+    num_dropped: int
+    """Number of snapshots superseded by newer snapshots, or dropped when full."""
+    num_errors: int
+    """Number of snapshots that could not be written."""
+
+
+class KurrentDBSnapshotWriter:
+    """
+    Writes snapshots on a background thread. Snapshots are queued by
+    originator ID, so that when several snapshots of the same aggregate
+    are waiting to be written, only the newest is written.
+    """
+
+    def __init__(
+        self, write: Callable[[Sequence[StoredEvent]], Any], maxsize: int = 1000
+    ):
+        self._write = write
+        self.maxsize = maxsize
+        self.last_error: BaseException | None = None
+        self._pending: OrderedDict[UUID | str, StoredEvent] = OrderedDict()
+        self._num_in_progress = 0
+        self._num_written = 0
+        self._num_dropped = 0
+        self._num_errors = 0
+        self._is_closing = False
+        self._condition = Condition()
+        self._thread = Thread(
+            target=self._write_snapshots, name="kurrentdb-snapshots", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, stored_event: StoredEvent) -> None:
+        with self._condition:
+            if self._is_closing:
+                msg = "Snapshot writer is closed"
+                raise ProgrammingError(msg)
+            queued = self._pending.get(stored_event.originator_id)
+            if queued is not None:
+                self._num_dropped += 1
+                if queued.originator_version > stored_event.originator_version:
+                    return
+            elif len(self._pending) >= self.maxsize:
+                self._num_dropped += 1
+                return
+            self._pending[stored_event.originator_id] = stored_event
+            self._condition.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Blocks until all queued snapshots have been written. Returns False
+        if the timeout is reached before then.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._num_in_progress,
+                timeout=timeout,
+            )
+
+    def close(self, timeout: float | None = None) -> None:
+        """
+        Writes the queued snapshots and stops the background thread.
+        """
+        with self._condition:
+            self._is_closing = True
+            self._condition.notify_all()
+        self._thread.join(timeout=timeout)
+
+    def metrics(self) -> SnapshotWriterMetrics:
+        with self._condition:
+            return SnapshotWriterMetrics(
+                queue_depth=len(self._pending),
+                num_written=self._num_written,
+                num_dropped=self._num_dropped,
+                num_errors=self._num_errors,
+            )
+
+    def _write_snapshots(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._is_closing)
+                if not self._pending:
+                    return
+                _, stored_event = self._pending.popitem(last=False)
+                self._num_in_progress += 1
+            error: Exception | None = None
+            try:
+                self._write([stored_event])
+            except Exception as e:
+                error = e
+            with self._condition:
+                if error is None:
+                    self._num_written += 1
+                else:
+                    self._num_errors += 1
+                    self.last_error = error
+                self._num_in_progress -= 1
+                self._condition.notify_all()
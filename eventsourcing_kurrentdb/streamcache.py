@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock, Thread
+from typing import TYPE_CHECKING
+
+from eventsourcing.persistence import StoredEvent
+
+from eventsourcing_kurrentdb.filters import NotificationFilter
+from eventsourcing_kurrentdb.naming import StreamNaming
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+    from uuid import UUID
+
+    from kurrentdbclient import KurrentDBClient, RecordedEvent
+    from kurrentdbclient.common import AbstractCatchupSubscription
+
+
+@dataclass(frozen=True)
+class StreamCacheMetrics:
+    num_hits: int
+    """Number of selects that only read the events after the cached version."""
+    num_misses: int
+    """Number of selects that read the stream."""
+    num_streams: int
+    """Number of streams in the cache."""
+    num_bytes: int
+    """Size of the topics and state of the cached events."""
+    num_appended: int
+    """Number of events appended to cached streams by the subscription."""
+    num_invalidated: int
+    """Number of cached streams removed because events were missed."""
+
+
+@dataclass(eq=False)
+class CachedStream:
+    originator_id: UUID | str
+    first_version: int
+    """Version of the first cached event."""
+    events: list[StoredEvent] = field(default_factory=list)
+    num_bytes: int = 0
+
+    @property
+    def next_version(self) -> int:
+        return self.first_version + len(self.events)
+
+
+class KurrentDBStreamCache:
+    """
+    Read-through cache of aggregate event streams, held in an LRU that is
+    bounded by the size of the topics and state of the cached events.
+
+    A cached stream is selected by reading only the events after the cached
+    version, which are then added to the cache. So the cached events are not
+    transferred and decoded again, but there is still one round trip to check
+    for new events. Events selected up to a version that is already cached are
+    not read at all, because recorded events don't change. A catch-up
+    subscription to $all, started when the cache is first used, appends new
+    events to the cached streams, so that the read usually returns no events.
+    A cached stream is removed if the subscription receives an event that
+    isn't the next event of the stream.
+    """
+
+    def __init__(
+        self,
+        client: KurrentDBClient,
+        read: Callable[[UUID | str, int | None], list[StoredEvent]],
+        max_bytes: int = 64 * 1024 * 1024,
+        notification_filter: NotificationFilter | None = None,
+        stream_naming: StreamNaming | None = None,
+    ):
+        self.client = client
+        self.notification_filter = notification_filter or NotificationFilter()
+        self.stream_naming = stream_naming or StreamNaming()
+        self._read = read
+        self.max_bytes = max_bytes
+        self.last_error: BaseException | None = None
+        self._lock = Lock()
+        self._streams: OrderedDict[str, CachedStream] = OrderedDict()
+        self._num_bytes = 0
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_appended = 0
+        self._num_invalidated = 0
+        self._is_started = False
+        self._is_closed = False
+        self._subscription: AbstractCatchupSubscription | None = None
+        self._thread: Thread | None = None
+
+    def select_events(
+        self,
+        originator_id: UUID | str,
+        *,
+        gt: int | None = None,
+        lte: int | None = None,
+    ) -> list[StoredEvent]:
+        self._start_subscription()
+        key = self.stream_naming.stream_name(originator_id)
+        first_version = 0 if gt is None else gt + 1
+        with self._lock:
+            cached = self._streams.get(key)
+            if cached is not None and cached.first_version <= first_version:
+                self._streams.move_to_end(key)
+                self._num_hits += 1
+                events = cached.events[first_version - cached.first_version :]
+                next_version = cached.next_version
+            else:
+                cached = None
+                self._num_misses += 1
+        if cached is None:
+            events = self._read(originator_id, gt)
+            self.put(originator_id, first_version, events)
+        elif lte is None or lte >= next_version:
+            # The new events are read from the end of the cached stream, so
+            # that they can be cached, and may start before 'gt' when 'gt' is
+            # after the end of the cached stream.
+            new_events = self._read(originator_id, next_version - 1)
+            self.extend(originator_id, new_events)
+            events += [e for e in new_events if e.originator_version >= first_version]
+        if lte is not None:
+            events = [e for e in events if e.originator_version <= lte]
+        return events
+
+    def put(
+        self,
+        originator_id: UUID | str,
+        first_version: int,
+        events: Sequence[StoredEvent],
+    ) -> None:
+        """
+        Caches the events of a stream from the given version, unless the
+        events from an earlier version are already cached.
+        """
+        key = self.stream_naming.stream_name(originator_id)
+        cached = CachedStream(originator_id=originator_id, first_version=first_version)
+        with self._lock:
+            existing = self._streams.get(key)
+            if existing is not None and existing.first_version <= first_version:
+                self._extend(key, existing, events)
+                return
+            if existing is not None:
+                self._remove(key)
+            self._streams[key] = cached
+            self._num_bytes += len(key)
+            self._extend(key, cached, events)
+
+    def extend(self, originator_id: UUID | str, events: Sequence[StoredEvent]) -> None:
+        """
+        Appends new events to a cached stream.
+        """
+        key = self.stream_naming.stream_name(originator_id)
+        with self._lock:
+            cached = self._streams.get(key)
+            if cached is not None:
+                self._extend(key, cached, events)
+
+    def metrics(self) -> StreamCacheMetrics:
+        with self._lock:
+            return StreamCacheMetrics(
+                num_hits=self._num_hits,
+                num_misses=self._num_misses,
+                num_streams=len(self._streams),
+                num_bytes=self._num_bytes,
+                num_appended=self._num_appended,
+                num_invalidated=self._num_invalidated,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._streams.clear()
+            self._num_bytes = 0
+
+    def close(self) -> None:
+        """
+        Stops the subscription, and clears the cache.
+        """
+        with self._lock:
+            self._is_closed = True
+            subscription = self._subscription
+            thread = self._thread
+        if subscription is not None:
+            subscription.stop()
+        if thread is not None:
+            thread.join()
+        self.clear()
+
+    def _extend(
+        self, key: str, cached: CachedStream, events: Sequence[StoredEvent]
+    ) -> None:
+        # Called with the lock. Events that are already cached are ignored.
+        for stored_event in events:
+            if stored_event.originator_version < cached.next_version:
+                continue
+            if stored_event.originator_version > cached.next_version:
+                self._remove(key)
+                self._num_invalidated += 1
+                return
+            cached.events.append(stored_event)
+            num_bytes = len(stored_event.topic) + len(stored_event.state)
+            cached.num_bytes += num_bytes
+            self._num_bytes += num_bytes
+        self._evict()
+
+    def _remove(self, key: str) -> None:
+        cached = self._streams.pop(key)
+        self._num_bytes -= len(key) + cached.num_bytes
+
+    def _evict(self) -> None:
+        while self._num_bytes > self.max_bytes and self._streams:
+            self._remove(next(iter(self._streams)))
+
+    def _start_subscription(self) -> None:
+        if self._is_started:
+            return
+        with self._lock:
+            if self._is_started or self._is_closed:
+                return
+            self._is_started = True
+            # Subscribe before the first stream is read, so that the events
+            # recorded after that stream was read are received.
+            try:
+                self._subscription = self.client.subscribe_to_all(
+                    commit_position=self.client.get_commit_position(),
+                    **self.notification_filter.options(),
+                )
+            except Exception as e:
+                # Cached streams are still selected by reading the new events.
+                self.last_error = e
+                return
+            self._thread = Thread(
+                target=self._apply_recorded_events,
+                args=(self._subscription,),
+                name="kurrentdb-stream-cache",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _apply_recorded_events(self, subscription: AbstractCatchupSubscription) -> None:
+        try:
+            for recorded_event in subscription:
+                self._apply(recorded_event)
+        except Exception as e:
+            with self._lock:
+                if not self._is_closed:
+                    self.last_error = e
+
+    def _apply(self, recorded_event: RecordedEvent) -> None:
+        with self._lock:
+            cached = self._streams.get(recorded_event.stream_name)
+            if cached is None:
+                return
+            if recorded_event.stream_position == cached.next_version:
+                self._num_appended += 1
+            self._extend(
+                recorded_event.stream_name,
+                cached,
+                [
+                    StoredEvent(
+                        originator_id=cached.originator_id,
+                        originator_version=recorded_event.stream_position,
+                        topic=recorded_event.type,
+                        state=recorded_event.data,
+                    )
+                ],
+            )
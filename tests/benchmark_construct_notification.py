@@ -0,0 +1,78 @@
+"""
+Measures the number of notifications constructed per second from recorded
+events, as subscriptions do with construct_notification(), and as consumers of
+select_notifications() do when they access the items of a batch, with UUIDs
+validated. The events belong to a number of "hot" aggregates, and have a small
+number of topics, so that the effect of caching the originator IDs can be seen
+by comparing with a recorder that doesn't cache them.
+
+    python -m tests.benchmark_construct_notification
+"""
+
+from __future__ import annotations
+
+import sys
+from time import perf_counter
+from uuid import uuid4
+
+from kurrentdbclient import RecordedEvent
+
+from eventsourcing_kurrentdb.notifications import NotificationBatch
+from eventsourcing_kurrentdb.recorders import KurrentDBApplicationRecorder
+from tests.fake_client import FakeKurrentDBClient
+
+
+def main(
+    num_events: int = 200000, num_aggregates: int = 500, num_topics: int = 50
+) -> None:
+    stream_names = [str(uuid4()) for _ in range(num_aggregates)]
+    # Topics are decoded as new strings for each event.
+    topics = [f"bench.domain:Aggregate.Event{i}" for i in range(num_topics)]
+    recorded_events = [
+        RecordedEvent(
+            type="".join(topics[i % num_topics]),
+            data=b"{}",
+            metadata=b"",
+            content_type="application/octet-stream",
+            id=uuid4(),
+            stream_name=stream_names[i % num_aggregates],
+            stream_position=i // num_aggregates,
+            commit_position=i,
+            prepare_position=i,
+        )
+        for i in range(num_events)
+    ]
+
+    for maxsize in (0, 10000):
+        recorder = KurrentDBApplicationRecorder(
+            FakeKurrentDBClient(),  # type: ignore[arg-type]
+            originator_id_cache_maxsize=maxsize,
+        )
+        recorder.validate_uuids = True
+        name = "cached" if maxsize else "not cached"
+
+        started = perf_counter()
+        for recorded_event in recorded_events:
+            recorder.construct_notification(recorded_event)
+        duration = perf_counter() - started
+        print(
+            f"construct_notification() {name:>10}: "
+            f"{num_events / duration:,.0f} notifications/s"
+        )
+
+        # Originator IDs are constructed when events are appended to the batch.
+        started = perf_counter()
+        batch = NotificationBatch(recorder._get_originator_id)
+        for recorded_event in recorded_events:
+            batch.append(recorded_event)
+        for _ in batch:
+            pass
+        duration = perf_counter() - started
+        print(
+            f"NotificationBatch        {name:>10}: "
+            f"{num_events / duration:,.0f} notifications/s"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,71 @@
+"""
+Compares reading notifications of a rare topic from the "$et-" streams of the
+$by_event_type system projection with reading them from a filtered $all read,
+on a synthetic store held by the fake client. The fake client scans $all like
+the server does for a filtered read, so the difference in the number of events
+scanned is what the timings show.
+
+    python -m tests.benchmark_event_type_streams
+"""
+
+from __future__ import annotations
+
+import sys
+from time import perf_counter
+from uuid import uuid4
+
+from eventsourcing.persistence import StoredEvent
+
+from eventsourcing_kurrentdb.recorders import KurrentDBApplicationRecorder
+from tests.fake_client import FakeKurrentDBClient
+
+
+def main(num_events: int = 100000, rare_every: int = 1000, page_size: int = 10) -> None:
+    client = FakeKurrentDBClient(by_event_type_projection=True)
+    writer = KurrentDBApplicationRecorder(
+        client=client,  # type: ignore[arg-type]
+        multi_stream_appends=True,
+    )
+    batch = []
+    for i in range(num_events):
+        topic = "rare" if i % rare_every == 0 else f"common{i % 7}"
+        batch.append(
+            StoredEvent(
+                originator_id=uuid4(), originator_version=0, topic=topic, state=b"{}"
+            )
+        )
+        if len(batch) == 1000:
+            writer.insert_events(batch)
+            batch = []
+    writer.insert_events(batch)
+
+    for event_type_streams in (False, True):
+        recorder = KurrentDBApplicationRecorder(
+            client=client,  # type: ignore[arg-type]
+            event_type_streams=event_type_streams,
+        )
+        client.reset_calls()
+        started = perf_counter()
+        start = None
+        num_read = 0
+        while True:
+            notifications = recorder.select_notifications(
+                start=start,
+                limit=page_size,
+                topics=["rare"],
+                inclusive_of_start=start is None,
+            )
+            if not notifications:
+                break
+            num_read += len(notifications)
+            start = notifications[-1].id
+        duration = perf_counter() - started
+        label = "$et- streams" if event_type_streams else "filtered $all"
+        print(
+            f"{label:>14}: {num_read} notifications in {duration:.3f}s, "
+            f"{client.round_trips} requests"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
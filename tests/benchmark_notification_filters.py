@@ -0,0 +1,92 @@
+"""
+Compares the cost of the filters that select the notifications of an
+application from $all, in a store where most events are snapshots. The fake
+client evaluates the filters in the same way as the server, by testing every
+event in $all against either regular expressions or prefixes, so the timings
+show the relative cost of each kind of filter.
+
+    python -m tests.benchmark_notification_filters
+"""
+
+from __future__ import annotations
+
+import sys
+from time import perf_counter
+from uuid import uuid4
+
+from eventsourcing.persistence import StoredEvent
+
+from eventsourcing_kurrentdb.filters import NotificationFilter
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBAggregateRecorder,
+    KurrentDBApplicationRecorder,
+)
+from tests.fake_client import FakeKurrentDBClient
+
+
+def main(num_events: int = 20000, snapshots_per_event: int = 4) -> None:
+    client = FakeKurrentDBClient()
+    recorder = KurrentDBApplicationRecorder(
+        client=client,  # type: ignore[arg-type]
+        multi_stream_appends=True,
+    )
+    snapshots = KurrentDBAggregateRecorder(
+        client=client,  # type: ignore[arg-type]
+        for_snapshotting=True,
+    )
+    for i in range(num_events):
+        originator_id = uuid4()
+        recorder.insert_events(
+            [
+                StoredEvent(
+                    originator_id=originator_id,
+                    originator_version=0,
+                    topic=f"bench.events:Event{i % 7}",
+                    state=b"{}",
+                )
+            ]
+        )
+        for v in range(snapshots_per_event):
+            snapshots.insert_events(
+                [
+                    StoredEvent(
+                        originator_id=originator_id,
+                        originator_version=v,
+                        topic="bench.events:Snapshot",
+                        state=b"{}",
+                    )
+                ]
+            )
+
+    notification_filters = {
+        "event type regex": NotificationFilter.exclude_types(".*Snapshot"),
+        "stream name regex": NotificationFilter.exclude_streams("snapshot-$"),
+        "event type prefix": NotificationFilter.include_type_prefixes(
+            *(f"bench.events:Event{i}" for i in range(7))
+        ),
+        "stream name prefix": NotificationFilter.include_stream_prefixes(
+            *"0123456789abcdef"
+        ),
+    }
+    for name, notification_filter in notification_filters.items():
+        recorder.notification_filter = notification_filter
+        started = perf_counter()
+        start = None
+        num_read = 0
+        while True:
+            notifications = recorder.select_notifications(
+                start=start, limit=1000, inclusive_of_start=start is None
+            )
+            num_read += len(notifications)
+            if len(notifications) < 1000:
+                break
+            start = notifications[-1].id
+        duration = perf_counter() - started
+        print(
+            f"{name:>18}: {num_read} notifications of {len(client._all)} events "
+            f"in {duration:.3f}s ({num_read / duration:,.0f}/s)"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,80 @@
+"""
+Shows the effect of the page size on the throughput of reading all the
+notifications of an application with select_notifications(), as a subscription
+hub does when a subscription catches up (see KURRENTDB_READ_PAGE_SIZE). The
+fake client holds a synthetic store, and each request is delayed by a
+simulated round trip, so that the timings show how the cost of the round
+trips is spread over larger pages.
+
+    python -m tests.benchmark_read_page_size
+"""
+
+from __future__ import annotations
+
+import sys
+from time import perf_counter, sleep
+from typing import Any
+from uuid import uuid4
+
+from eventsourcing.persistence import StoredEvent
+
+from eventsourcing_kurrentdb.recorders import KurrentDBApplicationRecorder
+from tests.fake_client import FakeKurrentDBClient, FakeReadResponse
+
+
+class SlowFakeKurrentDBClient(FakeKurrentDBClient):
+    def __init__(self, *args: Any, round_trip_seconds: float, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.round_trip_seconds = round_trip_seconds
+
+    def read_all(self, *args: Any, **kwargs: Any) -> FakeReadResponse:
+        sleep(self.round_trip_seconds)
+        return super().read_all(*args, **kwargs)
+
+
+def main(num_events: int = 50000, round_trip_us: int = 500) -> None:
+    client = SlowFakeKurrentDBClient(round_trip_seconds=round_trip_us / 1e6)
+    recorder = KurrentDBApplicationRecorder(
+        client=client,  # type: ignore[arg-type]
+        multi_stream_appends=True,
+    )
+    batch = []
+    for i in range(num_events):
+        batch.append(
+            StoredEvent(
+                originator_id=uuid4(),
+                originator_version=0,
+                topic=f"topic{i % 7}",
+                state=b"{}",
+            )
+        )
+        if len(batch) == 1000:
+            recorder.insert_events(batch)
+            batch = []
+    recorder.insert_events(batch)
+
+    for page_size in (10, 100, 500, 1000, 5000):
+        client.reset_calls()
+        started = perf_counter()
+        start = None
+        num_read = 0
+        while True:
+            notifications = recorder.select_notifications(
+                start=start,
+                limit=page_size,
+                inclusive_of_start=start is None,
+            )
+            num_read += len(notifications)
+            if len(notifications) < page_size:
+                break
+            start = notifications[-1].id
+        duration = perf_counter() - started
+        print(
+            f"page size {page_size:>5}: {num_read} notifications in "
+            f"{duration:.3f}s ({num_read / duration:,.0f}/s), "
+            f"{client.round_trips} requests"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -1 +1,42 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+from eventsourcing.persistence import StoredEvent
+
+from eventsourcing_kurrentdb.recorders import KurrentDBApplicationRecorder
+
+if TYPE_CHECKING:
+    from uuid import UUID
+
+    from kurrentdbclient import KurrentDBClient
+
 INSECURE_CONNECTION_STRING = "esdb://localhost:2113?Tls=False"
+
+
+def new_stored_event(
+    originator_id: UUID | str | None = None,
+    originator_version: int = 0,
+    topic: str = "topic1",
+    state: bytes = b"{}",
+) -> StoredEvent:
+    """
+    Returns a stored event, of a new aggregate if no ID is given.
+    """
+    return StoredEvent(
+        originator_id=uuid4() if originator_id is None else originator_id,
+        originator_version=originator_version,
+        topic=topic,
+        state=state,
+    )
+
+
+def supports_multi_stream_appends(client: KurrentDBClient) -> bool:
+    """
+    Returns True if the server supports multi-stream appends (KurrentDB 25.1
+    or later). Events of two new aggregates are recorded to find out.
+    """
+    recorder = KurrentDBApplicationRecorder(client, multi_stream_appends=True)
+    recorder.insert_events([new_stored_event(), new_stored_event()])
+    return recorder._is_multi_stream_append_supported
@@ -0,0 +1,696 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import re
+import sys
+import zlib
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Iterable, Iterator
+from itertools import islice
+from threading import Condition
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from kurrentdbclient import (
+    DEFAULT_EXCLUDE_FILTER,
+    NewEvent,
+    NewEvents,
+    RecordedEvent,
+    StreamState,
+)
+from kurrentdbclient.exceptions import (
+    AlreadyExistsError,
+    GrpcError,
+    NotFoundError,
+    WrongCurrentVersionError,
+)
+
+if TYPE_CHECKING:
+    from uuid import UUID
+
+    from typing_extensions import Self
+
+
+class FakeReadResponse(Iterator[RecordedEvent]):
+    def __init__(self, recorded_events: Iterable[RecordedEvent]):
+        self._recorded_events = iter(recorded_events)
+        self._is_stopped = False
+
+    def __next__(self) -> RecordedEvent:
+        if self._is_stopped:
+            raise StopIteration
+        return next(self._recorded_events)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.stop()
+
+    def stop(self) -> None:
+        self._is_stopped = True
+
+
+class FakeCatchupSubscription(Iterator[RecordedEvent]):
+    def __init__(
+        self,
+        client: FakeKurrentDBClient,
+        commit_position: int | None,
+        match: Any,
+        fault: Fault | None = None,
+    ):
+        self._client = client
+        self._commit_position = commit_position or 0
+        self._match = match
+        self._fault = fault
+        self._is_stopped = False
+
+    def __next__(self) -> RecordedEvent:
+        if self._fault is not None:
+            if self._fault.after == 0:
+                raise self._fault.error
+            self._fault = self._fault._replace(after=self._fault.after - 1)
+        while True:
+            with self._client._condition:
+                recorded_event = self._client._condition.wait_for(
+                    lambda: self._is_stopped or self._find_next(), timeout=0.1
+                )
+            if self._is_stopped:
+                raise StopIteration
+            if isinstance(recorded_event, RecordedEvent):
+                self._commit_position = recorded_event.commit_position
+                return recorded_event
+
+    def _find_next(self) -> RecordedEvent | None:
+        for recorded_event in self._client._all:
+            if recorded_event.commit_position > self._commit_position:
+                if self._match(recorded_event):
+                    return recorded_event
+                self._commit_position = recorded_event.commit_position
+        return None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.stop()
+
+    def stop(self) -> None:
+        with self._client._condition:
+            self._is_stopped = True
+            self._client._condition.notify_all()
+
+
+class Fault(NamedTuple):
+    after: int
+    """Number of events returned before the error is raised."""
+    error: Exception
+
+
+class FakeConsumerGroup:
+    """
+    Dispatches events to the consumers of a persistent subscription. With
+    the "Pinned" strategy, the events of each stream are always dispatched
+    to the same consumer, otherwise to whichever consumer asks first.
+    """
+
+    def __init__(self, commit_position: int | None, match: Any, consumer_strategy: str):
+        self.commit_position = -1 if commit_position is None else commit_position - 1
+        self.match = match
+        self.consumer_strategy = consumer_strategy
+        self.consumers: list[FakePersistentSubscription] = []
+        self.undispatched: list[RecordedEvent] = []
+
+    def pull(self, all_events: list[RecordedEvent]) -> None:
+        for recorded_event in all_events:
+            if recorded_event.commit_position > self.commit_position:
+                self.commit_position = recorded_event.commit_position
+                if self.match(recorded_event):
+                    self.undispatched.append(recorded_event)
+
+    def take(self, consumer: FakePersistentSubscription) -> RecordedEvent | None:
+        for i, recorded_event in enumerate(self.undispatched):
+            if self.consumer_strategy == "Pinned":
+                index = zlib.crc32(recorded_event.stream_name.encode())
+                if self.consumers[index % len(self.consumers)] is not consumer:
+                    continue
+            return self.undispatched.pop(i)
+        return None
+
+    def redeliver(self, recorded_events: Iterable[RecordedEvent]) -> None:
+        self.undispatched.extend(recorded_events)
+        self.undispatched.sort(key=lambda e: e.commit_position)
+
+
+class FakePersistentSubscription(Iterator[RecordedEvent]):
+    def __init__(
+        self, client: FakeKurrentDBClient, group: FakeConsumerGroup, buffer_size: int
+    ):
+        self._client = client
+        self._group = group
+        self.buffer_size = buffer_size
+        self.in_flight: dict[UUID, RecordedEvent] = {}
+        self.acked: list[UUID] = []
+        self.nacked: list[tuple[UUID, str]] = []
+        self._is_stopped = False
+        self.subscription_id = str(id(self))
+        group.consumers.append(self)
+
+    def __next__(self) -> RecordedEvent:
+        while True:
+            with self._client._condition:
+                if self._is_stopped:
+                    raise StopIteration
+                self._group.pull(self._client._all)
+                if len(self.in_flight) < self.buffer_size:
+                    recorded_event = self._group.take(self)
+                    if recorded_event is not None:
+                        self.in_flight[recorded_event.id] = recorded_event
+                        return recorded_event
+                self._client._condition.wait(timeout=0.1)
+
+    def ack(self, item: UUID | RecordedEvent) -> None:
+        event_id = item.id if isinstance(item, RecordedEvent) else item
+        with self._client._condition:
+            del self.in_flight[event_id]
+            self.acked.append(event_id)
+            self._client._condition.notify_all()
+
+    def nack(self, item: UUID | RecordedEvent, action: str) -> None:
+        event_id = item.id if isinstance(item, RecordedEvent) else item
+        with self._client._condition:
+            recorded_event = self.in_flight.pop(event_id)
+            self.nacked.append((event_id, action))
+            if action == "retry":
+                retry_count = (recorded_event.retry_count or 0) + 1
+                self._group.redeliver(
+                    [dataclasses.replace(recorded_event, retry_count=retry_count)]
+                )
+            self._client._condition.notify_all()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.stop()
+
+    def stop(self) -> None:
+        with self._client._condition:
+            if not self._is_stopped:
+                self._is_stopped = True
+                # Unacknowledged events are dispatched to the other consumers.
+                self._group.consumers.remove(self)
+                self._group.redeliver(self.in_flight.values())
+                self.in_flight.clear()
+            self._client._condition.notify_all()
+
+
+class FakeKurrentDBClient:
+    """
+    In-process stand-in for KurrentDBClient, which records streams in memory
+    and counts the number of calls made to each method ("round trips").
+    """
+
+    COMMIT_POSITION_STEP = 17
+
+    def __init__(
+        self,
+        uri: str | None = None,
+        root_certificates: str | None = None,
+        *,
+        supports_multi_append: bool = True,
+        by_event_type_projection: bool = False,
+        by_category_projection: bool = False,
+    ) -> None:
+        self.uri = uri
+        self.root_certificates = root_certificates
+        self.supports_multi_append = supports_multi_append
+        self.by_event_type_projection = by_event_type_projection
+        self.by_category_projection = by_category_projection
+        self.is_closed = False
+        self.calls: Counter[str] = Counter()
+        self._streams: dict[str, list[RecordedEvent]] = {}
+        self._all: list[RecordedEvent] = []
+        self._links: dict[UUID, RecordedEvent] = {}
+        self._metadata: dict[str, dict[str, Any]] = {}
+        self._groups: dict[str, FakeConsumerGroup] = {}
+        self._unprojected: list[RecordedEvent] = []
+        self._commit_position = 0
+        self._condition = Condition()
+        self._lock = self._condition
+
+    @property
+    def round_trips(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_calls(self) -> None:
+        self.calls.clear()
+
+    def append_events(
+        self,
+        stream_name: str,
+        *,
+        events: Iterable[NewEvent],
+        current_version: int | StreamState,
+        timeout: float | None = None,
+    ) -> int:
+        self.calls["append_events"] += 1
+        with self._lock:
+            self._check_current_version(stream_name, current_version)
+            commit_position = self._append(stream_name, events)
+            self._project()
+            return commit_position
+
+    def multi_append_to_stream(
+        self,
+        events: NewEvents | Iterable[NewEvents],
+        *,
+        timeout: float | None = None,
+    ) -> int:
+        self.calls["multi_append_to_stream"] += 1
+        if not self.supports_multi_append:
+            msg = "status = StatusCode.UNIMPLEMENTED"
+            raise GrpcError(msg)
+        if isinstance(events, NewEvents):
+            events = [events]
+        events = list(events)
+        with self._lock:
+            for new_events in events:
+                self._check_current_version(
+                    new_events.stream_name, new_events.current_version
+                )
+            commit_position = 0
+            for new_events in events:
+                commit_position = self._append(
+                    new_events.stream_name, new_events.events
+                )
+            self._project()
+            return commit_position
+
+    def read_stream(
+        self,
+        stream_name: str,
+        *,
+        stream_position: int | None = None,
+        backwards: bool = False,
+        resolve_links: bool = False,
+        limit: int = sys.maxsize,
+        timeout: float | None = None,
+    ) -> FakeReadResponse:
+        self.calls["read_stream"] += 1
+        with self._lock:
+            stream = self._streams.get(stream_name)
+            if stream is None:
+                return FakeReadResponse(self._raise_not_found(stream_name))
+            if backwards:
+                if stream_position is None:
+                    selected = stream[::-1]
+                else:
+                    selected = stream[: stream_position + 1][::-1]
+            else:
+                selected = stream[stream_position or 0 :]
+            max_count = self._metadata.get(stream_name, {}).get("$maxCount")
+            if max_count is not None:
+                # Like a scavenged stream, which has only the last events.
+                truncated = len(stream) - max_count
+                selected = [e for e in selected if e.stream_position >= truncated]
+            selected = selected[:limit]
+            if resolve_links:
+                selected = [self._resolve_link(e) for e in selected]
+            return FakeReadResponse(selected)
+
+    def get_current_version(
+        self, stream_name: str, *, timeout: float | None = None
+    ) -> int | StreamState:
+        self.calls["get_current_version"] += 1
+        with self._lock:
+            stream = self._streams.get(stream_name)
+            if not stream:
+                return StreamState.NO_STREAM
+            return stream[-1].stream_position
+
+    def set_stream_metadata(
+        self,
+        stream_name: str,
+        *,
+        metadata: dict[str, Any],
+        current_version: int | StreamState = StreamState.ANY,
+        timeout: float | None = None,
+    ) -> None:
+        self.calls["set_stream_metadata"] += 1
+        with self._lock:
+            self._metadata[stream_name] = dict(metadata)
+
+    def get_stream_metadata(
+        self, stream_name: str, *, timeout: float | None = None
+    ) -> tuple[dict[str, Any], int | StreamState]:
+        self.calls["get_stream_metadata"] += 1
+        with self._lock:
+            if stream_name not in self._metadata:
+                return {}, StreamState.NO_STREAM
+            return dict(self._metadata[stream_name]), 0
+
+    def read_all(
+        self,
+        *,
+        commit_position: int | None = None,
+        backwards: bool = False,
+        resolve_links: bool = False,
+        filter_exclude: Iterable[str] = DEFAULT_EXCLUDE_FILTER,
+        filter_include: Iterable[str] = (),
+        filter_by_stream_name: bool = False,
+        filter_by_prefix: bool = False,
+        limit: int = sys.maxsize,
+        timeout: float | None = None,
+    ) -> FakeReadResponse:
+        self.calls["read_all"] += 1
+        match = self._construct_filter(
+            filter_exclude,
+            filter_include,
+            filter_by_stream_name=filter_by_stream_name,
+            filter_by_prefix=filter_by_prefix,
+        )
+        # The event at index i of $all has commit position STEP * (i + 1), so
+        # reads start without scanning the events before the commit position.
+        with self._lock:
+            end = len(self._all)
+        if backwards:
+            # Like the server, doesn't include the event at the commit position.
+            if commit_position is not None:
+                end = min(end, -(-commit_position // self.COMMIT_POSITION_STEP) - 1)
+            indexes = range(end - 1, -1, -1)
+        else:
+            start = 0
+            if commit_position is not None:
+                start = max(0, -(-commit_position // self.COMMIT_POSITION_STEP) - 1)
+            indexes = range(start, end)
+        # Events are scanned lazily, like the server, which stops at the limit.
+        recorded_events = (self._all[i] for i in indexes)
+        return FakeReadResponse(islice(filter(match, recorded_events), limit))
+
+    def get_commit_position(
+        self,
+        *,
+        filter_exclude: Iterable[str] = DEFAULT_EXCLUDE_FILTER,
+        filter_include: Iterable[str] = (),
+        filter_by_stream_name: bool = False,
+        timeout: float | None = None,
+    ) -> int:
+        self.calls["get_commit_position"] += 1
+        match = self._construct_filter(
+            filter_exclude,
+            filter_include,
+            filter_by_stream_name=filter_by_stream_name,
+        )
+        with self._lock:
+            for recorded_event in reversed(self._all):
+                if match(recorded_event):
+                    return recorded_event.commit_position
+        return 0
+
+    def subscribe_to_all(
+        self,
+        *,
+        commit_position: int | None = None,
+        filter_exclude: Iterable[str] = DEFAULT_EXCLUDE_FILTER,
+        filter_include: Iterable[str] = (),
+        filter_by_stream_name: bool = False,
+        filter_by_prefix: bool = False,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> FakeCatchupSubscription:
+        self.calls["subscribe_to_all"] += 1
+        match = self._construct_filter(
+            filter_exclude,
+            filter_include,
+            filter_by_stream_name=filter_by_stream_name,
+            filter_by_prefix=filter_by_prefix,
+        )
+        return FakeCatchupSubscription(self, commit_position, match)
+
+    def create_subscription_to_all(
+        self,
+        group_name: str,
+        *,
+        commit_position: int | None = None,
+        filter_exclude: Iterable[str] = DEFAULT_EXCLUDE_FILTER,
+        filter_include: Iterable[str] = (),
+        filter_by_stream_name: bool = False,
+        consumer_strategy: str = "DispatchToSingle",
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self.calls["create_subscription_to_all"] += 1
+        with self._lock:
+            if group_name in self._groups:
+                msg = f"Subscription group {group_name!r} already exists"
+                raise AlreadyExistsError(msg)
+            self._groups[group_name] = FakeConsumerGroup(
+                commit_position=commit_position,
+                match=self._construct_filter(
+                    filter_exclude,
+                    filter_include,
+                    filter_by_stream_name=filter_by_stream_name,
+                ),
+                consumer_strategy=consumer_strategy,
+            )
+
+    def read_subscription_to_all(
+        self,
+        group_name: str,
+        *,
+        event_buffer_size: int = 150,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> FakePersistentSubscription:
+        self.calls["read_subscription_to_all"] += 1
+        with self._lock:
+            group = self._groups.get(group_name)
+            if group is None:
+                msg = f"Subscription group {group_name!r} not found"
+                raise NotFoundError(msg)
+            return FakePersistentSubscription(self, group, event_buffer_size)
+
+    def close(self) -> None:
+        self.is_closed = True
+
+    def _check_current_version(
+        self, stream_name: str, current_version: int | StreamState
+    ) -> None:
+        stream = self._streams.get(stream_name)
+        actual = stream[-1].stream_position if stream else StreamState.NO_STREAM
+        if current_version is StreamState.ANY:
+            return
+        if current_version is StreamState.EXISTS:
+            ok = actual is not StreamState.NO_STREAM
+        else:
+            ok = actual == current_version
+        if not ok:
+            msg = f"Stream {stream_name!r} is at version {actual}"
+            raise WrongCurrentVersionError(msg)
+
+    def _append(self, stream_name: str, events: Iterable[NewEvent]) -> int:
+        stream = self._streams.setdefault(stream_name, [])
+        for new_event in events:
+            self._commit_position += self.COMMIT_POSITION_STEP
+            recorded_event = RecordedEvent(
+                type=new_event.type,
+                data=new_event.data,
+                metadata=new_event.metadata,
+                content_type=new_event.content_type,
+                id=new_event.id,
+                stream_name=stream_name,
+                stream_position=len(stream),
+                commit_position=self._commit_position,
+                prepare_position=self._commit_position,
+            )
+            stream.append(recorded_event)
+            self._all.append(recorded_event)
+            self._unprojected.append(recorded_event)
+        self._condition.notify_all()
+        return self._commit_position
+
+    def _project(self) -> None:
+        # Like the $by_event_type and $by_category system projections, but
+        # appends links to the "$et-" and "$ce-" streams as soon as the events
+        # have been recorded.
+        unprojected, self._unprojected = self._unprojected, []
+        for recorded_event in unprojected:
+            if self.by_event_type_projection:
+                self._link(recorded_event, "$et-" + recorded_event.type)
+            category, separator, _ = recorded_event.stream_name.partition("-")
+            if (
+                self.by_category_projection
+                and separator
+                and not category.startswith("$")
+            ):
+                self._link(recorded_event, "$ce-" + category)
+        # Don't project the links.
+        self._unprojected.clear()
+
+    def _link(self, recorded_event: RecordedEvent, stream_name: str) -> None:
+        link = NewEvent(
+            type="$>",
+            data=f"{recorded_event.stream_position}@{recorded_event.stream_name}".encode(),
+        )
+        self._links[link.id] = recorded_event
+        self._append(stream_name, [link])
+
+    def _resolve_link(self, recorded_event: RecordedEvent) -> RecordedEvent:
+        original = self._links.get(recorded_event.id)
+        if original is None:
+            return recorded_event
+        return dataclasses.replace(original, link=recorded_event)
+
+    @staticmethod
+    def _raise_not_found(stream_name: str) -> Iterator[RecordedEvent]:
+        msg = f"Stream {stream_name!r} not found"
+        raise NotFoundError(msg)
+        yield  # pragma: no cover
+
+    @staticmethod
+    def _construct_filter(
+        filter_exclude: Iterable[str],
+        filter_include: Iterable[str],
+        *,
+        filter_by_stream_name: bool = False,
+        filter_by_prefix: bool = False,
+    ) -> Any:
+        include = tuple(filter_include)
+        exclude = tuple(filter_exclude)
+
+        def match(recorded_event: RecordedEvent) -> bool:
+            value = (
+                recorded_event.stream_name
+                if filter_by_stream_name
+                else recorded_event.type
+            )
+            if filter_by_prefix:
+                return value.startswith(include)
+            if include:
+                return re.match("^(" + "|".join(include) + ")$", value) is not None
+            return not any(re.match(p + "$", value) for p in exclude)
+
+        return match
+
+
+class FaultyKurrentDBClient(FakeKurrentDBClient):
+    """
+    Fake client which injects errors into catch-up subscriptions, like
+    a client whose connection to the database is unreliable.
+    """
+
+    def __init__(self, *args: Any, resume_inclusive: bool = False, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # If True, resumed subscriptions also return the event at the
+        # commit position, so that duplicates can be detected.
+        self.resume_inclusive = resume_inclusive
+        self.subscribe_errors: deque[Exception] = deque()
+        self.subscription_faults: deque[Fault] = deque()
+
+    def fail_subscribe(self, *errors: Exception) -> None:
+        """Makes the next calls to subscribe_to_all() raise the given errors."""
+        self.subscribe_errors.extend(errors)
+
+    def fail_subscription(self, after: int, error: Exception) -> None:
+        """Makes the next subscription raise the error after 'after' events."""
+        self.subscription_faults.append(Fault(after, error))
+
+    def subscribe_to_all(
+        self, *, commit_position: int | None = None, **kwargs: Any
+    ) -> FakeCatchupSubscription:
+        if self.subscribe_errors:
+            self.calls["subscribe_to_all"] += 1
+            raise self.subscribe_errors.popleft()
+        if self.resume_inclusive and commit_position:
+            commit_position -= 1
+        subscription = super().subscribe_to_all(
+            commit_position=commit_position, **kwargs
+        )
+        if self.subscription_faults:
+            subscription._fault = self.subscription_faults.popleft()
+        return subscription
+
+
+class FakeAsyncReadResponse(AsyncIterator[RecordedEvent]):
+    def __init__(self, response: Iterator[RecordedEvent]):
+        self._response = response
+
+    async def __anext__(self) -> RecordedEvent:
+        await asyncio.sleep(0)
+        try:
+            return next(self._response)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.stop()
+
+    async def stop(self) -> None:
+        stop = getattr(self._response, "stop", None)
+        if stop is not None:
+            stop()
+
+
+class FakeAsyncCatchupSubscription(FakeAsyncReadResponse):
+    async def __anext__(self) -> RecordedEvent:
+        # Don't block the event loop whilst waiting for new events.
+        try:
+            return await asyncio.to_thread(next, self._response)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class FakeAsyncKurrentDBClient:
+    """
+    In-process stand-in for AsyncKurrentDBClient, which delegates to a
+    FakeKurrentDBClient, so that both clients can share the same streams.
+    """
+
+    def __init__(
+        self,
+        uri: str | None = None,
+        root_certificates: str | None = None,
+        *,
+        sync_client: FakeKurrentDBClient | None = None,
+    ) -> None:
+        self.sync_client = sync_client or FakeKurrentDBClient(
+            uri=uri, root_certificates=root_certificates
+        )
+        self.is_closed = False
+
+    async def connect(self) -> None:
+        pass
+
+    async def append_events(self, *args: Any, **kwargs: Any) -> int:
+        await asyncio.sleep(0)
+        return self.sync_client.append_events(*args, **kwargs)
+
+    async def multi_append_to_stream(self, *args: Any, **kwargs: Any) -> int:
+        await asyncio.sleep(0)
+        return self.sync_client.multi_append_to_stream(*args, **kwargs)
+
+    async def read_stream(self, *args: Any, **kwargs: Any) -> FakeAsyncReadResponse:
+        return FakeAsyncReadResponse(self.sync_client.read_stream(*args, **kwargs))
+
+    async def read_all(self, *args: Any, **kwargs: Any) -> FakeAsyncReadResponse:
+        return FakeAsyncReadResponse(self.sync_client.read_all(*args, **kwargs))
+
+    async def get_current_version(self, *args: Any, **kwargs: Any) -> int | StreamState:
+        return self.sync_client.get_current_version(*args, **kwargs)
+
+    async def get_commit_position(self, *args: Any, **kwargs: Any) -> int:
+        return self.sync_client.get_commit_position(*args, **kwargs)
+
+    async def subscribe_to_all(
+        self, *args: Any, **kwargs: Any
+    ) -> FakeAsyncCatchupSubscription:
+        return FakeAsyncCatchupSubscription(
+            self.sync_client.subscribe_to_all(*args, **kwargs)
+        )
+
+    async def close(self) -> None:
+        self.is_closed = True
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+from unittest import IsolatedAsyncioTestCase, TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import InfrastructureFactory, IntegrityError
+from eventsourcing.utils import Environment
+from kurrentdbclient import NewEvent, StreamState
+
+from eventsourcing_kurrentdb.asyncio_recorders import (
+    AsyncKurrentDBAggregateRecorder,
+    AsyncKurrentDBApplicationRecorder,
+)
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import StreamTail
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeAsyncKurrentDBClient, FakeKurrentDBClient
+
+
+class TestAsyncKurrentDBApplicationRecorder(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.client = FakeAsyncKurrentDBClient()
+        self.recorder = AsyncKurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            multi_stream_appends=True,
+        )
+
+    async def test_insert_and_select_events(self) -> None:
+        originator_id = uuid4()
+        self.assertEqual(await self.recorder.select_events(originator_id), [])
+
+        notification_ids = await self.recorder.insert_events(
+            [new_stored_event(originator_id, 0), new_stored_event(originator_id, 1)]
+        )
+        assert notification_ids is not None
+        self.assertEqual(len(notification_ids), 2)
+
+        with self.assertRaises(IntegrityError):
+            await self.recorder.insert_events([new_stored_event(originator_id, 1)])
+
+        stored_events = await self.recorder.select_events(originator_id)
+        self.assertEqual([e.originator_version for e in stored_events], [0, 1])
+        stored_events = await self.recorder.select_events(originator_id, gt=0)
+        self.assertEqual([e.originator_version for e in stored_events], [1])
+        stored_events = await self.recorder.select_events(
+            originator_id, desc=True, limit=1
+        )
+        self.assertEqual([e.originator_version for e in stored_events], [1])
+        stored_events = await self.recorder.select_events(
+            originator_id, desc=True, lte=0
+        )
+        self.assertEqual([e.originator_version for e in stored_events], [0])
+
+    async def test_select_events_after(self) -> None:
+        originator_id = uuid4()
+        tail = await self.recorder.select_events_after(originator_id, None)
+        self.assertEqual(tail, StreamTail([], None))
+
+        await self.recorder.insert_events(
+            [new_stored_event(originator_id, v) for v in range(5)]
+        )
+        tail = await self.recorder.select_events_after(originator_id, 4)
+        self.assertEqual(tail, StreamTail([], 4))
+        tail = await self.recorder.select_events_after(originator_id, 2)
+        self.assertEqual([e.originator_version for e in tail.events], [3, 4])
+        tail = await self.recorder.select_events_after(originator_id, 0, page_size=2)
+        self.assertEqual([e.originator_version for e in tail.events], [1, 2, 3, 4])
+        self.assertEqual(tail.current_version, 4)
+
+    async def test_insert_events_in_many_streams(self) -> None:
+        self.client.sync_client.supports_multi_append = False
+        originator_id1 = uuid4()
+        originator_id2 = uuid4()
+        notification_ids = await self.recorder.insert_events(
+            [
+                new_stored_event(originator_id1, 0),
+                new_stored_event(originator_id2, 0),
+                new_stored_event(originator_id1, 1),
+            ]
+        )
+        assert notification_ids is not None
+        notifications = await self.recorder.select_notifications(start=None, limit=10)
+        self.assertEqual(sorted(notification_ids), [n.id for n in notifications])
+        self.assertEqual(len(await self.recorder.select_events(originator_id1)), 2)
+        self.assertEqual(len(await self.recorder.select_events(originator_id2)), 1)
+
+    async def test_select_notifications_and_subscribe(self) -> None:
+        originator_id = uuid4()
+        await self.recorder.insert_events([new_stored_event(originator_id, 0)])
+        await self.recorder.insert_events([new_stored_event(originator_id, 1)])
+
+        notifications = await self.recorder.select_notifications(start=None, limit=10)
+        self.assertEqual(len(notifications), 2)
+        max_notification_id = await self.recorder.max_notification_id()
+        self.assertEqual(max_notification_id, notifications[-1].id)
+
+        notifications = await self.recorder.select_notifications(
+            start=notifications[0].id, limit=10, inclusive_of_start=False
+        )
+        self.assertEqual(len(notifications), 1)
+
+        async with self.recorder.subscribe(gt=notifications[0].id) as subscription:
+            await self.recorder.insert_events([new_stored_event(originator_id, 2)])
+            notification = await subscription.__anext__()
+            self.assertEqual(notification.originator_version, 2)
+            await subscription.stop()
+            with self.assertRaises(StopAsyncIteration):
+                await subscription.__anext__()
+
+    async def test_system_event_types_are_excluded(self) -> None:
+        originator_id = uuid4()
+        await self.recorder.insert_events([new_stored_event(originator_id, 0)])
+        await self.client.append_events(
+            str(originator_id),
+            events=[NewEvent(type="$streamDeleted", data=b"")],
+            current_version=StreamState.ANY,
+        )
+        await self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+
+        notifications = await self.recorder.select_notifications(start=None, limit=2)
+        self.assertEqual(len(notifications), 2)
+        self.assertEqual(str(notifications[0].originator_id), str(originator_id))
+        async with self.recorder.subscribe() as subscription:
+            notification_ids = [(await subscription.__anext__()).id for _ in range(2)]
+        self.assertEqual(notification_ids, [n.id for n in notifications])
+
+    async def test_snapshots(self) -> None:
+        recorder = AsyncKurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+        )
+        originator_id = uuid4()
+        await recorder.insert_events([new_stored_event(originator_id, 2)])
+        await recorder.insert_events([new_stored_event(originator_id, 1)])
+        snapshots = await recorder.select_events(originator_id, desc=True, limit=1)
+        self.assertEqual([s.originator_version for s in snapshots], [2])
+
+
+class TestFactoryAsyncRecorders(TestCase):
+    def test_async_recorders(self) -> None:
+        env = Environment("TestCase")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        original_async_client_class = KurrentDBFactory.async_client_class
+        KurrentDBFactory.async_client_class = FakeAsyncKurrentDBClient  # type: ignore[assignment]
+        try:
+            factory = KurrentDBFactory(env)
+            recorder = factory.async_application_recorder()
+            self.assertIsInstance(recorder, AsyncKurrentDBApplicationRecorder)
+            snapshot_recorder = factory.async_aggregate_recorder("snapshots")
+            self.assertTrue(snapshot_recorder.for_snapshotting)
+            self.assertIs(recorder.client, snapshot_recorder.client)
+            self.assertIsInstance(recorder.client.sync_client, FakeKurrentDBClient)  # type: ignore[attr-defined]
+            asyncio.run(factory.aclose())
+            self.assertTrue(recorder.client.is_closed)
+            factory.close()
+        finally:
+            KurrentDBFactory.async_client_class = original_async_client_class
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from unittest import TestCase
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    InfrastructureFactoryError,
+    ProgrammingError,
+)
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.clients import KurrentDBClientPool
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from tests.common import INSECURE_CONNECTION_STRING
+from tests.fake_client import FakeKurrentDBClient
+
+if TYPE_CHECKING:
+    from kurrentdbclient import KurrentDBClient
+
+
+class TestKurrentDBClientPool(TestCase):
+    def test_get_and_put_client(self) -> None:
+        pool = KurrentDBClientPool(
+            client_class=FakeKurrentDBClient,  # type: ignore[arg-type]
+        )
+        self.assertEqual(pool.stats().num_clients, 0)
+
+        # Same settings, same client.
+        client1 = pool.get_client("kdb://host1")
+        client2 = pool.get_client("kdb://host1")
+        self.assertIs(client1, client2)
+        self.assertEqual(pool.stats().num_clients, 1)
+        self.assertEqual(pool.stats().num_references, 2)
+
+        # Different settings, different client.
+        client3 = pool.get_client("kdb://host1", root_certificates="certs")
+        client4 = pool.get_client("kdb://host2")
+        self.assertIsNot(client3, client1)
+        self.assertIsNot(client4, client1)
+        self.assertEqual(pool.stats().num_clients, 3)
+        self.assertEqual(pool.stats().num_references, 4)
+
+        # Client closed when last reference is put back.
+        pool.put_client(client1)
+        self.assertFalse(client1.is_closed)
+        self.assertEqual(pool.stats().num_clients, 3)
+        pool.put_client(client2)
+        self.assertTrue(client1.is_closed)
+        self.assertEqual(pool.stats().num_clients, 2)
+        self.assertEqual(pool.stats().num_references, 2)
+
+        # Can't put back a client that's already closed.
+        with self.assertRaises(ProgrammingError):
+            pool.put_client(client1)
+
+        # Get a new client after the previous one was closed.
+        client5 = pool.get_client("kdb://host1")
+        self.assertIsNot(client5, client1)
+        self.assertFalse(client5.is_closed)
+
+        # Close the pool.
+        pool.close()
+        self.assertTrue(client3.is_closed)
+        self.assertTrue(client4.is_closed)
+        self.assertTrue(client5.is_closed)
+        self.assertEqual(pool.stats().num_clients, 0)
+        self.assertEqual(pool.stats().num_references, 0)
+
+
+class TestFactoryClientPool(TestCase):
+    def setUp(self) -> None:
+        self.env = Environment("TestCase")
+        self.env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        self.env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        self.original_client_pool = KurrentDBFactory.client_pool
+        KurrentDBFactory.client_pool = KurrentDBClientPool(
+            client_class=FakeKurrentDBClient,  # type: ignore[arg-type]
+        )
+
+    def tearDown(self) -> None:
+        KurrentDBFactory.client_pool = self.original_client_pool
+
+    def test_factories_share_client(self) -> None:
+        pool = KurrentDBFactory.client_pool
+        factory1 = KurrentDBFactory(self.env)
+        factory2 = KurrentDBFactory(self.env)
+        self.assertIs(factory1.client, factory2.client)
+        self.assertEqual(pool.stats().num_clients, 1)
+        self.assertEqual(pool.stats().num_references, 2)
+
+        client = factory1.client
+        assert isinstance(client, FakeKurrentDBClient)
+        factory1.close()
+        factory1.close()  # idempotent
+        self.assertFalse(client.is_closed)
+        self.assertEqual(pool.stats().num_references, 1)
+
+        del factory2  # closed when garbage collected
+        self.assertTrue(client.is_closed)
+        self.assertEqual(pool.stats().num_clients, 0)
+
+    def test_invalid_settings_are_rejected_before_client_is_used(self) -> None:
+        pool = KurrentDBFactory.client_pool
+        for name, value in [
+            (KurrentDBFactory.KURRENTDB_SNAPSHOT_WRITER_MAXSIZE, "many"),
+            (KurrentDBFactory.KURRENTDB_STREAM_CACHE_MAX_BYTES, "1MB"),
+            (KurrentDBFactory.KURRENTDB_READ_AHEAD_DEPTH, "-1"),
+            (KurrentDBFactory.KURRENTDB_READ_AHEAD_MAX_BYTES, "0"),
+            (KurrentDBFactory.KURRENTDB_PERSISTENT_SUBSCRIPTION_MAX_IN_FLIGHT, "x"),
+            (KurrentDBFactory.KURRENTDB_SUBSCRIPTION_HUB_QUEUE_MAXSIZE, "-5"),
+            (KurrentDBFactory.KURRENTDB_CHECKPOINT_INTERVAL, "0"),
+            (KurrentDBFactory.KURRENTDB_CHECKPOINT_INTERVAL_MS, "1.5"),
+            (KurrentDBFactory.KURRENTDB_CHECKPOINT_MAX_COUNT, "ten"),
+            (KurrentDBFactory.KURRENTDB_SUBSCRIPTION_MAX_BACKOFF, "-1"),
+            (KurrentDBFactory.KURRENTDB_SUBSCRIPTION_MAX_RECONNECT_ATTEMPTS, "-1"),
+        ]:
+            with self.subTest(name=name, value=value):
+                env = Environment("TestCase", dict(self.env))
+                env[KurrentDBFactory.KURRENTDB_SNAPSHOT_WRITER] = "yes"
+                env[name] = value
+                with self.assertRaises(InfrastructureFactoryError) as cm:
+                    KurrentDBFactory(env)
+                self.assertIn(name, str(cm.exception))
+                self.assertEqual(pool.stats().num_references, 0)
+
+        # Zero disables the stream cache and reading ahead.
+        self.env[KurrentDBFactory.KURRENTDB_STREAM_CACHE_MAX_BYTES] = "0"
+        self.env[KurrentDBFactory.KURRENTDB_READ_AHEAD_DEPTH] = "0"
+        self.env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_MAX_RECONNECT_ATTEMPTS] = "0"
+        factory = KurrentDBFactory(self.env)
+        self.assertEqual(factory.stream_cache_max_bytes, 0)
+        self.assertEqual(factory.read_ahead_depth, 0)
+        self.assertEqual(factory.subscription_options["max_reconnect_attempts"], 0)
+        factory.close()
+
+    def test_clients_are_put_back_if_constructor_fails(self) -> None:
+        pool = KurrentDBFactory.client_pool
+        self.env[KurrentDBFactory.KURRENTDB_READER_URI] = "kdb://reader"
+        original_get_client = pool.get_client
+
+        def get_client(
+            uri: str, root_certificates: str | None = None
+        ) -> KurrentDBClient:
+            if uri == "kdb://reader":
+                msg = "Can't connect"
+                raise ValueError(msg)
+            return original_get_client(uri, root_certificates)
+
+        pool.get_client = get_client  # type: ignore[method-assign]
+        with self.assertRaises(ValueError):
+            KurrentDBFactory(self.env)
+        self.assertEqual(pool.stats().num_references, 0)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest import TestCase
+from uuid import uuid4
+
+from kurrentdbclient.exceptions import DeadlineExceededError
+
+from eventsourcing_kurrentdb.recorders import KurrentDBApplicationRecorder
+from tests.common import new_stored_event
+from tests.fake_client import FakeKurrentDBClient, FakeReadResponse
+
+
+class TestCommitPositions(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            multi_stream_appends=True,
+        )
+
+    def test_one_event_doesnt_read_back(self) -> None:
+        notification_ids = self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+
+        notifications = self.recorder.select_notifications(start=None, limit=10)
+        self.assertEqual(notification_ids, [n.id for n in notifications])
+        self.assertEqual(self.client.calls["append_events"], 1)
+        self.assertEqual(self.client.calls["read_all"], 1)
+
+    def test_many_events_in_one_stream(self) -> None:
+        originator_id = uuid4()
+        self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+        self.client.reset_calls()
+
+        notification_ids = self.recorder.insert_events(
+            [new_stored_event(originator_id, i) for i in range(3)]
+        )
+
+        # One append, and one read to get the commit positions.
+        self.assertEqual(self.client.round_trips, 2)
+        self.assertEqual(self.client.calls["read_all"], 1)
+        notifications = self.recorder.select_notifications(start=None, limit=10)
+        self.assertEqual(notification_ids, [n.id for n in notifications[1:]])
+        self.assertEqual(len(set(notification_ids or [])), 3)
+
+    def test_many_events_in_many_streams(self) -> None:
+        originator_id1 = uuid4()
+        originator_id2 = uuid4()
+        stored_events = [
+            new_stored_event(originator_id1, 0),
+            new_stored_event(originator_id2, 0),
+            new_stored_event(originator_id1, 1),
+        ]
+
+        notification_ids = self.recorder.insert_events(stored_events)
+
+        self.assertEqual(self.client.round_trips, 2)
+        notifications = self.recorder.select_notifications(start=None, limit=10)
+        ids = {(n.originator_id, n.originator_version): n.id for n in notifications}
+        self.assertEqual(
+            notification_ids,
+            [ids[(str(e.originator_id), e.originator_version)] for e in stored_events],
+        )
+
+    def test_commit_position_of_last_event_isnt_read(self) -> None:
+        stored_events = [new_stored_event(uuid4(), 0) for _ in range(3)]
+        read_all = self.client.read_all
+        limits: list[int] = []
+
+        def spy(*args: Any, **kwargs: Any) -> FakeReadResponse:
+            limits.append(kwargs["limit"])
+            return read_all(*args, **kwargs)
+
+        self.client.read_all = spy  # type: ignore[method-assign]
+        notification_ids = self.recorder.insert_events(stored_events)
+        self.client.read_all = read_all  # type: ignore[method-assign]
+
+        self.assertEqual(limits, [2])
+        notifications = self.recorder.select_notifications(start=None, limit=10)
+        self.assertEqual(notification_ids, [n.id for n in notifications])
+
+        # Reading backwards doesn't include the event at the commit position.
+        backwards = self.client.read_all(
+            commit_position=notifications[-1].id, backwards=True
+        )
+        self.assertEqual(
+            [e.commit_position for e in backwards],
+            [n.id for n in reversed(notifications[:-1])],
+        )
+
+    def test_commit_position_of_last_event_if_read_fails(self) -> None:
+        def read_all(*_: Any, **__: Any) -> FakeReadResponse:
+            raise DeadlineExceededError
+
+        self.client.read_all = read_all  # type: ignore[method-assign]
+        notification_ids = self.recorder.insert_events(
+            [new_stored_event(uuid4(), 0) for _ in range(3)]
+        )
+
+        # The events were recorded, and have the position of the last event.
+        del self.client.read_all
+        notifications = self.recorder.select_notifications(start=None, limit=10)
+        self.assertEqual(len(notifications), 3)
+        self.assertEqual(notification_ids, [notifications[-1].id] * 3)
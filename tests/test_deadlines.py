@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any
+from unittest import IsolatedAsyncioTestCase, TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    InfrastructureFactoryError,
+    Tracking,
+)
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.asyncio_recorders import (
+    AsyncKurrentDBApplicationRecorder,
+)
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.hub import KurrentDBSubscriptionHubPool
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBAggregateRecorder,
+    KurrentDBApplicationRecorder,
+    KurrentDBDeadlines,
+    KurrentDBProcessRecorder,
+    KurrentDBSubscription,
+    KurrentDBTrackingRecorder,
+)
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import (
+    FakeAsyncKurrentDBClient,
+    FakeCatchupSubscription,
+    FakeKurrentDBClient,
+    FakeReadResponse,
+)
+
+DEADLINES = KurrentDBDeadlines(
+    append=1.0, read_stream=2.0, read_all=3.0, commit_position=4.0
+)
+
+
+class TimeoutRecordingClient(FakeKurrentDBClient):
+    """
+    Records the timeouts of the requests made to each method.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.timeouts: defaultdict[str, set[float | None]] = defaultdict(set)
+        self.window_sizes: list[int | None] = []
+
+    def append_events(self, *args: Any, **kwargs: Any) -> int:
+        self.timeouts["append_events"].add(kwargs.get("timeout"))
+        return super().append_events(*args, **kwargs)
+
+    def multi_append_to_stream(self, *args: Any, **kwargs: Any) -> int:
+        self.timeouts["multi_append_to_stream"].add(kwargs.get("timeout"))
+        return super().multi_append_to_stream(*args, **kwargs)
+
+    def read_stream(self, *args: Any, **kwargs: Any) -> FakeReadResponse:
+        self.timeouts["read_stream"].add(kwargs.get("timeout"))
+        return super().read_stream(*args, **kwargs)
+
+    def read_all(self, *args: Any, **kwargs: Any) -> FakeReadResponse:
+        self.timeouts["read_all"].add(kwargs.get("timeout"))
+        return super().read_all(*args, **kwargs)
+
+    def get_commit_position(self, *args: Any, **kwargs: Any) -> int:
+        self.timeouts["get_commit_position"].add(kwargs.get("timeout"))
+        return super().get_commit_position(*args, **kwargs)
+
+    def set_stream_metadata(self, *args: Any, **kwargs: Any) -> None:
+        self.timeouts["set_stream_metadata"].add(kwargs.get("timeout"))
+        super().set_stream_metadata(*args, **kwargs)
+
+    def subscribe_to_all(self, *args: Any, **kwargs: Any) -> FakeCatchupSubscription:
+        self.window_sizes.append(kwargs.get("window_size"))
+        return super().subscribe_to_all(*args, **kwargs)
+
+
+class TestKurrentDBDeadlines(TestCase):
+    def test_deadlines_must_be_positive(self) -> None:
+        self.assertIsNone(KurrentDBDeadlines().append)
+        with self.assertRaises(ValueError):
+            KurrentDBDeadlines(read_all=0)
+        with self.assertRaises(ValueError):
+            KurrentDBDeadlines(append=-1.0)
+        with self.assertRaises(ValueError):
+            KurrentDBDeadlines(read_stream=float("nan"))
+
+    def test_recorders_use_deadlines(self) -> None:
+        client = TimeoutRecordingClient()
+        recorder = KurrentDBApplicationRecorder(
+            client,  # type: ignore[arg-type]
+            multi_stream_appends=True,
+            deadlines=DEADLINES,
+        )
+        originator_id1, originator_id2 = uuid4(), uuid4()
+        recorder.insert_events([new_stored_event(originator_id1, 0)])
+        recorder.insert_events(
+            [new_stored_event(originator_id1, 1), new_stored_event(originator_id2, 0)]
+        )
+        recorder.select_events(originator_id1)
+        list(recorder.iter_events(originator_id1, page_size=1))
+        recorder.select_events_after(originator_id1, None, page_size=1)
+        recorder.select_notifications(start=None, limit=10)
+        recorder.max_notification_id()
+        self.assertEqual(
+            dict(client.timeouts),
+            {
+                "append_events": {1.0},
+                "multi_append_to_stream": {1.0},
+                "read_stream": {2.0},
+                "read_all": {3.0},
+                "get_commit_position": {4.0},
+            },
+        )
+
+        # Snapshots too.
+        client.timeouts.clear()
+        snapshot_recorder = KurrentDBAggregateRecorder(
+            client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+            deadlines=DEADLINES,
+        )
+        snapshot_recorder.insert_events([new_stored_event(originator_id1, 1)])
+        snapshot_recorder._snapshot_cache.clear()
+        snapshot_recorder.insert_events([new_stored_event(originator_id1, 2)])
+        self.assertEqual(
+            dict(client.timeouts), {"append_events": {1.0}, "read_stream": {2.0}}
+        )
+
+    def test_tracking_recorders_use_deadlines(self) -> None:
+        client = TimeoutRecordingClient()
+        process_recorder = KurrentDBProcessRecorder(
+            client,  # type: ignore[arg-type]
+            name="follower",
+            deadlines=DEADLINES,
+        )
+        process_recorder.insert_events(
+            [new_stored_event(uuid4(), 0)], tracking=Tracking("upstream", 1)
+        )
+        self.assertEqual(
+            dict(client.timeouts),
+            {
+                "multi_append_to_stream": {1.0},
+                "set_stream_metadata": {1.0},
+                "read_stream": {2.0},
+                "read_all": {3.0},
+            },
+        )
+
+        client.timeouts.clear()
+        tracking_recorder = KurrentDBTrackingRecorder(
+            client,  # type: ignore[arg-type]
+            name="projection",
+            deadlines=DEADLINES,
+        )
+        tracking_recorder.insert_tracking(Tracking("upstream", 1))
+        tracking_recorder.close()
+        self.assertEqual(
+            dict(client.timeouts),
+            {
+                "append_events": {1.0},
+                "set_stream_metadata": {1.0},
+                "read_stream": {2.0},
+            },
+        )
+
+    def test_recorders_without_deadlines(self) -> None:
+        client = TimeoutRecordingClient()
+        recorder = KurrentDBApplicationRecorder(client)  # type: ignore[arg-type]
+        recorder.insert_events([new_stored_event(uuid4(), 0)])
+        recorder.select_notifications(start=None, limit=10)
+        self.assertEqual(
+            dict(client.timeouts), {"append_events": {None}, "read_all": {None}}
+        )
+
+    def test_subscription_window_size(self) -> None:
+        client = TimeoutRecordingClient()
+        recorder = KurrentDBApplicationRecorder(
+            client,  # type: ignore[arg-type]
+            subscription_options={"window_size": 100, "buffer_size": 10},
+        )
+        with recorder.subscribe() as subscription:
+            assert isinstance(subscription, KurrentDBSubscription)
+            self.assertEqual(subscription.window_size, 100)
+            self.assertEqual(subscription._buffer_size, 10)
+        self.assertEqual(client.window_sizes, [100])
+
+
+class TestAsyncRecorderDeadlines(IsolatedAsyncioTestCase):
+    async def test_recorder_uses_deadlines(self) -> None:
+        client = TimeoutRecordingClient()
+        recorder = AsyncKurrentDBApplicationRecorder(
+            FakeAsyncKurrentDBClient(sync_client=client),  # type: ignore[arg-type]
+            multi_stream_appends=True,
+            deadlines=DEADLINES,
+        )
+        originator_id1, originator_id2 = uuid4(), uuid4()
+        await recorder.insert_events([new_stored_event(originator_id1, 0)])
+        await recorder.insert_events(
+            [new_stored_event(originator_id1, 1), new_stored_event(originator_id2, 0)]
+        )
+        await recorder.select_events(originator_id1)
+        await recorder.select_events_after(originator_id1, None, page_size=1)
+        await recorder.select_notifications(start=None, limit=10)
+        await recorder.max_notification_id()
+        self.assertEqual(
+            dict(client.timeouts),
+            {
+                "append_events": {1.0},
+                "multi_append_to_stream": {1.0},
+                "read_stream": {2.0},
+                "read_all": {3.0},
+                "get_commit_position": {4.0},
+            },
+        )
+
+
+class TestFactoryTuning(TestCase):
+    def setUp(self) -> None:
+        self.env = Environment("TestCase")
+        self.env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        self.env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+
+    def test_defaults(self) -> None:
+        factory = KurrentDBFactory(self.env)
+        self.assertEqual(factory.read_page_size, 1000)
+        self.assertEqual(factory.deadlines, KurrentDBDeadlines())
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertEqual(recorder.read_page_size, 1000)
+        self.assertEqual(recorder.deadlines, KurrentDBDeadlines())
+        self.assertEqual(recorder.subscription_options, {})
+        factory.close()
+
+    def test_env_vars(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_READ_PAGE_SIZE] = "250"
+        self.env[KurrentDBFactory.KURRENTDB_APPEND_DEADLINE] = "1"
+        self.env[KurrentDBFactory.KURRENTDB_READ_STREAM_DEADLINE] = "2"
+        self.env[KurrentDBFactory.KURRENTDB_READ_ALL_DEADLINE] = "3.5"
+        self.env[KurrentDBFactory.KURRENTDB_COMMIT_POSITION_DEADLINE] = "0.5"
+        self.env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_BUFFER_SIZE] = "50"
+        self.env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_WINDOW_SIZE] = "60"
+        self.env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_HUB] = "yes"
+        original_pool = KurrentDBFactory.subscription_hub_pool
+        KurrentDBFactory.subscription_hub_pool = KurrentDBSubscriptionHubPool()
+        try:
+            factory = KurrentDBFactory(self.env)
+            deadlines = KurrentDBDeadlines(
+                append=1.0, read_stream=2.0, read_all=3.5, commit_position=0.5
+            )
+            recorders: list[Any] = [
+                factory.aggregate_recorder(),
+                factory.aggregate_recorder(purpose="snapshots"),
+                factory.application_recorder(),
+                factory.process_recorder(),
+                factory.async_aggregate_recorder(),
+                factory.async_application_recorder(),
+            ]
+            for recorder in recorders:
+                self.assertEqual(recorder.read_page_size, 250)
+                self.assertEqual(recorder.deadlines, deadlines)
+            self.assertEqual(factory.tracking_recorder().deadlines, deadlines)
+            application_recorder = recorders[2]
+            assert isinstance(application_recorder, KurrentDBApplicationRecorder)
+            self.assertEqual(
+                application_recorder.subscription_options,
+                {"buffer_size": 50, "window_size": 60},
+            )
+            assert application_recorder.subscription_hub is not None
+            self.assertEqual(
+                application_recorder.subscription_hub.catch_up_page_size, 250
+            )
+            factory.close()
+        finally:
+            KurrentDBFactory.subscription_hub_pool = original_pool
+
+    def test_invalid_env_vars(self) -> None:
+        for name, value in [
+            (KurrentDBFactory.KURRENTDB_READ_PAGE_SIZE, "0"),
+            (KurrentDBFactory.KURRENTDB_READ_PAGE_SIZE, "ten"),
+            (KurrentDBFactory.KURRENTDB_SUBSCRIPTION_BUFFER_SIZE, "-1"),
+            (KurrentDBFactory.KURRENTDB_SUBSCRIPTION_WINDOW_SIZE, "1.5"),
+            (KurrentDBFactory.KURRENTDB_APPEND_DEADLINE, "0"),
+            (KurrentDBFactory.KURRENTDB_READ_STREAM_DEADLINE, "-2"),
+            (KurrentDBFactory.KURRENTDB_READ_ALL_DEADLINE, "soon"),
+            (KurrentDBFactory.KURRENTDB_COMMIT_POSITION_DEADLINE, "inf"),
+        ]:
+            with self.subTest(name=name, value=value):
+                env = Environment("TestCase", dict(self.env))
+                env[name] = value
+                with self.assertRaises(InfrastructureFactoryError) as cm:
+                    KurrentDBFactory(env)
+                self.assertIn(name, str(cm.exception))
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from unittest import TestCase
+
+from eventsourcing.persistence import InfrastructureFactory
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import KurrentDBApplicationRecorder
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeKurrentDBClient
+
+
+class TestEventTypeStreams(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient(by_event_type_projection=True)
+        self.recorder = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            event_type_streams=True,
+        )
+        self.filtered_recorder = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+        )
+        for i in range(30):
+            self.recorder.insert_events([new_stored_event(topic=f"topic{i % 3}")])
+
+    def assert_same_notifications(self, **kwargs: object) -> None:
+        expected = self.filtered_recorder.select_notifications(**kwargs)  # type: ignore[arg-type]
+        self.client.reset_calls()
+        actual = self.recorder.select_notifications(**kwargs)  # type: ignore[arg-type]
+        self.assertEqual(self.client.calls["read_all"], 0)
+        self.assertEqual([n.id for n in actual], [n.id for n in expected])
+        self.assertEqual(
+            [n.originator_id for n in actual], [n.originator_id for n in expected]
+        )
+
+    def test_same_as_filtered_read(self) -> None:
+        max_id = self.recorder.max_notification_id()
+        assert max_id is not None
+        for topics in (["topic0"], ["topic1", "topic2"], ["topic2", "topic0"]):
+            self.assert_same_notifications(start=None, limit=100, topics=topics)
+            self.assert_same_notifications(start=None, limit=4, topics=topics)
+            for start in range(0, max_id, 40):
+                self.assert_same_notifications(start=start, limit=3, topics=topics)
+                self.assert_same_notifications(
+                    start=start, limit=3, topics=topics, inclusive_of_start=False
+                )
+                self.assert_same_notifications(
+                    start=start, limit=30, stop=start + 100, topics=topics
+                )
+
+    def test_next_page_needs_one_request(self) -> None:
+        notifications = self.recorder.select_notifications(
+            start=None, limit=3, topics=["topic1"]
+        )
+        self.client.reset_calls()
+        notifications = self.recorder.select_notifications(
+            start=notifications[-1].id,
+            limit=3,
+            topics=["topic1"],
+            inclusive_of_start=False,
+        )
+        self.assertEqual(len(notifications), 3)
+        self.assertEqual(self.client.calls["read_stream"], 1)
+
+    def test_falls_back_to_filtered_read(self) -> None:
+        client = FakeKurrentDBClient(by_event_type_projection=False)
+        recorder = KurrentDBApplicationRecorder(
+            client=client,  # type: ignore[arg-type]
+            event_type_streams=True,
+        )
+        recorder.insert_events([new_stored_event(topic="topic1")])
+        recorder.insert_events([new_stored_event(topic="topic2")])
+        client.reset_calls()
+
+        notifications = recorder.select_notifications(
+            start=None, limit=10, topics=["topic1"]
+        )
+
+        self.assertEqual(len(notifications), 1)
+        self.assertEqual(client.calls["read_all"], 1)
+
+    def test_not_used_without_topics(self) -> None:
+        self.client.reset_calls()
+        self.recorder.select_notifications(start=None, limit=10)
+        self.assertEqual(self.client.calls["read_stream"], 0)
+        self.assertEqual(self.client.calls["read_all"], 1)
+
+
+class TestFactoryEventTypeStreams(TestCase):
+    def test_env_var(self) -> None:
+        env = Environment("TestCase")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        recorder = KurrentDBFactory(env).application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertFalse(recorder.event_type_streams)
+
+        env[KurrentDBFactory.KURRENTDB_EVENT_TYPE_STREAMS] = "yes"
+        recorder = KurrentDBFactory(env).application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertTrue(recorder.event_type_streams)
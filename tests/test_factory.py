@@ -14,14 +14,13 @@ from eventsourcing_kurrentdb.factory import KurrentDBFactory
 from eventsourcing_kurrentdb.recorders import (
     KurrentDBAggregateRecorder,
     KurrentDBApplicationRecorder,
+    KurrentDBProcessRecorder,
+    KurrentDBTrackingRecorder,
 )
 from tests.common import INSECURE_CONNECTION_STRING
 
 
 class TestFactory(InfrastructureFactoryTestCase[KurrentDBFactory]):
-    def test_create_process_recorder(self) -> None:
-        self.skipTest("KurrentDB doesn't support tracking records")
-
     def expected_factory_class(self) -> type[KurrentDBFactory]:
         return KurrentDBFactory
 
@@ -32,16 +31,16 @@ class TestFactory(InfrastructureFactoryTestCase[KurrentDBFactory]):
         return KurrentDBApplicationRecorder
 
     def expected_tracking_recorder_class(self) -> type[TrackingRecorder]:
-        raise NotImplementedError
+        return KurrentDBTrackingRecorder
 
-    def tracking_recorder_subclass(self) -> type[TrackingRecorder]:
-        raise NotImplementedError
+    class KurrentDBTrackingRecorderSubclass(KurrentDBTrackingRecorder):
+        pass
 
-    def test_create_tracking_recorder(self) -> None:
-        self.skipTest("KurrentDB doesn't support tracking records")
+    def tracking_recorder_subclass(self) -> type[TrackingRecorder]:
+        return self.KurrentDBTrackingRecorderSubclass
 
     def expected_process_recorder_class(self) -> type[ProcessRecorder]:
-        raise NotImplementedError
+        return KurrentDBProcessRecorder
 
     def setUp(self) -> None:
         self.env = Environment("TestCase")
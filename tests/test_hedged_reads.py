@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from threading import Event
+from time import monotonic
+from typing import Any
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    InfrastructureFactoryError,
+)
+from eventsourcing.utils import Environment
+from kurrentdbclient.exceptions import ServiceUnavailableError
+
+from eventsourcing_kurrentdb.clients import KurrentDBClientPool
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.hedging import HedgedReader
+from eventsourcing_kurrentdb.recorders import KurrentDBAggregateRecorder
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeKurrentDBClient, FakeReadResponse
+from tests.test_read_routing import replicate
+
+
+class SlowReadResponse(FakeReadResponse):
+    def __init__(
+        self, response: FakeReadResponse, delay: float, error: Exception | None
+    ):
+        super().__init__(response)
+        self._delay = delay
+        self._error = error
+        self.is_stopped = Event()
+
+    def __next__(self) -> Any:
+        if self._delay:
+            self.is_stopped.wait(self._delay)
+            self._delay = 0
+            if self._error is not None:
+                raise self._error
+        return super().__next__()
+
+    def stop(self) -> None:
+        self.is_stopped.set()
+        super().stop()
+
+
+class SlowFakeKurrentDBClient(FakeKurrentDBClient):
+    """
+    Responds to reads of streams after a delay, or fails after a delay.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.delay = 0.0
+        self.error: Exception | None = None
+        self.responses: list[SlowReadResponse] = []
+
+    def read_stream(self, *args: Any, **kwargs: Any) -> SlowReadResponse:
+        response = SlowReadResponse(
+            super().read_stream(*args, **kwargs), self.delay, self.error
+        )
+        self.responses.append(response)
+        return response
+
+
+class TestHedgedReader(TestCase):
+    def setUp(self) -> None:
+        self.primary = SlowFakeKurrentDBClient()
+        self.secondary = SlowFakeKurrentDBClient()
+        self.hedged_reader = HedgedReader(
+            self.secondary,  # type: ignore[arg-type]
+            max_delay=0.02,
+            min_samples=5,
+        )
+        self.recorder = KurrentDBAggregateRecorder(
+            self.primary,  # type: ignore[arg-type]
+            hedged_reader=self.hedged_reader,
+        )
+        self.originator_id = uuid4()
+        self.recorder.insert_events(
+            [new_stored_event(self.originator_id, v) for v in range(3)]
+        )
+        replicate(self.primary, self.secondary)
+
+    def tearDown(self) -> None:
+        self.hedged_reader.close()
+
+    def select_events(self) -> int:
+        return len(self.recorder.select_events(self.originator_id))
+
+    def test_fast_reads_are_not_hedged(self) -> None:
+        self.assertEqual(self.select_events(), 3)
+        metrics = self.hedged_reader.metrics()
+        self.assertEqual(metrics.num_reads, 1)
+        self.assertEqual(metrics.num_hedges, 0)
+        self.assertEqual(self.secondary.round_trips, 0)
+
+        # Streams that aren't found are a response.
+        self.assertEqual(self.recorder.select_events(uuid4()), [])
+        self.assertEqual(self.hedged_reader.metrics().num_hedges, 0)
+
+    def test_slow_read_is_hedged_and_cancelled(self) -> None:
+        self.primary.delay = 5.0
+        started = monotonic()
+        self.assertEqual(self.select_events(), 3)
+        self.assertLess(monotonic() - started, 1.0)
+        metrics = self.hedged_reader.metrics()
+        self.assertEqual(metrics.num_hedges, 1)
+        self.assertEqual(metrics.num_hedges_won, 1)
+        self.assertTrue(self.primary.responses[-1].is_stopped.is_set())
+        # Only the durations of reads that the primary won are recorded.
+        self.assertEqual(len(self.hedged_reader._durations), 0)
+
+    def test_primary_can_win_after_hedge(self) -> None:
+        self.primary.delay = 0.1
+        self.secondary.delay = 5.0
+        self.assertEqual(self.select_events(), 3)
+        metrics = self.hedged_reader.metrics()
+        self.assertEqual(metrics.num_hedges, 1)
+        self.assertEqual(metrics.num_hedges_won, 0)
+        self.assertTrue(self.secondary.responses[-1].is_stopped.is_set())
+        self.assertEqual(len(self.hedged_reader._durations), 1)
+
+    def test_hedge_wins_when_primary_fails(self) -> None:
+        self.primary.delay = 0.1
+        self.primary.error = ServiceUnavailableError()
+        self.secondary.delay = 0.2
+        self.assertEqual(self.select_events(), 3)
+        self.assertEqual(self.hedged_reader.metrics().num_hedges_won, 1)
+
+        # Errors are raised when all the reads fail.
+        self.secondary.error = ServiceUnavailableError()
+        with self.assertRaises(ServiceUnavailableError):
+            self.select_events()
+
+    def test_delay_is_percentile_of_durations(self) -> None:
+        self.assertEqual(self.hedged_reader.metrics().delay, 0.02)
+        for _ in range(5):
+            self.select_events()
+        delay = self.hedged_reader.metrics().delay
+        self.assertLess(delay, 0.02)
+        self.assertGreaterEqual(delay, self.hedged_reader.min_delay)
+        with self.assertRaises(ValueError):
+            HedgedReader(self.secondary, percentile=100)  # type: ignore[arg-type]
+
+    def test_delay_is_percentile_of_window(self) -> None:
+        hedged_reader = HedgedReader(
+            self.secondary,  # type: ignore[arg-type]
+            percentile=50,
+            min_delay=0,
+            window=3,
+            min_samples=1,
+        )
+        for duration, delay in [(0.3, 0.3), (0.1, 0.3), (0.2, 0.2), (0.4, 0.2)]:
+            hedged_reader._record_duration(duration)
+            self.assertEqual(hedged_reader.metrics().delay, delay)
+        self.assertEqual(hedged_reader._sorted_durations, [0.1, 0.2, 0.4])
+        hedged_reader._record_duration(0.4)
+        self.assertEqual(hedged_reader._sorted_durations, [0.2, 0.4, 0.4])
+        self.assertEqual(hedged_reader.metrics().delay, 0.4)
+        hedged_reader.close()
+
+    def test_hedged_reads_from_follower_read_your_writes(self) -> None:
+        # The primary is the leader, and the follower hasn't got the new event.
+        self.recorder.insert_events([new_stored_event(self.originator_id, 3)])
+        self.primary.delay = 5.0
+        self.assertEqual(self.select_events(), 4)
+        self.assertEqual(self.recorder.num_stale_reads, 1)
+
+
+class TestFactoryHedgedReads(TestCase):
+    def setUp(self) -> None:
+        self.original_pool = KurrentDBFactory.client_pool
+        KurrentDBFactory.client_pool = KurrentDBClientPool()
+        self.env = Environment("TestCase")
+        self.env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        self.env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+
+    def tearDown(self) -> None:
+        KurrentDBFactory.client_pool.close()
+        KurrentDBFactory.client_pool = self.original_pool
+
+    def test_not_hedged_by_default(self) -> None:
+        factory = KurrentDBFactory(self.env)
+        self.assertIsNone(factory.hedged_reader)
+        recorder = factory.aggregate_recorder()
+        assert isinstance(recorder, KurrentDBAggregateRecorder)
+        self.assertIsNone(recorder.hedged_reader)
+        factory.close()
+
+    def test_env_vars(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_HEDGED_READS] = "yes"
+        self.env[KurrentDBFactory.KURRENTDB_HEDGE_PERCENTILE] = "99"
+        self.env[KurrentDBFactory.KURRENTDB_HEDGE_MAX_DELAY] = "0.5"
+        factory = KurrentDBFactory(self.env)
+        hedged_reader = factory.hedged_reader
+        assert hedged_reader is not None
+        self.assertEqual(hedged_reader.percentile, 99)
+        self.assertEqual(hedged_reader.max_delay, 0.5)
+        # Reads from the leader are hedged with a follower.
+        self.assertEqual(
+            hedged_reader.hedge_client.connection_spec.options.node_preference,
+            "follower",
+        )
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBAggregateRecorder)
+        self.assertIs(recorder.hedged_reader, hedged_reader)
+        factory.close()
+        self.assertEqual(KurrentDBFactory.client_pool.stats().num_clients, 0)
+
+        # Reads from the reader client are hedged with the leader.
+        self.env[KurrentDBFactory.KURRENTDB_READER_NODE_PREFERENCE] = "follower"
+        factory = KurrentDBFactory(self.env)
+        assert factory.hedged_reader is not None
+        self.assertIs(factory.hedged_reader.hedge_client, factory.client)
+        factory.close()
+
+    def test_invalid_percentile(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_HEDGED_READS] = "yes"
+        self.env[KurrentDBFactory.KURRENTDB_HEDGE_PERCENTILE] = "100"
+        with self.assertRaises(InfrastructureFactoryError):
+            KurrentDBFactory(self.env)
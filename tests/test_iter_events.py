@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from unittest import IsolatedAsyncioTestCase, TestCase
+from uuid import uuid4
+
+from eventsourcing_kurrentdb.asyncio_recorders import AsyncKurrentDBAggregateRecorder
+from eventsourcing_kurrentdb.recorders import KurrentDBAggregateRecorder
+from tests.common import new_stored_event
+from tests.fake_client import FakeAsyncKurrentDBClient, FakeKurrentDBClient
+from tests.test_snapshots import new_snapshot
+
+QUERIES: list[dict[str, int | bool]] = [
+    {},
+    {"gt": 3},
+    {"lte": 7},
+    {"gt": 2, "lte": 8},
+    {"limit": 5},
+    {"gt": 1, "limit": 6},
+    {"desc": True},
+    {"desc": True, "gt": 3},
+    {"desc": True, "lte": 7},
+    {"desc": True, "gt": 2, "lte": 8},
+    {"desc": True, "lte": 100, "limit": 4},
+    {"desc": True, "gt": 9},
+    {"gt": 9},
+    {"gt": 5, "lte": 5},
+]
+
+
+class TestIterEvents(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            read_page_size=3,
+        )
+        self.originator_id = uuid4()
+        self.recorder.insert_events(
+            [new_stored_event(self.originator_id, v) for v in range(10)]
+        )
+
+    def test_same_as_select_events(self) -> None:
+        for kwargs in QUERIES:
+            with self.subTest(**kwargs):
+                self.assertEqual(
+                    list(
+                        self.recorder.iter_events(
+                            self.originator_id,
+                            **kwargs,  # type: ignore[arg-type]
+                        )
+                    ),
+                    self.recorder.select_events(
+                        self.originator_id,
+                        **kwargs,  # type: ignore[arg-type]
+                    ),
+                )
+
+    def test_stream_is_read_in_pages(self) -> None:
+        self.client.reset_calls()
+        events = self.recorder.iter_events(self.originator_id)
+        self.assertEqual(next(events).originator_version, 0)
+        self.assertEqual(self.client.calls["read_stream"], 1)
+        self.assertEqual(len(list(events)), 9)
+        self.assertEqual(self.client.calls["read_stream"], 4)
+
+        self.client.reset_calls()
+        events = self.recorder.iter_events(self.originator_id, page_size=5)
+        self.assertEqual(len(list(events)), 10)
+        self.assertEqual(self.client.calls["read_stream"], 3)
+
+        # The last page is not read if the limit has been reached.
+        self.client.reset_calls()
+        events = self.recorder.iter_events(self.originator_id, desc=True, limit=6)
+        self.assertEqual(len(list(events)), 6)
+        self.assertEqual(self.client.calls["read_stream"], 2)
+
+    def test_stream_not_found(self) -> None:
+        self.assertEqual(list(self.recorder.iter_events(uuid4())), [])
+
+    def test_snapshots(self) -> None:
+        recorder = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+            read_page_size=2,
+        )
+        for version in (5, 10, 15, 20, 25):
+            recorder.insert_events([new_snapshot(self.originator_id, version)])
+        snapshots = recorder.iter_events(self.originator_id, desc=True, gt=5)
+        self.assertEqual([s.originator_version for s in snapshots], [25, 20, 15, 10])
+
+
+class TestAsyncIterEvents(IsolatedAsyncioTestCase):
+    async def test_same_as_select_events(self) -> None:
+        client = FakeAsyncKurrentDBClient()
+        recorder = AsyncKurrentDBAggregateRecorder(
+            client=client,  # type: ignore[arg-type]
+            read_page_size=3,
+        )
+        originator_id = uuid4()
+        await recorder.insert_events(
+            [new_stored_event(originator_id, v) for v in range(10)]
+        )
+        for kwargs in QUERIES:
+            with self.subTest(**kwargs):
+                stored_events = [
+                    e
+                    async for e in recorder.iter_events(
+                        originator_id,
+                        **kwargs,  # type: ignore[arg-type]
+                    )
+                ]
+                self.assertEqual(
+                    stored_events,
+                    await recorder.select_events(
+                        originator_id,
+                        **kwargs,  # type: ignore[arg-type]
+                    ),
+                )
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    IntegrityError,
+    ProgrammingError,
+)
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import KurrentDBApplicationRecorder
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeKurrentDBClient
+
+
+class TestMultiStreamAppends(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+
+    def create_recorder(self) -> KurrentDBApplicationRecorder:
+        return KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            multi_stream_appends=True,
+        )
+
+    def test_disabled_by_default(self) -> None:
+        recorder = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+        )
+        with self.assertRaises(ProgrammingError):
+            recorder.insert_events(
+                [new_stored_event(uuid4(), 0), new_stored_event(uuid4(), 0)]
+            )
+        self.assertEqual(self.client.round_trips, 0)
+
+    def test_one_round_trip_for_many_streams(self) -> None:
+        recorder = self.create_recorder()
+        originator_id1 = uuid4()
+        originator_id2 = uuid4()
+        stored_events = [
+            new_stored_event(originator_id1, 0),
+            new_stored_event(originator_id2, 0),
+            new_stored_event(originator_id1, 1),
+        ]
+
+        notification_ids = recorder.insert_events(stored_events)
+
+        assert notification_ids is not None
+        self.assertEqual(len(notification_ids), 3)
+        self.assertEqual(self.client.calls["multi_append_to_stream"], 1)
+        self.assertEqual(self.client.calls["append_events"], 0)
+        # One append, and one read to get the commit positions.
+        self.assertEqual(self.client.round_trips, 2)
+        self.assertEqual(len(recorder.select_events(originator_id1)), 2)
+        self.assertEqual(len(recorder.select_events(originator_id2)), 1)
+
+        # Per-stream expected versions are used for optimistic concurrency control.
+        with self.assertRaises(IntegrityError):
+            recorder.insert_events(
+                [
+                    new_stored_event(originator_id1, 2),
+                    new_stored_event(originator_id2, 0),
+                ]
+            )
+
+        # Nothing was appended to either stream.
+        self.assertEqual(len(recorder.select_events(originator_id1)), 2)
+        self.assertEqual(len(recorder.select_events(originator_id2)), 1)
+
+    def test_gap_in_originator_versions(self) -> None:
+        recorder = self.create_recorder()
+        originator_id1 = uuid4()
+        with self.assertRaises(IntegrityError):
+            recorder.insert_events(
+                [
+                    new_stored_event(originator_id1, 0),
+                    new_stored_event(uuid4(), 0),
+                    new_stored_event(originator_id1, 2),
+                ]
+            )
+        self.assertEqual(self.client.round_trips, 0)
+
+    def test_falls_back_to_concurrent_appends(self) -> None:
+        self.client.supports_multi_append = False
+        recorder = self.create_recorder()
+        originator_id1 = uuid4()
+        originator_id2 = uuid4()
+
+        notification_ids = recorder.insert_events(
+            [
+                new_stored_event(originator_id1, 0),
+                new_stored_event(originator_id2, 0),
+                new_stored_event(originator_id1, 1),
+            ]
+        )
+
+        assert notification_ids is not None
+        self.assertEqual(len(notification_ids), 3)
+        notifications = recorder.select_notifications(start=None, limit=10)
+        self.assertEqual(sorted(notification_ids), [n.id for n in notifications])
+        self.assertEqual(self.client.calls["multi_append_to_stream"], 1)
+        self.assertEqual(self.client.calls["append_events"], 2)
+        self.assertEqual(len(recorder.select_events(originator_id1)), 2)
+        self.assertEqual(len(recorder.select_events(originator_id2)), 1)
+
+        # Doesn't try multi-stream append again.
+        self.client.reset_calls()
+        with self.assertRaises(IntegrityError):
+            recorder.insert_events(
+                [
+                    new_stored_event(originator_id1, 2),
+                    new_stored_event(originator_id2, 0),
+                ]
+            )
+        self.assertEqual(self.client.calls["multi_append_to_stream"], 0)
+        self.assertEqual(self.client.calls["append_events"], 2)
+
+        # The append threads are shut down when the recorder is closed.
+        executor = recorder._append_executor
+        assert executor is not None
+        recorder.close()
+        self.assertIsNone(recorder._append_executor)
+        self.assertTrue(executor._shutdown)
+
+
+class TestFactoryMultiStreamAppends(TestCase):
+    def test_env_var(self) -> None:
+        env = Environment("TestCase")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+
+        factory = KurrentDBFactory(env)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertFalse(recorder.multi_stream_appends)
+        factory.close()
+
+        env[KurrentDBFactory.KURRENTDB_MULTI_STREAM_APPENDS] = "yes"
+        factory = KurrentDBFactory(env)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertTrue(recorder.multi_stream_appends)
+
+        # Recorders are closed when the factory is closed.
+        recorder._get_append_executor()
+        factory.close()
+        self.assertIsNone(recorder._append_executor)
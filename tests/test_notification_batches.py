@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import gc
+import sys
+import weakref
+from array import array
+from unittest import TestCase
+from uuid import UUID, uuid4
+
+from eventsourcing.persistence import Notification
+
+from eventsourcing_kurrentdb.asyncio_recorders import AsyncKurrentDBApplicationRecorder
+from eventsourcing_kurrentdb.notifications import NotificationBatch
+from eventsourcing_kurrentdb.recorders import (
+    BadlyFormedUUIDStringError,
+    KurrentDBApplicationRecorder,
+)
+from tests.common import new_stored_event
+from tests.fake_client import FakeAsyncKurrentDBClient, FakeKurrentDBClient
+
+
+class TestNotificationBatch(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBApplicationRecorder(
+            self.client,  # type: ignore[arg-type]
+            multi_stream_appends=True,
+        )
+        self.recorder.validate_uuids = True
+        self.originator_ids = [uuid4(), uuid4()]
+        self.recorder.insert_events(
+            [new_stored_event(i, v) for v in range(3) for i in self.originator_ids]
+        )
+
+    def test_batch_is_a_sequence_of_notifications(self) -> None:
+        notifications = self.recorder.select_notifications(None, 10)
+        assert isinstance(notifications, NotificationBatch)
+        expected = [
+            self.recorder.construct_notification(e) for e in self.client.read_all()
+        ]
+        self.assertEqual(len(notifications), 6)
+        self.assertEqual(notifications, expected)
+        self.assertEqual(expected, notifications)
+        self.assertEqual(list(notifications), expected)
+        self.assertEqual(notifications[-1], expected[-1])
+        self.assertIsInstance(notifications[0], Notification)
+        self.assertIsInstance(notifications[0].originator_id, UUID)
+        self.assertEqual(notifications[1:3], expected[1:3])
+        self.assertIsInstance(notifications[1:3], NotificationBatch)
+        self.assertNotEqual(notifications, expected[:5])
+        self.assertNotEqual(notifications, "")
+        with self.assertRaises(TypeError):
+            hash(notifications)
+
+    def test_batch_is_compact(self) -> None:
+        notifications = self.recorder.select_notifications(None, 10)
+        assert isinstance(notifications, NotificationBatch)
+        self.assertIsInstance(notifications.ids, array)
+        self.assertEqual(list(notifications.ids), [n.id for n in notifications])
+        self.assertIs(notifications.topics[0], notifications.topics[-1])
+        self.assertEqual(notifications.num_bytes, 6 * len(b"{}"))
+
+        # Positions are selected without constructing the notifications.
+        page = self.recorder.select_notifications(
+            notifications.ids[1], 2, inclusive_of_start=False
+        )
+        self.assertEqual(page, notifications[2:4])
+
+    def test_async_recorder_selects_batches(self) -> None:
+        recorder = AsyncKurrentDBApplicationRecorder(
+            FakeAsyncKurrentDBClient(sync_client=self.client)  # type: ignore[arg-type]
+        )
+        recorder.validate_uuids = True
+        notifications = asyncio.run(recorder.select_notifications(None, 10))
+        self.assertIsInstance(notifications, NotificationBatch)
+        self.assertEqual(notifications, self.recorder.select_notifications(None, 10))
+
+
+class TestConstructNotification(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBApplicationRecorder(
+            self.client,  # type: ignore[arg-type]
+            originator_id_cache_maxsize=2,
+        )
+        self.recorder.validate_uuids = True
+
+    def test_originator_ids_are_cached(self) -> None:
+        originator_id = uuid4()
+        self.recorder.insert_events([new_stored_event(originator_id, 0)])
+        self.recorder.insert_events([new_stored_event(originator_id, 1)])
+        recorded_events = list(self.client.read_all())
+        first = self.recorder.construct_notification(recorded_events[0])
+        second = self.recorder.construct_notification(recorded_events[1])
+        self.assertEqual(first.originator_id, originator_id)
+        self.assertIs(first.originator_id, second.originator_id)
+        self.assertIs(first.topic, sys.intern("topic1"))
+
+        # Notifications selected in batches use the same cache.
+        notifications = self.recorder.select_notifications(None, 10)
+        self.assertIs(notifications[1].originator_id, first.originator_id)
+        self.assertEqual(len(self.recorder._uuids), 1)
+
+        # The cache is bounded.
+        self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+        self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+        list(self.recorder.select_notifications(None, 10))
+        self.assertEqual(len(self.recorder._uuids), 2)
+
+    def test_cache_doesnt_refer_to_recorder(self) -> None:
+        # So that the recorder is freed without the cyclic garbage collector.
+        originator_id = uuid4()
+        self.recorder.insert_events([new_stored_event(originator_id, 0)])
+        list(self.recorder.select_notifications(None, 10))
+        recorder = weakref.ref(self.recorder)
+        gc.disable()
+        try:
+            del self.recorder
+            self.assertIsNone(recorder())
+        finally:
+            gc.enable()
+
+    def test_badly_formed_uuids(self) -> None:
+        self.recorder.insert_events([new_stored_event("not-a-uuid", 0)])
+        (recorded_event,) = self.client.read_all()
+        with self.assertRaises(BadlyFormedUUIDStringError):
+            self.recorder.construct_notification(recorded_event)
+        # Originator IDs of batches are validated when they are selected.
+        with self.assertRaises(BadlyFormedUUIDStringError):
+            self.recorder.select_notifications(None, 10)
+        self.recorder.validate_uuids = False
+        notification = self.recorder.construct_notification(recorded_event)
+        self.assertEqual(notification.originator_id, "not-a-uuid")
+        notifications = self.recorder.select_notifications(None, 10)
+        self.assertEqual(notifications[0].originator_id, "not-a-uuid")
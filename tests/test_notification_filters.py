@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    InfrastructureFactoryError,
+)
+from eventsourcing.utils import Environment
+from kurrentdbclient import NewEvent, StreamState
+
+from eventsourcing_kurrentdb.clients import KurrentDBClientPool
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.filters import NotificationFilter
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBAggregateRecorder,
+    KurrentDBApplicationRecorder,
+)
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeKurrentDBClient
+
+
+class TestNotificationFilter(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        snapshots = KurrentDBAggregateRecorder(
+            self.client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+        )
+        recorder = self.create_recorder()
+        # Snapshot topics don't need to end with "Snapshot".
+        snapshots.insert_events([new_stored_event(uuid4(), topic="app.domain:State")])
+        recorder.insert_events(
+            [new_stored_event("order-1", topic="app.orders:Snapshot")]
+        )
+        recorder.insert_events(
+            [new_stored_event("customer-1", topic="app.customers:Added")]
+        )
+        snapshots.insert_events([new_stored_event(uuid4(), topic="app.domain:State")])
+
+    def create_recorder(self, **kwargs: Any) -> KurrentDBApplicationRecorder:
+        return KurrentDBApplicationRecorder(
+            self.client,  # type: ignore[arg-type]
+            **kwargs,
+        )
+
+    def select_topics(self, recorder: KurrentDBApplicationRecorder) -> list[str]:
+        return [n.topic for n in recorder.select_notifications(None, 10)]
+
+    def test_snapshot_streams_are_excluded_by_default(self) -> None:
+        recorder = self.create_recorder()
+        self.assertTrue(recorder.notification_filter.filter_by_stream_name)
+        self.assertEqual(
+            self.select_topics(recorder),
+            ["app.orders:Snapshot", "app.customers:Added"],
+        )
+        self.assertEqual(
+            recorder.max_notification_id(),
+            recorder.select_notifications(None, 10)[-1].id,
+        )
+
+    def test_system_event_types_are_excluded_by_default(self) -> None:
+        # Deleting a stream appends a "$streamDeleted" event to the stream.
+        self.client.append_events(
+            "order-1",
+            events=[NewEvent(type="$streamDeleted", data=b"")],
+            current_version=StreamState.ANY,
+        )
+        recorder = self.create_recorder()
+        recorder.insert_events(
+            [new_stored_event("customer-2", topic="app.customers:Added")]
+        )
+        expected = ["app.orders:Snapshot", "app.customers:Added", "app.customers:Added"]
+        self.assertEqual(self.select_topics(recorder), expected)
+
+        # A page is full if there are more notifications.
+        notifications = recorder.select_notifications(None, 2)
+        self.assertEqual(len(notifications), 2)
+        notifications = recorder.select_notifications(
+            notifications[-1].id, 2, inclusive_of_start=False
+        )
+        self.assertEqual([n.originator_id for n in notifications], ["customer-2"])
+
+        with recorder.subscribe() as subscription:
+            topics = [next(subscription).topic for _ in expected]
+        self.assertEqual(topics, expected)
+        with recorder.subscribe() as subscription:
+            notifications = []
+            while len(notifications) < len(expected):
+                notifications += subscription.next_batch(max_items=10, max_wait=1)
+        self.assertEqual([n.topic for n in notifications], expected)
+
+    def test_exclude_types(self) -> None:
+        recorder = self.create_recorder(
+            notification_filter=NotificationFilter.exclude_types(
+                ".*Snapshot", ".*State"
+            )
+        )
+        self.assertEqual(self.select_topics(recorder), ["app.customers:Added"])
+
+    def test_include_stream_prefixes(self) -> None:
+        recorder = self.create_recorder(
+            notification_filter=NotificationFilter.include_stream_prefixes("customer-")
+        )
+        notifications = recorder.select_notifications(None, 10)
+        self.assertEqual([n.topic for n in notifications], ["app.customers:Added"])
+        self.assertEqual(recorder.max_notification_id(), notifications[0].id)
+        with recorder.subscribe() as subscription:
+            self.assertEqual(next(subscription).topic, "app.customers:Added")
+
+    def test_include_type_prefixes(self) -> None:
+        recorder = self.create_recorder(
+            notification_filter=NotificationFilter.include_type_prefixes(
+                "app.orders:", "app.customers:"
+            )
+        )
+        self.assertEqual(
+            self.select_topics(recorder),
+            ["app.orders:Snapshot", "app.customers:Added"],
+        )
+
+    def test_topics_have_priority(self) -> None:
+        recorder = self.create_recorder(
+            notification_filter=NotificationFilter.include_stream_prefixes("customer-")
+        )
+        notifications = recorder.select_notifications(
+            None, 10, topics=["app.orders:Snapshot"]
+        )
+        self.assertEqual([n.topic for n in notifications], ["app.orders:Snapshot"])
+
+    def test_options_are_cached(self) -> None:
+        notification_filter = NotificationFilter.include_type_prefixes("app.")
+        self.assertIs(notification_filter.options(), notification_filter.options())
+        self.assertTrue(notification_filter.options()["filter_by_prefix"])
+        regex_options = notification_filter.options(regex=True)
+        self.assertEqual(regex_options["filter_include"], (r"app\..*",))
+        self.assertNotIn("filter_by_prefix", regex_options)
+        self.assertIs(regex_options, notification_filter.options(regex=True))
+        with self.assertRaises(ValueError):
+            NotificationFilter.include_stream_prefixes("")
+
+
+class TestFactoryNotificationFilter(TestCase):
+    def setUp(self) -> None:
+        self.original_pool = KurrentDBFactory.client_pool
+        KurrentDBFactory.client_pool = KurrentDBClientPool()
+        self.env = Environment("TestCase")
+        self.env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        self.env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+
+    def tearDown(self) -> None:
+        KurrentDBFactory.client_pool.close()
+        KurrentDBFactory.client_pool = self.original_pool
+
+    def test_default(self) -> None:
+        factory = KurrentDBFactory(self.env)
+        self.assertIsNone(factory.notification_filter)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertEqual(
+            recorder.notification_filter,
+            NotificationFilter.exclude_streams("snapshot-$", "tracking-$"),
+        )
+        factory.close()
+
+    def test_prefixes(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_NOTIFICATION_STREAM_PREFIXES] = (
+            "order-, customer-"
+        )
+        factory = KurrentDBFactory(self.env)
+        expected = NotificationFilter.include_stream_prefixes("order-", "customer-")
+        self.assertEqual(factory.notification_filter, expected)
+        recorders: list[Any] = [
+            factory.aggregate_recorder(),
+            factory.application_recorder(),
+            factory.process_recorder(),
+            factory.async_application_recorder(),
+        ]
+        for recorder in recorders:
+            self.assertEqual(recorder.notification_filter, expected)
+        factory.close()
+
+        del self.env[KurrentDBFactory.KURRENTDB_NOTIFICATION_STREAM_PREFIXES]
+        self.env[KurrentDBFactory.KURRENTDB_NOTIFICATION_TYPE_PREFIXES] = "app."
+        factory = KurrentDBFactory(self.env)
+        self.assertEqual(
+            factory.notification_filter,
+            NotificationFilter.include_type_prefixes("app."),
+        )
+        factory.close()
+
+    def test_both_prefixes(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_NOTIFICATION_STREAM_PREFIXES] = "order-"
+        self.env[KurrentDBFactory.KURRENTDB_NOTIFICATION_TYPE_PREFIXES] = "app."
+        with self.assertRaises(InfrastructureFactoryError):
+            KurrentDBFactory(self.env)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from threading import Thread
+from time import monotonic, sleep
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import InfrastructureFactory, ProgrammingError
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBApplicationRecorder,
+    KurrentDBPersistentSubscription,
+)
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeKurrentDBClient
+
+
+class TestPersistentSubscription(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+        )
+        self.originator_ids = [uuid4() for _ in range(4)]
+        for originator_version in range(3):
+            for originator_id in self.originator_ids:
+                self.recorder.insert_events(
+                    [new_stored_event(originator_id, originator_version)]
+                )
+
+    def consume(
+        self,
+        consumers: list[KurrentDBPersistentSubscription],
+        num_expected: int,
+    ) -> list[list[tuple[str, int]]]:
+        received: list[list[tuple[str, int]]] = [[] for _ in consumers]
+
+        def run(i: int) -> None:
+            for notification in consumers[i]:
+                received[i].append(
+                    (str(notification.originator_id), notification.originator_version)
+                )
+                consumers[i].ack(notification.id)
+
+        threads = [Thread(target=run, args=(i,)) for i in range(len(consumers))]
+        for thread in threads:
+            thread.start()
+        deadline = monotonic() + 5
+        while sum(map(len, received)) < num_expected and monotonic() < deadline:
+            sleep(0.01)
+        for consumer in consumers:
+            consumer.stop()
+        for thread in threads:
+            thread.join()
+        return received
+
+    def test_competing_consumers_pinned_by_stream(self) -> None:
+        consumers = [
+            self.recorder.subscribe_persistent("group1"),
+            self.recorder.subscribe_persistent("group1"),
+        ]
+
+        received = self.consume(consumers, num_expected=12)
+
+        all_received = received[0] + received[1]
+        self.assertEqual(len(all_received), 12)
+        self.assertEqual(len(set(all_received)), 12)
+        for consumer_received in received:
+            # Each aggregate is received by one consumer, in order.
+            versions: dict[str, list[int]] = {}
+            for originator_id, originator_version in consumer_received:
+                versions.setdefault(originator_id, []).append(originator_version)
+            for originator_versions in versions.values():
+                self.assertEqual(originator_versions, [0, 1, 2])
+        self.assertEqual(sum(c.metrics().num_acked for c in consumers), 12)
+        self.assertEqual(self.client.calls["create_subscription_to_all"], 2)
+
+    def test_max_in_flight_and_nack(self) -> None:
+        subscription = self.recorder.subscribe_persistent("group1", max_in_flight=2)
+        with subscription:
+            notification1 = next(subscription)
+            notification2 = next(subscription)
+            metrics = subscription.metrics()
+            self.assertEqual(metrics.num_in_flight, 2)
+            self.assertEqual(metrics.max_in_flight, 2)
+
+            # Retried notifications are received again.
+            subscription.nack(notification1.id)
+            notification3 = next(subscription)
+            self.assertEqual(notification3.id, notification1.id)
+            subscription.ack(notification2.id)
+            subscription.ack(notification3.id)
+            metrics = subscription.metrics()
+            self.assertEqual(metrics.num_in_flight, 0)
+            self.assertEqual(metrics.num_acked, 2)
+            self.assertEqual(metrics.num_nacked, 1)
+
+            with self.assertRaises(ProgrammingError):
+                subscription.ack(notification2.id)
+
+    def test_gt_and_auto_ack(self) -> None:
+        notifications = self.recorder.select_notifications(start=None, limit=20)
+        subscription = self.recorder.subscribe_persistent(
+            "group1", gt=notifications[9].id, auto_ack=True
+        )
+        with subscription:
+            self.assertEqual(next(subscription).id, notifications[10].id)
+            self.assertEqual(next(subscription).id, notifications[11].id)
+            self.assertEqual(subscription.metrics().num_acked, 1)
+
+    def test_unacknowledged_notifications_are_redelivered(self) -> None:
+        subscription1 = self.recorder.subscribe_persistent(
+            "group1", consumer_strategy="RoundRobin"
+        )
+        notification = next(subscription1)
+        subscription2 = self.recorder.subscribe_persistent(
+            "group1", consumer_strategy="RoundRobin"
+        )
+        subscription1.stop()
+        with subscription2:
+            self.assertEqual(next(subscription2).id, notification.id)
+
+
+class TestFactoryPersistentSubscriptions(TestCase):
+    def test_env_vars(self) -> None:
+        env = Environment("TestCase")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        recorder = KurrentDBFactory(env).application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertIsNone(recorder.persistent_subscription_group)
+
+        env[KurrentDBFactory.KURRENTDB_PERSISTENT_SUBSCRIPTION_GROUP] = "projections"
+        env[KurrentDBFactory.KURRENTDB_PERSISTENT_SUBSCRIPTION_CONSUMER_STRATEGY] = (
+            "RoundRobin"
+        )
+        env[KurrentDBFactory.KURRENTDB_PERSISTENT_SUBSCRIPTION_MAX_IN_FLIGHT] = "10"
+        recorder = KurrentDBFactory(env).application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertEqual(recorder.persistent_subscription_group, "projections")
+        self.assertEqual(
+            recorder.persistent_subscription_options,
+            {"consumer_strategy": "RoundRobin", "max_in_flight": 10},
+        )
+
+    def test_subscribe_persistent_uses_configured_consumer_group(self) -> None:
+        client = FakeKurrentDBClient()
+        recorder = KurrentDBApplicationRecorder(
+            client=client,  # type: ignore[arg-type]
+            persistent_subscription_group="projections",
+            persistent_subscription_options={"max_in_flight": 10},
+        )
+        recorder.insert_events([new_stored_event(uuid4(), 0)])
+
+        # Catch-up subscriptions aren't replaced by the consumer group.
+        with recorder.subscribe() as subscription:
+            self.assertNotIsInstance(subscription, KurrentDBPersistentSubscription)
+
+        with recorder.subscribe_persistent(auto_ack=True) as subscription:
+            self.assertEqual(subscription.group_name, "projections")
+            self.assertEqual(subscription.metrics().max_in_flight, 10)
+            self.assertTrue(subscription.auto_ack)
+            next(subscription)
+
+        recorder.persistent_subscription_group = None
+        with self.assertRaises(ProgrammingError):
+            recorder.subscribe_persistent()
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    IntegrityError,
+    PersistenceError,
+    Tracking,
+)
+from eventsourcing.tests.persistence import ProcessRecorderTestCase
+from eventsourcing.utils import Environment, get_topic
+
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBApplicationRecorder,
+    KurrentDBProcessRecorder,
+)
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeKurrentDBClient
+
+
+class TestKurrentDBProcessRecorder(ProcessRecorderTestCase):
+    INITIAL_VERSION = 0
+
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+
+    def create_recorder(self) -> KurrentDBProcessRecorder:
+        return KurrentDBProcessRecorder(
+            self.client,  # type: ignore[arg-type]
+            name="follower",
+        )
+
+    def test_insert_select(self) -> None:
+        # Like the test case, but the first version of each stream is 0.
+        recorder = self.create_recorder()
+        self.assertIsNone(recorder.max_tracking_id("upstream_app"))
+        originator_id1 = uuid4()
+        originator_id2 = uuid4()
+
+        recorder.insert_events(
+            [new_stored_event(originator_id1, 0), new_stored_event(originator_id1, 1)],
+            tracking=Tracking("upstream_app", 1),
+        )
+        with self.assertRaises(IntegrityError):
+            recorder.insert_events(
+                [new_stored_event(originator_id1, 1)],
+                tracking=Tracking("upstream_app", 2),
+            )
+        self.assertEqual(recorder.max_tracking_id("upstream_app"), 1)
+
+        with self.assertRaises(IntegrityError):
+            recorder.insert_events(
+                [new_stored_event(originator_id2, 0)],
+                tracking=Tracking("upstream_app", 1),
+            )
+        self.assertEqual(recorder.max_tracking_id("upstream_app"), 1)
+        self.assertEqual(recorder.select_events(originator_id2), [])
+
+        recorder.insert_events(
+            [new_stored_event(originator_id2, 0)],
+            tracking=Tracking("upstream_app", 2),
+        )
+        self.assertEqual(recorder.max_tracking_id("upstream_app"), 2)
+
+        recorder.insert_events([new_stored_event(originator_id2, 1)])
+        self.assertEqual(recorder.max_tracking_id("upstream_app"), 2)
+        self.assertEqual(len(recorder.select_events(originator_id1)), 2)
+        self.assertEqual(len(recorder.select_events(originator_id2)), 2)
+
+    def test_performance(self) -> None:
+        self.skipTest("Not meaningful with the fake client")
+
+    def test_events_and_checkpoint_are_appended_atomically(self) -> None:
+        recorder = self.create_recorder()
+        originator_id1 = uuid4()
+        originator_id2 = uuid4()
+        notification_ids = recorder.insert_events(
+            [
+                new_stored_event(originator_id1, 0),
+                new_stored_event(originator_id2, 0),
+                new_stored_event(originator_id1, 1),
+            ],
+            tracking=Tracking("upstream_app", 5),
+        )
+        self.assertEqual(self.client.calls["multi_append_to_stream"], 1)
+        self.assertEqual(self.client.calls["append_events"], 0)
+
+        # The checkpoint is not a notification.
+        notifications = recorder.select_notifications(start=None, limit=10)
+        assert notification_ids is not None
+        self.assertEqual(sorted(notification_ids), [n.id for n in notifications])
+        self.assertEqual(recorder.max_notification_id(), notifications[-1].id)
+
+        # Checkpoint isn't written when the events conflict.
+        with self.assertRaises(IntegrityError):
+            recorder.insert_events(
+                [new_stored_event(originator_id2, 0)],
+                tracking=Tracking("upstream_app", 6),
+            )
+        self.assertEqual(recorder.max_tracking_id("upstream_app"), 5)
+
+        # Events aren't written when the checkpoint conflicts, for example
+        # because another process has processed the same notification.
+        other = self.create_recorder()
+        other.insert_tracking(Tracking("upstream_app", 6))
+        with self.assertRaises(IntegrityError):
+            recorder.insert_events(
+                [new_stored_event(originator_id2, 1)],
+                tracking=Tracking("upstream_app", 6),
+            )
+        self.assertEqual(len(recorder.select_events(originator_id2)), 1)
+
+        # The last checkpoint is read again after a conflict.
+        recorder.insert_events(
+            [new_stored_event(originator_id2, 1)],
+            tracking=Tracking("upstream_app", 7),
+        )
+        self.assertEqual(len(recorder.select_events(originator_id2)), 2)
+
+    def test_recover_position_with_one_bounded_read(self) -> None:
+        recorder = self.create_recorder()
+        for notification_id in range(1, 21):
+            recorder.insert_tracking(Tracking("upstream_app", notification_id))
+        # The last checkpoint was cached, so only one read.
+        self.assertEqual(self.client.calls["read_stream"], 1)
+        self.assertEqual(self.client.calls["set_stream_metadata"], 1)
+
+        self.client.reset_calls()
+        recorder = self.create_recorder()
+        self.assertEqual(recorder.max_tracking_id("upstream_app"), 20)
+        self.assertEqual(self.client.round_trips, 1)
+
+        # The tracking stream has a max count.
+        stream_name = recorder.create_tracking_stream_name("upstream_app")
+        self.assertEqual(stream_name, "tracking-$follower-upstream_app")
+        self.assertEqual(len(list(self.client.read_stream(stream_name))), 10)
+
+    def test_multi_stream_appends_not_supported(self) -> None:
+        self.client.supports_multi_append = False
+        recorder = self.create_recorder()
+        with self.assertRaises(PersistenceError) as cm:
+            recorder.insert_events(
+                [new_stored_event(uuid4(), 0)], tracking=Tracking("upstream_app", 1)
+            )
+        self.assertIn("multi-stream appends", str(cm.exception))
+
+        # Events without tracking are appended as usual.
+        recorder.insert_events([new_stored_event(uuid4(), 0)])
+        application_recorder = KurrentDBApplicationRecorder(
+            self.client  # type: ignore[arg-type]
+        )
+        self.assertEqual(len(application_recorder.select_notifications(None, 10)), 1)
+
+
+class TestFactoryProcessRecorder(TestCase):
+    def test_process_recorder(self) -> None:
+        env = Environment("Follower")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        env[KurrentDBFactory.KURRENTDB_CHECKPOINT_MAX_COUNT] = "3"
+        factory = KurrentDBFactory(env)
+        recorder = factory.process_recorder()
+        assert isinstance(recorder, KurrentDBProcessRecorder)
+        self.assertEqual(recorder.name, "Follower")
+        self.assertEqual(recorder.checkpoint_max_count, 3)
+        self.assertTrue(recorder.multi_stream_appends)
+
+        class MyProcessRecorder(KurrentDBProcessRecorder):
+            pass
+
+        env[InfrastructureFactory.PROCESS_RECORDER_TOPIC] = get_topic(MyProcessRecorder)
+        self.assertIsInstance(factory.process_recorder(), MyProcessRecorder)
+        factory.close()
+
+
+del ProcessRecorderTestCase
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    InfrastructureFactoryError,
+)
+from eventsourcing.utils import Environment
+from kurrentdbclient import NewEvent
+
+from eventsourcing_kurrentdb.clients import KurrentDBClientPool
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBAggregateRecorder,
+    KurrentDBApplicationRecorder,
+    KurrentDBSubscription,
+)
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeKurrentDBClient
+
+
+def replicate(leader: FakeKurrentDBClient, follower: FakeKurrentDBClient) -> None:
+    # Appends the leader's new events to the follower, in the same order, so
+    # that they have the same commit positions.
+    with leader._lock:
+        new_events = leader._all[len(follower._all) :]
+    with follower._lock:
+        for ev in new_events:
+            follower._append(
+                ev.stream_name,
+                [NewEvent(type=ev.type, data=ev.data, metadata=ev.metadata, id=ev.id)],
+            )
+
+
+class TestReadRouting(TestCase):
+    def setUp(self) -> None:
+        self.leader = FakeKurrentDBClient()
+        self.follower = FakeKurrentDBClient()
+        self.recorder = self.create_recorder(multi_stream_appends=True)
+
+    def create_recorder(self, **kwargs: Any) -> KurrentDBApplicationRecorder:
+        return KurrentDBApplicationRecorder(
+            self.leader,  # type: ignore[arg-type]
+            reader_client=self.follower,
+            **kwargs,
+        )
+
+    def reset_calls(self) -> None:
+        self.leader.reset_calls()
+        self.follower.reset_calls()
+
+    def test_writes_go_to_the_leader(self) -> None:
+        originator_id = uuid4()
+        self.recorder.insert_events([new_stored_event(originator_id, 0)])
+        self.recorder.insert_events(
+            [new_stored_event(originator_id, 1), new_stored_event(uuid4(), 0)]
+        )
+        self.assertEqual(self.follower.round_trips, 0)
+        self.assertEqual(len(self.leader._all), 3)
+
+    def test_events_are_selected_from_the_reader(self) -> None:
+        originator_id = uuid4()
+        self.recorder.insert_events([new_stored_event(originator_id, 0)])
+        replicate(self.leader, self.follower)
+        self.reset_calls()
+        self.assertEqual(len(self.recorder.select_events(originator_id)), 1)
+        self.assertEqual(len(self.recorder.select_notifications(None, 10)), 1)
+        self.assertEqual(self.leader.round_trips, 0)
+        self.assertEqual(self.follower.calls["read_stream"], 1)
+        self.assertEqual(self.follower.calls["read_all"], 1)
+        self.assertEqual(self.recorder.num_stale_reads, 0)
+
+    def test_stale_reads_are_repeated_on_the_leader(self) -> None:
+        originator_id = uuid4()
+        self.recorder.insert_events([new_stored_event(originator_id, 0)])
+        replicate(self.leader, self.follower)
+        self.recorder.insert_events([new_stored_event(originator_id, 1)])
+        self.reset_calls()
+
+        stored_events = self.recorder.select_events(originator_id)
+        self.assertEqual([e.originator_version for e in stored_events], [0, 1])
+        stored_events = self.recorder.select_events(originator_id, desc=True, limit=1)
+        self.assertEqual([e.originator_version for e in stored_events], [1])
+        self.assertEqual(self.recorder.num_stale_reads, 2)
+        self.assertEqual(self.leader.calls["read_stream"], 2)
+
+        # Selecting events that the follower has isn't repeated.
+        stored_events = self.recorder.select_events(originator_id, lte=0)
+        self.assertEqual([e.originator_version for e in stored_events], [0])
+        stored_events = self.recorder.select_events(originator_id, limit=1)
+        self.assertEqual([e.originator_version for e in stored_events], [0])
+        self.assertEqual(self.recorder.num_stale_reads, 2)
+
+        notifications = self.recorder.select_notifications(None, 10)
+        self.assertEqual(len(notifications), 2)
+        self.assertEqual(self.recorder.num_stale_reads, 3)
+        notifications = self.recorder.select_notifications(None, 1)
+        self.assertEqual(len(notifications), 1)
+        self.assertEqual(self.recorder.num_stale_reads, 3)
+        leader_recorder = KurrentDBApplicationRecorder(
+            self.leader  # type: ignore[arg-type]
+        )
+        self.assertEqual(
+            self.recorder.max_notification_id(), leader_recorder.max_notification_id()
+        )
+
+    def test_streams_written_elsewhere_are_not_repeated(self) -> None:
+        originator_id = uuid4()
+        other = KurrentDBApplicationRecorder(self.leader)  # type: ignore[arg-type]
+        other.insert_events([new_stored_event(originator_id, 0)])
+        self.assertEqual(self.recorder.select_events(originator_id), [])
+        self.assertEqual(self.recorder.select_notifications(None, 10), [])
+        self.assertEqual(self.recorder.num_stale_reads, 0)
+
+    def test_without_read_your_writes(self) -> None:
+        recorder = self.create_recorder(read_your_writes=False)
+        originator_id = uuid4()
+        recorder.insert_events([new_stored_event(originator_id, 0)])
+        self.assertEqual(recorder.select_events(originator_id), [])
+        self.assertEqual(recorder.select_notifications(None, 10), [])
+        self.assertEqual(recorder.max_notification_id(), 0)
+        self.assertEqual(recorder.num_stale_reads, 0)
+
+    def test_written_streams_are_paged_from_the_leader(self) -> None:
+        originator_id = uuid4()
+        self.recorder.insert_events(
+            [new_stored_event(originator_id, v) for v in range(3)]
+        )
+        self.reset_calls()
+        self.assertEqual(
+            len(list(self.recorder.iter_events(originator_id, page_size=2))), 3
+        )
+        tail = self.recorder.select_events_after(originator_id, 0)
+        self.assertEqual(tail.current_version, 2)
+        self.assertEqual(self.follower.round_trips, 0)
+
+        # Other streams are paged from the reader.
+        other_id = uuid4()
+        other = KurrentDBApplicationRecorder(self.leader)  # type: ignore[arg-type]
+        other.insert_events([new_stored_event(other_id, 0)])
+        replicate(self.leader, self.follower)
+        self.assertEqual(len(list(self.recorder.iter_events(other_id))), 1)
+        self.assertEqual(self.follower.calls["read_stream"], 1)
+
+    def test_subscriptions_use_the_reader(self) -> None:
+        self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+        replicate(self.leader, self.follower)
+        with self.recorder.subscribe() as subscription:
+            assert isinstance(subscription, KurrentDBSubscription)
+            next(subscription)
+        self.assertEqual(self.follower.calls["subscribe_to_all"], 1)
+        self.assertEqual(self.leader.calls["subscribe_to_all"], 0)
+
+
+class TestFactoryReadRouting(TestCase):
+    def setUp(self) -> None:
+        self.original_pool = KurrentDBFactory.client_pool
+        KurrentDBFactory.client_pool = KurrentDBClientPool()
+        self.env = Environment("TestCase")
+        self.env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        self.env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+
+    def tearDown(self) -> None:
+        KurrentDBFactory.client_pool.close()
+        KurrentDBFactory.client_pool = self.original_pool
+
+    def test_no_reader_by_default(self) -> None:
+        factory = KurrentDBFactory(self.env)
+        self.assertIsNone(factory.reader_client)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertIs(recorder.reader_client, factory.client)
+        factory.close()
+
+    def test_reader_node_preference(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_READER_NODE_PREFERENCE] = "Follower"
+        factory = KurrentDBFactory(self.env)
+        reader_client = factory.reader_client
+        assert reader_client is not None
+        self.assertEqual(
+            reader_client.connection_spec.uri,
+            "esdb://localhost:2113?Tls=False&NodePreference=follower",
+        )
+        for recorder in [
+            factory.aggregate_recorder(),
+            factory.application_recorder(),
+            factory.process_recorder(),
+        ]:
+            assert isinstance(recorder, KurrentDBAggregateRecorder)
+            self.assertIs(recorder.reader_client, reader_client)
+            self.assertTrue(recorder.read_your_writes)
+        self.assertEqual(KurrentDBFactory.client_pool.stats().num_clients, 2)
+        factory.close()
+        self.assertEqual(KurrentDBFactory.client_pool.stats().num_clients, 0)
+
+    def test_reader_uri(self) -> None:
+        reader_uri = "esdb://replica:2113?Tls=False&NodePreference=readonlyreplica"
+        self.env[KurrentDBFactory.KURRENTDB_READER_URI] = reader_uri
+        self.env[KurrentDBFactory.KURRENTDB_READ_YOUR_WRITES] = "no"
+        factory = KurrentDBFactory(self.env)
+        assert factory.reader_client is not None
+        self.assertEqual(factory.reader_client.connection_spec.uri, reader_uri)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertFalse(recorder.read_your_writes)
+        factory.close()
+
+    def test_invalid_node_preference(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_READER_NODE_PREFERENCE] = "nearest"
+        with self.assertRaises(InfrastructureFactoryError):
+            KurrentDBFactory(self.env)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import InfrastructureFactory, Notification
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import KurrentDBApplicationRecorder
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeKurrentDBClient
+
+
+class TestNotificationReadAhead(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            read_ahead_depth=2,
+        )
+        for _ in range(25):
+            self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+        self.expected = self.recorder._select_notifications(start=None, limit=100)
+
+    def tearDown(self) -> None:
+        assert self.recorder.read_ahead is not None
+        self.recorder.read_ahead.cancel()
+
+    def read_pages(
+        self, start: int | None = None, *, inclusive_of_start: bool = True
+    ) -> list[Notification]:
+        # Like NotificationLogReader.select().
+        notifications: list[Notification] = []
+        while True:
+            page = self.recorder.select_notifications(
+                start=start, limit=10, inclusive_of_start=inclusive_of_start
+            )
+            if not page:
+                return notifications
+            notifications += page
+            start = page[-1].id
+            if inclusive_of_start:
+                start += 1
+
+    def test_pages_are_read_ahead(self) -> None:
+        for inclusive_of_start in (True, False):
+            notifications = self.read_pages(inclusive_of_start=inclusive_of_start)
+            self.assertEqual(
+                [n.id for n in notifications], [n.id for n in self.expected]
+            )
+        assert self.recorder.read_ahead is not None
+        metrics = self.recorder.read_ahead.metrics()
+        self.assertEqual(metrics.num_hits, 2)
+        self.assertEqual(metrics.num_pages, 0)
+        self.assertEqual(metrics.num_bytes, 0)
+
+    def test_new_notifications_are_selected_after_end(self) -> None:
+        self.read_pages()
+        self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+        page = self.recorder.select_notifications(
+            start=self.expected[-1].id, limit=10, inclusive_of_start=False
+        )
+        self.assertEqual(len(page), 1)
+
+    def test_seek(self) -> None:
+        self.recorder.select_notifications(start=None, limit=10)
+        page = self.recorder.select_notifications(start=self.expected[4].id, limit=10)
+        self.assertEqual([n.id for n in page], [n.id for n in self.expected[4:14]])
+        page = self.recorder.select_notifications(
+            start=self.expected[4].id, limit=5, topics=["topic1"]
+        )
+        self.assertEqual([n.id for n in page], [n.id for n in self.expected[4:9]])
+
+    def test_stop(self) -> None:
+        stop = self.expected[14].id
+        page = self.recorder.select_notifications(start=None, limit=10, stop=stop)
+        page = self.recorder.select_notifications(
+            start=page[-1].id, limit=10, stop=stop, inclusive_of_start=False
+        )
+        self.assertEqual([n.id for n in page], [n.id for n in self.expected[10:15]])
+
+    def test_cancel(self) -> None:
+        self.recorder.select_notifications(start=None, limit=10)
+        assert self.recorder.read_ahead is not None
+        self.recorder.read_ahead.cancel(timeout=1)
+        self.assertEqual(self.recorder.read_ahead.metrics().num_pages, 0)
+        page = self.recorder.select_notifications(
+            start=self.expected[9].id, limit=10, inclusive_of_start=False
+        )
+        self.assertEqual([n.id for n in page], [n.id for n in self.expected[10:20]])
+
+
+class TestFactoryReadAhead(TestCase):
+    def test_env_vars(self) -> None:
+        env = Environment("TestCase")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        recorder = KurrentDBFactory(env).application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertIsNone(recorder.read_ahead)
+
+        env[KurrentDBFactory.KURRENTDB_READ_AHEAD_DEPTH] = "3"
+        env[KurrentDBFactory.KURRENTDB_READ_AHEAD_MAX_BYTES] = "1000"
+        factory = KurrentDBFactory(env)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        assert recorder.read_ahead is not None
+        self.assertEqual(recorder.read_ahead.depth, 3)
+        self.assertEqual(recorder.read_ahead.max_bytes, 1000)
+        factory.close()
+        self.assertTrue(recorder.read_ahead._is_cancelled)
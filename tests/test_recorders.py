@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from concurrent.futures.thread import ThreadPoolExecutor
 from typing import cast
+from unittest import TestCase
 from uuid import uuid4
 
 import kurrentdbclient.exceptions
@@ -9,9 +10,11 @@ from eventsourcing.domain import datetime_now_with_tzinfo
 from eventsourcing.persistence import (
     AggregateRecorder,
     ApplicationRecorder,
+    IntegrityError,
     PersistenceError,
     ProgrammingError,
     StoredEvent,
+    Tracking,
 )
 from eventsourcing.tests.persistence import (
     AggregateRecorderTestCase,
@@ -22,8 +25,13 @@ from kurrentdbclient import KurrentDBClient, NewEvent, StreamState
 from eventsourcing_kurrentdb.recorders import (
     KurrentDBAggregateRecorder,
     KurrentDBApplicationRecorder,
+    KurrentDBProcessRecorder,
+)
+from tests.common import (
+    INSECURE_CONNECTION_STRING,
+    new_stored_event,
+    supports_multi_stream_appends,
 )
-from tests.common import INSECURE_CONNECTION_STRING
 
 
 class TestKurrentDBAggregateRecorder(AggregateRecorderTestCase):
@@ -682,5 +690,94 @@ class TestKurrentDBApplicationRecorder(ApplicationRecorderTestCase):
         recorder.insert_events([stored_event])
 
 
+class TestKurrentDBMultiStreamAppends(TestCase):
+    def setUp(self) -> None:
+        self.client = KurrentDBClient(INSECURE_CONNECTION_STRING)
+        self.recorder = KurrentDBApplicationRecorder(
+            self.client, multi_stream_appends=True
+        )
+
+    def tearDown(self) -> None:
+        self.client.close()
+
+    def test_multi_stream_append_is_atomic(self) -> None:
+        if not supports_multi_stream_appends(self.client):
+            self.skipTest("Server doesn't support multi-stream appends (< 25.1)")
+        originator_id1 = uuid4()
+        originator_id2 = uuid4()
+        stored_events = [
+            new_stored_event(originator_id1, 0),
+            new_stored_event(originator_id2, 0),
+            new_stored_event(originator_id1, 1),
+        ]
+        notification_ids = self.recorder.insert_events(stored_events)
+        self.assertTrue(self.recorder._is_multi_stream_append_supported)
+        assert notification_ids is not None
+        self.assertEqual(len(set(notification_ids)), 3)
+        notifications = self.recorder.select_notifications(
+            start=min(notification_ids), limit=3
+        )
+        self.assertEqual(sorted(notification_ids), [n.id for n in notifications])
+
+        # Nothing is appended to either stream if there is a conflict.
+        with self.assertRaises(IntegrityError):
+            self.recorder.insert_events(
+                [
+                    new_stored_event(originator_id1, 2),
+                    new_stored_event(originator_id2, 0),
+                ]
+            )
+        self.assertEqual(len(self.recorder.select_events(originator_id1)), 2)
+        self.assertEqual(len(self.recorder.select_events(originator_id2)), 1)
+
+    def test_falls_back_to_concurrent_appends(self) -> None:
+        if supports_multi_stream_appends(self.client):
+            self.skipTest("Server supports multi-stream appends")
+        originator_id1 = uuid4()
+        originator_id2 = uuid4()
+        notification_ids = self.recorder.insert_events(
+            [new_stored_event(originator_id1, 0), new_stored_event(originator_id2, 0)]
+        )
+        self.assertFalse(self.recorder._is_multi_stream_append_supported)
+        assert notification_ids is not None
+        self.assertEqual(len(set(notification_ids)), 2)
+        self.assertEqual(len(self.recorder.select_events(originator_id1)), 1)
+        self.assertEqual(len(self.recorder.select_events(originator_id2)), 1)
+
+
+class TestKurrentDBProcessRecorderWithServer(TestCase):
+    def setUp(self) -> None:
+        self.client = KurrentDBClient(INSECURE_CONNECTION_STRING)
+        if not supports_multi_stream_appends(self.client):
+            self.client.close()
+            self.skipTest("Process recorder needs multi-stream appends (>= 25.1)")
+        self.recorder = KurrentDBProcessRecorder(self.client, name=f"test-{uuid4()}")
+
+    def tearDown(self) -> None:
+        self.client.close()
+
+    def test_events_are_recorded_with_checkpoint(self) -> None:
+        originator_id = uuid4()
+        self.assertIsNone(self.recorder.max_tracking_id("upstream"))
+        notification_ids = self.recorder.insert_events(
+            [new_stored_event(originator_id, 0), new_stored_event(originator_id, 1)],
+            tracking=Tracking("upstream", 1),
+        )
+        assert notification_ids is not None
+        self.assertEqual(len(set(notification_ids)), 2)
+        self.assertEqual(self.recorder.max_tracking_id("upstream"), 1)
+
+        # A notification can't be processed twice.
+        with self.assertRaises(IntegrityError):
+            self.recorder.insert_events(
+                [new_stored_event(originator_id, 2)], tracking=Tracking("upstream", 1)
+            )
+        self.assertEqual(len(self.recorder.select_events(originator_id)), 2)
+
+        # The position is recovered from the last checkpoint.
+        recorder = KurrentDBProcessRecorder(self.client, name=self.recorder.name)
+        self.assertEqual(recorder.max_tracking_id("upstream"), 1)
+
+
 del AggregateRecorderTestCase
 del ApplicationRecorderTestCase
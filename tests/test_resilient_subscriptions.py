@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import random
+from itertools import islice
+from threading import Timer
+from time import monotonic
+from typing import Any
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import InfrastructureFactory, StoredEvent
+from eventsourcing.utils import Environment
+from kurrentdbclient.exceptions import (
+    AccessDeniedError,
+    ConsumerTooSlowError,
+    DeadlineExceededError,
+    NodeIsNotLeaderError,
+    ServiceUnavailableError,
+    SSLError,
+)
+
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBApplicationRecorder,
+    KurrentDBSubscription,
+    is_retryable_subscription_error,
+)
+from tests.common import INSECURE_CONNECTION_STRING
+from tests.fake_client import FaultyKurrentDBClient
+
+
+class TestResilientSubscription(TestCase):
+    def setUp(self) -> None:
+        self.client = FaultyKurrentDBClient(resume_inclusive=True)
+        self.recorder = KurrentDBApplicationRecorder(
+            self.client  # type: ignore[arg-type]
+        )
+
+    def insert(self, num: int) -> list[int]:
+        notification_ids: list[int] = []
+        for _ in range(num):
+            ids = self.recorder.insert_events([StoredEvent(uuid4(), 0, "topic1", b"")])
+            assert ids is not None
+            notification_ids.extend(ids)
+        return notification_ids
+
+    def subscribe(self, **kwargs: Any) -> KurrentDBSubscription:
+        kwargs.setdefault("reconnect", True)
+        kwargs.setdefault("initial_backoff", 0.01)
+        kwargs.setdefault("max_backoff", 0.02)
+        return KurrentDBSubscription(self.recorder, **kwargs)
+
+    def test_retryable_errors(self) -> None:
+        self.assertTrue(is_retryable_subscription_error(ServiceUnavailableError()))
+        self.assertTrue(is_retryable_subscription_error(DeadlineExceededError()))
+        self.assertTrue(is_retryable_subscription_error(ConsumerTooSlowError()))
+        self.assertTrue(is_retryable_subscription_error(NodeIsNotLeaderError()))
+        self.assertFalse(is_retryable_subscription_error(SSLError()))
+        self.assertFalse(is_retryable_subscription_error(AccessDeniedError()))
+        self.assertFalse(is_retryable_subscription_error(ValueError()))
+
+    def test_resumes_after_retryable_error_without_duplicates(self) -> None:
+        notification_ids = self.insert(5)
+        self.client.fail_subscription(after=2, error=ServiceUnavailableError())
+        with self.subscribe() as subscription:
+            self.assertEqual(subscription.metrics().num_disconnects, 0)
+            self.client.fail_subscribe(DeadlineExceededError(), NodeIsNotLeaderError())
+            self.assertEqual([n.id for n in islice(subscription, 5)], notification_ids)
+            metrics = subscription.metrics()
+        self.assertTrue(metrics.is_connected)
+        self.assertEqual(metrics.num_disconnects, 1)
+        self.assertEqual(metrics.num_reconnects, 1)
+        self.assertEqual(metrics.num_failed_reconnects, 2)
+        self.assertGreater(metrics.disconnected_seconds, 0)
+        self.assertEqual(self.client.calls["subscribe_to_all"], 4)
+
+    def test_next_batch_resumes_after_retryable_error(self) -> None:
+        notification_ids = self.insert(5)
+        self.client.fail_subscription(after=3, error=ServiceUnavailableError())
+        with self.subscribe() as subscription:
+            received: list[int] = []
+            deadline = monotonic() + 5
+            while len(received) < 5 and monotonic() < deadline:
+                received += [n.id for n in subscription.next_batch(max_wait=0.1)]
+            self.assertEqual(received, notification_ids)
+            self.assertEqual(subscription.metrics().num_reconnects, 1)
+
+    def test_next_batch_after_next_resumes_without_duplicates(self) -> None:
+        # Resumed subscriptions don't return the event at the commit position,
+        # so duplicates are only avoided by resuming from the right position.
+        self.client = FaultyKurrentDBClient()
+        self.recorder = KurrentDBApplicationRecorder(
+            self.client  # type: ignore[arg-type]
+        )
+        notification_ids = self.insert(5)
+        self.client.fail_subscription(after=3, error=ServiceUnavailableError())
+        with self.subscribe() as subscription:
+            received = [next(subscription).id for _ in range(3)]
+            deadline = monotonic() + 5
+            while len(received) < 5 and monotonic() < deadline:
+                received += [n.id for n in subscription.next_batch(max_wait=0.1)]
+            self.assertEqual(received, notification_ids)
+            self.assertEqual(subscription.metrics().num_reconnects, 1)
+
+    def test_initial_subscribe_is_retried(self) -> None:
+        notification_ids = self.insert(1)
+        self.client.fail_subscribe(ServiceUnavailableError())
+        with self.subscribe() as subscription:
+            self.assertEqual(next(subscription).id, notification_ids[0])
+            self.assertEqual(subscription.metrics().num_reconnects, 1)
+
+    def test_non_retryable_error_is_raised(self) -> None:
+        self.insert(2)
+        self.client.fail_subscription(after=1, error=AccessDeniedError())
+        with self.subscribe() as subscription:
+            next(subscription)
+            with self.assertRaises(AccessDeniedError):
+                next(subscription)
+
+        # Also whilst reconnecting.
+        self.client.fail_subscription(after=0, error=ServiceUnavailableError())
+        self.client.fail_subscribe(SSLError())
+        with self.assertRaises(SSLError), self.subscribe():
+            pass  # pragma: no cover
+
+    def test_error_is_raised_after_max_reconnect_attempts(self) -> None:
+        self.client.fail_subscribe(*[ServiceUnavailableError()] * 4)
+        with self.assertRaises(ServiceUnavailableError):
+            self.subscribe(max_reconnect_attempts=3)
+        self.assertEqual(self.client.calls["subscribe_to_all"], 4)
+
+    def test_errors_are_raised_without_reconnect(self) -> None:
+        self.insert(2)
+        self.client.fail_subscription(after=1, error=ServiceUnavailableError())
+        with self.subscribe(reconnect=False) as subscription:
+            next(subscription)
+            with self.assertRaises(ServiceUnavailableError):
+                next(subscription)
+
+        # Except that a consumer that is too slow resubscribes immediately.
+        self.client.fail_subscription(after=1, error=ConsumerTooSlowError())
+        with self.subscribe(reconnect=False) as subscription:
+            self.assertEqual(len(list(islice(subscription, 2))), 2)
+            self.assertEqual(subscription.metrics().num_reconnects, 0)
+
+    def test_backoff_is_exponential_with_jitter(self) -> None:
+        random.seed(0)
+        subscription = self.subscribe(initial_backoff=0.1, max_backoff=1.0)
+        for attempt, cap in enumerate([0.1, 0.2, 0.4, 0.8, 1.0, 1.0]):
+            backoffs = [subscription._get_backoff(attempt) for _ in range(100)]
+            self.assertLessEqual(max(backoffs), cap)
+            self.assertGreater(max(backoffs), cap / 2)
+            self.assertGreater(len(set(backoffs)), 1)
+        subscription.stop()
+
+    def test_stop_whilst_disconnected(self) -> None:
+        self.insert(1)
+        self.client.fail_subscription(after=1, error=ServiceUnavailableError())
+        subscription = self.subscribe(initial_backoff=0.05, max_backoff=0.05)
+        self.client.fail_subscribe(*[ServiceUnavailableError()] * 1000)
+        next(subscription)
+        timer = Timer(0.2, subscription.stop)
+        timer.start()
+        with self.assertRaises(StopIteration):
+            next(subscription)
+        timer.join()
+        metrics = subscription.metrics()
+        self.assertEqual(metrics.num_reconnects, 0)
+        self.assertGreater(metrics.num_failed_reconnects, 0)
+        self.assertGreaterEqual(metrics.disconnected_seconds, 0.1)
+
+    def test_stop_whilst_subscribing(self) -> None:
+        class StoppedSubscription(KurrentDBSubscription):
+            def _get_backoff(self, attempt: int) -> float:
+                # Stopped by another thread, before it has subscribed.
+                self.stop()
+                return super()._get_backoff(attempt)
+
+        self.insert(1)
+        self.client.fail_subscribe(ServiceUnavailableError())
+        subscription = StoppedSubscription(self.recorder, reconnect=True)
+        self.assertEqual(self.client.calls["subscribe_to_all"], 1)
+        with self.assertRaises(StopIteration):
+            next(subscription)
+        self.assertEqual(subscription.next_batch(), [])
+
+
+class TestFactoryResilientSubscriptions(TestCase):
+    def test_env_vars(self) -> None:
+        env = Environment("TestCase")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        factory = KurrentDBFactory(env)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertEqual(recorder.subscription_options, {})
+        factory.close()
+
+        env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_RECONNECT] = "yes"
+        env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_MAX_BACKOFF] = "2.5"
+        env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_MAX_RECONNECT_ATTEMPTS] = "7"
+        factory = KurrentDBFactory(env)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertEqual(
+            recorder.subscription_options,
+            {"reconnect": True, "max_backoff": 2.5, "max_reconnect_attempts": 7},
+        )
+        factory.close()
+
+    def test_subscribe(self) -> None:
+        client = FaultyKurrentDBClient()
+        recorder = KurrentDBApplicationRecorder(
+            client,  # type: ignore[arg-type]
+            subscription_options={"reconnect": True, "initial_backoff": 0.01},
+        )
+        client.fail_subscribe(ServiceUnavailableError())
+        with recorder.subscribe() as subscription:
+            assert isinstance(subscription, KurrentDBSubscription)
+            self.assertTrue(subscription.reconnect)
+            self.assertEqual(subscription.metrics().num_reconnects, 1)
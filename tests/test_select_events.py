@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from unittest import IsolatedAsyncioTestCase, TestCase
+from uuid import uuid4
+
+from eventsourcing_kurrentdb.asyncio_recorders import AsyncKurrentDBAggregateRecorder
+from eventsourcing_kurrentdb.recorders import KurrentDBAggregateRecorder
+from tests.common import new_stored_event
+from tests.fake_client import FakeAsyncKurrentDBClient, FakeKurrentDBClient
+from tests.test_snapshots import new_snapshot
+
+
+class TestSelectEventsRoundTrips(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+        )
+        self.originator_id = uuid4()
+        self.recorder.insert_events(
+            [new_stored_event(self.originator_id, v) for v in range(6)]
+        )
+
+    def select_versions(self, **kwargs: int | bool) -> list[int]:
+        self.client.reset_calls()
+        stored_events = self.recorder.select_events(
+            self.originator_id,
+            **kwargs,  # type: ignore[arg-type]
+        )
+        self.assertEqual(self.recorder.last_round_trips, self.client.round_trips)
+        return [e.originator_version for e in stored_events]
+
+    def test_backwards_reads_are_one_round_trip(self) -> None:
+        self.assertEqual(self.select_versions(desc=True, lte=3), [3, 2, 1, 0])
+        self.assertEqual(self.recorder.last_round_trips, 1)
+        self.assertEqual(self.select_versions(desc=True, lte=10), [5, 4, 3, 2, 1, 0])
+        self.assertEqual(self.recorder.last_round_trips, 1)
+        self.assertEqual(self.select_versions(desc=True, gt=2), [5, 4, 3])
+        self.assertEqual(self.recorder.last_round_trips, 1)
+        self.assertEqual(self.select_versions(desc=True, gt=2, limit=2), [5, 4])
+        self.assertEqual(self.select_versions(desc=True, gt=1, lte=10), [5, 4, 3, 2])
+        self.assertEqual(self.select_versions(desc=True, gt=1, lte=3), [3, 2])
+        self.assertEqual(self.select_versions(desc=True, gt=5), [])
+        self.assertEqual(self.select_versions(desc=True, limit=1), [5])
+        self.assertEqual(self.recorder.last_round_trips, 1)
+        self.assertEqual(self.client.calls["get_current_version"], 0)
+
+    def test_empty_reads_have_no_round_trips(self) -> None:
+        self.assertEqual(self.select_versions(desc=True, gt=3, lte=3), [])
+        self.assertEqual(self.select_versions(gt=3, lte=2), [])
+        self.assertEqual(self.select_versions(limit=0), [])
+        self.assertEqual(self.recorder.last_round_trips, 0)
+
+    def test_stream_not_found(self) -> None:
+        self.originator_id = uuid4()
+        self.assertEqual(self.select_versions(desc=True, gt=1, lte=3), [])
+        self.assertEqual(self.select_versions(desc=True, gt=1), [])
+        self.assertEqual(self.recorder.last_round_trips, 1)
+
+    def test_snapshots_are_trimmed_by_originator_version(self) -> None:
+        recorder = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+        )
+        for version in (5, 10, 15):
+            recorder.insert_events([new_snapshot(self.originator_id, version)])
+        snapshots = recorder.select_events(self.originator_id, desc=True, gt=5)
+        self.assertEqual([s.originator_version for s in snapshots], [15, 10])
+        self.assertEqual(recorder.last_round_trips, 1)
+
+
+class TestAsyncSelectEventsRoundTrips(IsolatedAsyncioTestCase):
+    async def test_backwards_reads_are_one_round_trip(self) -> None:
+        client = FakeAsyncKurrentDBClient()
+        recorder = AsyncKurrentDBAggregateRecorder(
+            client=client,  # type: ignore[arg-type]
+        )
+        originator_id = uuid4()
+        await recorder.insert_events(
+            [new_stored_event(originator_id, v) for v in range(6)]
+        )
+        client.sync_client.reset_calls()
+        stored_events = await recorder.select_events(
+            originator_id, desc=True, gt=1, lte=10
+        )
+        self.assertEqual([e.originator_version for e in stored_events], [5, 4, 3, 2])
+        self.assertEqual(recorder.last_round_trips, 1)
+        self.assertEqual(client.sync_client.round_trips, 1)
+        self.assertEqual(await recorder.select_events(originator_id, gt=3, lte=3), [])
+        self.assertEqual(recorder.last_round_trips, 0)
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from threading import Event
+from typing import TYPE_CHECKING
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    ProgrammingError,
+    StoredEvent,
+)
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.clients import KurrentDBClientPool
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import KurrentDBAggregateRecorder
+from eventsourcing_kurrentdb.snapshots import KurrentDBSnapshotWriter
+from tests.common import INSECURE_CONNECTION_STRING
+from tests.fake_client import FakeKurrentDBClient
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+
+def new_snapshot(originator_id: object, originator_version: int) -> StoredEvent:
+    return StoredEvent(
+        originator_id=originator_id,  # type: ignore[arg-type]
+        originator_version=originator_version,
+        topic="topic1:Snapshot",
+        state=b'{"state": "state1"}',
+    )
+
+
+class TestSnapshotWrites(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+
+    def create_recorder(self) -> KurrentDBAggregateRecorder:
+        return KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+        )
+
+    def test_reads_only_when_cache_misses(self) -> None:
+        recorder = self.create_recorder()
+        originator_id = uuid4()
+
+        # First write reads the snapshot stream (cache miss).
+        recorder.insert_events([new_snapshot(originator_id, 5)])
+        self.assertEqual(self.client.calls["read_stream"], 1)
+        self.assertEqual(self.client.calls["append_events"], 1)
+
+        # Subsequent writes don't read.
+        self.client.reset_calls()
+        recorder.insert_events([new_snapshot(originator_id, 10)])
+        recorder.insert_events([new_snapshot(originator_id, 15)])
+        self.assertEqual(self.client.round_trips, 2)
+
+        # Older snapshot is skipped, without any round trips.
+        self.client.reset_calls()
+        recorder.insert_events([new_snapshot(originator_id, 12)])
+        self.assertEqual(self.client.round_trips, 0)
+
+        snapshots = recorder.select_events(originator_id, desc=True, limit=1)
+        self.assertEqual(snapshots[0].originator_version, 15)
+
+    def test_selecting_last_snapshot_fills_cache(self) -> None:
+        recorder = self.create_recorder()
+        originator_id = uuid4()
+        self.create_recorder().insert_events([new_snapshot(originator_id, 5)])
+
+        recorder.select_events(originator_id, desc=True, limit=1)
+
+        self.client.reset_calls()
+        recorder.insert_events([new_snapshot(originator_id, 10)])
+        self.assertEqual(self.client.round_trips, 1)
+
+    def test_never_goes_backwards_when_written_elsewhere(self) -> None:
+        recorder1 = self.create_recorder()
+        recorder2 = self.create_recorder()
+        originator_id = uuid4()
+
+        recorder1.insert_events([new_snapshot(originator_id, 5)])
+        recorder2.insert_events([new_snapshot(originator_id, 20)])
+
+        # Recorder1 has stale cache, so its append conflicts and it reads.
+        self.client.reset_calls()
+        recorder1.insert_events([new_snapshot(originator_id, 10)])
+        self.assertEqual(self.client.calls["append_events"], 1)
+        self.assertEqual(self.client.calls["read_stream"], 1)
+
+        snapshots = recorder1.select_events(originator_id, desc=True, limit=1)
+        self.assertEqual(snapshots[0].originator_version, 20)
+
+        # Newer snapshot is appended after refreshing the cache.
+        recorder1.insert_events([new_snapshot(originator_id, 25)])
+        snapshots = recorder2.select_events(originator_id)
+        self.assertEqual([s.originator_version for s in snapshots], [5, 20, 25])
+
+    def test_cache_is_bounded(self) -> None:
+        recorder = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+            snapshot_cache_maxsize=2,
+        )
+        originator_ids = [uuid4() for _ in range(3)]
+        for originator_id in originator_ids:
+            recorder.insert_events([new_snapshot(originator_id, 1)])
+        self.assertEqual(len(recorder._snapshot_cache), 2)
+
+        # The first was evicted, so it has to be read again.
+        self.client.reset_calls()
+        recorder.insert_events([new_snapshot(originator_ids[0], 2)])
+        self.assertEqual(self.client.calls["read_stream"], 1)
+
+
+class TestSnapshotWriter(TestCase):
+    def test_writes_newest_queued_snapshot(self) -> None:
+        written: list[StoredEvent] = []
+        is_writing = Event()
+        can_write = Event()
+
+        def write(stored_events: Sequence[StoredEvent]) -> None:
+            is_writing.set()
+            can_write.wait(timeout=5)
+            written.extend(stored_events)
+
+        writer = KurrentDBSnapshotWriter(write=write, maxsize=2)
+        originator_id1 = uuid4()
+        originator_id2 = uuid4()
+        originator_id3 = uuid4()
+
+        # Block the worker thread with the first snapshot.
+        writer.put(new_snapshot(originator_id1, 1))
+        self.assertTrue(is_writing.wait(timeout=5))
+
+        # Queue several snapshots of the same aggregate.
+        writer.put(new_snapshot(originator_id1, 2))
+        writer.put(new_snapshot(originator_id1, 4))
+        writer.put(new_snapshot(originator_id1, 3))
+        writer.put(new_snapshot(originator_id2, 1))
+        writer.put(new_snapshot(originator_id3, 1))  # queue is full
+
+        metrics = writer.metrics()
+        self.assertEqual(metrics.queue_depth, 2)
+        self.assertEqual(metrics.num_dropped, 3)
+        self.assertEqual(metrics.num_written, 0)
+
+        can_write.set()
+        self.assertTrue(writer.flush(timeout=5))
+        writer.close()
+
+        self.assertEqual(
+            [(s.originator_id, s.originator_version) for s in written],
+            [(originator_id1, 1), (originator_id1, 4), (originator_id2, 1)],
+        )
+        metrics = writer.metrics()
+        self.assertEqual(metrics.queue_depth, 0)
+        self.assertEqual(metrics.num_written, 3)
+        self.assertEqual(metrics.num_errors, 0)
+
+        with self.assertRaises(ProgrammingError):
+            writer.put(new_snapshot(originator_id1, 5))
+
+    def test_counts_errors(self) -> None:
+        def write(stored_events: Sequence[StoredEvent]) -> None:
+            msg = f"Failed to write {len(stored_events)} snapshots"
+            raise ValueError(msg)
+
+        writer = KurrentDBSnapshotWriter(write=write)
+        writer.put(new_snapshot(uuid4(), 1))
+        writer.close()
+        self.assertEqual(writer.metrics().num_errors, 1)
+        self.assertIsInstance(writer.last_error, ValueError)
+
+    def test_recorder_with_snapshot_writer(self) -> None:
+        client = FakeKurrentDBClient()
+        recorder = KurrentDBAggregateRecorder(
+            client=client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+            snapshot_writer_maxsize=10,
+        )
+        assert recorder.snapshot_writer is not None
+        originator_id = uuid4()
+        recorder.insert_events([new_snapshot(originator_id, 1)])
+        recorder.snapshot_writer.close()
+
+        snapshots = recorder.select_events(originator_id)
+        self.assertEqual(len(snapshots), 1)
+
+
+class TestFactorySnapshotWriter(TestCase):
+    def setUp(self) -> None:
+        self.env = Environment("TestCase")
+        self.env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        self.env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        self.original_client_pool = KurrentDBFactory.client_pool
+        KurrentDBFactory.client_pool = KurrentDBClientPool(
+            client_class=FakeKurrentDBClient,  # type: ignore[arg-type]
+        )
+
+    def tearDown(self) -> None:
+        KurrentDBFactory.client_pool = self.original_client_pool
+
+    def test_env_vars(self) -> None:
+        factory = KurrentDBFactory(self.env)
+        recorder = factory.aggregate_recorder("snapshots")
+        assert isinstance(recorder, KurrentDBAggregateRecorder)
+        self.assertIsNone(recorder.snapshot_writer)
+        factory.close()
+
+        self.env[KurrentDBFactory.KURRENTDB_SNAPSHOT_WRITER] = "yes"
+        self.env[KurrentDBFactory.KURRENTDB_SNAPSHOT_WRITER_MAXSIZE] = "50"
+        factory = KurrentDBFactory(self.env)
+        recorder = factory.aggregate_recorder("snapshots")
+        assert isinstance(recorder, KurrentDBAggregateRecorder)
+        assert recorder.snapshot_writer is not None
+        self.assertEqual(recorder.snapshot_writer.maxsize, 50)
+
+        # Events recorder doesn't have a snapshot writer.
+        events_recorder = factory.aggregate_recorder("events")
+        assert isinstance(events_recorder, KurrentDBAggregateRecorder)
+        self.assertIsNone(events_recorder.snapshot_writer)
+
+        # Queued snapshots are written when factory is closed.
+        originator_id = uuid4()
+        recorder.insert_events([new_snapshot(originator_id, 1)])
+        factory.close()
+        self.assertEqual(recorder.snapshot_writer.metrics().num_written, 1)
+        self.assertFalse(recorder.snapshot_writer._thread.is_alive())
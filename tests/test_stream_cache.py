@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Any
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import InfrastructureFactory
+from eventsourcing.tests.persistence import AggregateRecorderTestCase
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBAggregateRecorder,
+    KurrentDBApplicationRecorder,
+)
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeKurrentDBClient, FakeReadResponse
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class TestAggregateRecorderWithStreamCache(AggregateRecorderTestCase):
+    INITIAL_VERSION = 0
+
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+
+    def create_recorder(self) -> KurrentDBAggregateRecorder:
+        return KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            stream_cache_max_bytes=1024 * 1024,
+        )
+
+    def test_performance(self) -> None:
+        self.skipTest("Not meaningful with the fake client")
+
+
+class TestKurrentDBStreamCache(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            stream_cache_max_bytes=1000,
+        )
+        # Writes events without the cache, like another process.
+        self.other = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+        )
+        assert self.recorder.stream_cache is not None
+        self.cache = self.recorder.stream_cache
+
+    def tearDown(self) -> None:
+        self.cache.close()
+
+    def wait_for(self, condition: Callable[[], bool]) -> None:
+        deadline = monotonic() + 5
+        while not condition() and monotonic() < deadline:
+            sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_cached_stream_reads_only_new_events(self) -> None:
+        originator_id = uuid4()
+        self.other.insert_events([new_stored_event(originator_id, v) for v in range(3)])
+        self.assertEqual(len(self.recorder.select_events(originator_id)), 3)
+        self.assertEqual(self.cache.metrics().num_misses, 1)
+
+        # Stop the subscription, so that new events are read.
+        self.cache.close()
+        self.cache.put(originator_id, 0, self.other.select_events(originator_id))
+        self.other.insert_events([new_stored_event(originator_id, 3)])
+        read_stream = self.client.read_stream
+        positions: list[int | None] = []
+
+        def spy(*args: Any, **kwargs: Any) -> FakeReadResponse:
+            positions.append(kwargs.get("stream_position"))
+            return read_stream(*args, **kwargs)
+
+        self.client.read_stream = spy  # type: ignore[method-assign]
+        stored_events = self.recorder.select_events(originator_id)
+        self.assertEqual([e.originator_version for e in stored_events], [0, 1, 2, 3])
+        self.assertEqual(positions, [3])
+        self.assertEqual(self.cache.metrics().num_hits, 1)
+
+        # Events up to a cached version aren't read.
+        stored_events = self.recorder.select_events(originator_id, gt=0, lte=2)
+        self.assertEqual([e.originator_version for e in stored_events], [1, 2])
+        self.assertEqual(positions, [3])
+
+        # Descending and limited selects aren't cached.
+        self.recorder.select_events(originator_id, desc=True, limit=1)
+        self.assertEqual(positions, [3, None])
+
+    def test_select_after_end_of_cached_stream(self) -> None:
+        originator_id = uuid4()
+        self.other.insert_events([new_stored_event(originator_id, v) for v in range(5)])
+        self.assertEqual(len(self.recorder.select_events(originator_id)), 5)
+
+        # Another process appends events that the subscription hasn't applied.
+        self.cache.close()
+        self.cache.put(originator_id, 0, self.other.select_events(originator_id))
+        for version in range(5, 10):
+            self.other.insert_events([new_stored_event(originator_id, version)])
+
+        stored_events = self.recorder.select_events(originator_id, gt=7)
+        self.assertEqual([e.originator_version for e in stored_events], [8, 9])
+        stored_events = self.recorder.select_events(originator_id, gt=5, lte=8)
+        self.assertEqual([e.originator_version for e in stored_events], [6, 7, 8])
+        stored_events = self.recorder.select_events(originator_id, gt=9)
+        self.assertEqual(stored_events, [])
+
+    def test_subscription_appends_new_events(self) -> None:
+        originator_id = uuid4()
+        self.other.insert_events([new_stored_event(originator_id, 0)])
+        self.assertEqual(len(self.recorder.select_events(originator_id)), 1)
+
+        self.other.insert_events([new_stored_event(originator_id, 1)])
+        self.other.insert_events([new_stored_event(uuid4(), 0)])
+        self.wait_for(lambda: self.cache.metrics().num_appended == 1)
+
+        # There is nothing new to read.
+        self.client.reset_calls()
+        self.assertEqual(len(self.recorder.select_events(originator_id)), 2)
+        self.assertEqual(self.client.calls["read_stream"], 1)
+        self.assertEqual(self.cache.metrics().num_streams, 1)
+
+    def test_inserted_events_are_cached(self) -> None:
+        originator_id = uuid4()
+        self.recorder.insert_events([new_stored_event(originator_id, 0)])
+        self.assertEqual(len(self.recorder.select_events(originator_id)), 1)
+        self.recorder.insert_events(
+            [new_stored_event(originator_id, 1), new_stored_event(originator_id, 2)]
+        )
+        self.client.reset_calls()
+        self.assertEqual(len(self.recorder.select_events(originator_id, lte=2)), 3)
+        self.assertEqual(self.client.round_trips, 0)
+
+    def test_partial_stream_after_snapshot(self) -> None:
+        originator_id = uuid4()
+        self.other.insert_events([new_stored_event(originator_id, v) for v in range(5)])
+        stored_events = self.recorder.select_events(originator_id, gt=2)
+        self.assertEqual([e.originator_version for e in stored_events], [3, 4])
+        stored_events = self.recorder.select_events(originator_id, gt=3)
+        self.assertEqual([e.originator_version for e in stored_events], [4])
+        self.assertEqual(self.cache.metrics().num_hits, 1)
+
+        # Earlier events are read, and replace the cached stream.
+        stored_events = self.recorder.select_events(originator_id)
+        self.assertEqual(len(stored_events), 5)
+        self.assertEqual(self.cache.metrics().num_misses, 2)
+        self.assertEqual(len(self.recorder.select_events(originator_id, lte=4)), 5)
+        self.assertEqual(self.cache.metrics().num_hits, 2)
+
+    def test_stream_is_invalidated_when_events_are_missed(self) -> None:
+        originator_id = uuid4()
+        self.cache.put(originator_id, 0, [new_stored_event(originator_id, 0)])
+        self.cache.extend(originator_id, [new_stored_event(originator_id, 2)])
+        metrics = self.cache.metrics()
+        self.assertEqual(metrics.num_invalidated, 1)
+        self.assertEqual(metrics.num_streams, 0)
+        self.assertEqual(metrics.num_bytes, 0)
+
+    def test_cache_is_bounded_by_bytes(self) -> None:
+        originator_ids = [uuid4() for _ in range(3)]
+        for originator_id in originator_ids:
+            self.recorder.insert_events(
+                [new_stored_event(originator_id, 0, state=b"x" * 300)]
+            )
+            self.recorder.select_events(originator_id)
+        self.assertEqual(self.cache.metrics().num_streams, 2)
+        self.assertLessEqual(self.cache.metrics().num_bytes, 1000)
+
+        # The least recently used stream was evicted.
+        self.recorder.select_events(originator_ids[1])
+        self.recorder.select_events(originator_ids[0])
+        self.assertEqual(self.cache.metrics().num_misses, 4)
+        self.recorder.select_events(originator_ids[1])
+        self.assertEqual(self.cache.metrics().num_hits, 2)
+
+
+class TestFactoryStreamCache(TestCase):
+    def test_env_var(self) -> None:
+        env = Environment("TestCase")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        factory = KurrentDBFactory(env)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertIsNone(recorder.stream_cache)
+        factory.close()
+
+        env[KurrentDBFactory.KURRENTDB_STREAM_CACHE_MAX_BYTES] = "1000"
+        factory = KurrentDBFactory(env)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        assert recorder.stream_cache is not None
+        self.assertEqual(recorder.stream_cache.max_bytes, 1000)
+        snapshot_recorder = factory.aggregate_recorder(purpose="snapshots")
+        assert isinstance(snapshot_recorder, KurrentDBAggregateRecorder)
+        self.assertIsNone(snapshot_recorder.stream_cache)
+
+        # The cache is closed when the factory is closed.
+        recorder.stream_cache.put("stream1", 0, [new_stored_event("stream1", 0)])
+        factory.close()
+        self.assertEqual(recorder.stream_cache.metrics().num_streams, 0)
+
+
+del AggregateRecorderTestCase
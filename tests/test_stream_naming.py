@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+from unittest import TestCase
+from uuid import UUID, uuid4
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    InfrastructureFactoryError,
+)
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.asyncio_recorders import AsyncKurrentDBApplicationRecorder
+from eventsourcing_kurrentdb.clients import KurrentDBClientPool
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.filters import NotificationFilter
+from eventsourcing_kurrentdb.naming import CategoryStreamNaming, StreamNaming
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBAggregateRecorder,
+    KurrentDBApplicationRecorder,
+)
+from tests.common import INSECURE_CONNECTION_STRING, new_stored_event
+from tests.fake_client import FakeAsyncKurrentDBClient, FakeKurrentDBClient
+
+
+class TestCategoryStreamNaming(TestCase):
+    def test_stream_names(self) -> None:
+        originator_id = uuid4()
+        naming = CategoryStreamNaming("Order")
+        self.assertEqual(naming.stream_name(originator_id), f"Order-{originator_id}")
+        self.assertEqual(
+            naming.originator_id(f"Order-{originator_id}"), str(originator_id)
+        )
+        # IDs can contain the separator.
+        self.assertEqual(naming.originator_id("Order-a-b"), "a-b")
+        self.assertEqual(naming.originator_id("no separator"), "no separator")
+        self.assertEqual(StreamNaming().stream_name(originator_id), str(originator_id))
+
+    def test_category_function(self) -> None:
+        naming = CategoryStreamNaming(lambda originator_id: str(originator_id)[:1])
+        self.assertEqual(naming.stream_name("x1"), "x-x1")
+        with self.assertRaises(ValueError):
+            naming.stream_name("-1")
+
+    def test_equality(self) -> None:
+        self.assertEqual(StreamNaming(), StreamNaming())
+        self.assertEqual(CategoryStreamNaming("Order"), CategoryStreamNaming("Order"))
+        self.assertEqual(
+            hash(CategoryStreamNaming("Order")), hash(CategoryStreamNaming("Order"))
+        )
+        self.assertNotEqual(CategoryStreamNaming("Order"), CategoryStreamNaming("Line"))
+        self.assertNotEqual(CategoryStreamNaming("Order"), StreamNaming())
+
+    def test_invalid_categories(self) -> None:
+        with self.assertRaises(ValueError):
+            CategoryStreamNaming("")
+        with self.assertRaises(ValueError):
+            CategoryStreamNaming("Order-Line")
+
+
+class TestRecorderStreamNaming(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient(by_category_projection=True)
+        self.orders = self.create_recorder("Order")
+        self.customers = self.create_recorder("Customer")
+        self.order_ids = [uuid4(), uuid4()]
+        self.customer_id = uuid4()
+        for version in range(2):
+            for order_id in self.order_ids:
+                self.orders.insert_events([new_stored_event(order_id, version)])
+            self.customers.insert_events(
+                [new_stored_event(self.customer_id, version, "app.domain:Added")]
+            )
+
+    def create_recorder(
+        self, category: str, **kwargs: Any
+    ) -> KurrentDBApplicationRecorder:
+        recorder = KurrentDBApplicationRecorder(
+            self.client,  # type: ignore[arg-type]
+            stream_naming=CategoryStreamNaming(category),
+            **kwargs,
+        )
+        recorder.validate_uuids = True
+        return recorder
+
+    def test_stream_names_round_trip(self) -> None:
+        order_id = self.order_ids[0]
+        self.assertIn(f"Order-{order_id}", self.client._streams)
+        self.assertNotIn(str(order_id), self.client._streams)
+
+        stored_events = self.orders.select_events(order_id)
+        self.assertEqual([e.originator_id for e in stored_events], [order_id] * 2)
+        tail = self.orders.select_events_after(order_id, 0)
+        self.assertEqual([e.originator_version for e in tail.events], [1])
+        self.assertEqual(tail.current_version, 1)
+
+        notifications = self.orders.select_notifications(None, 10)
+        self.assertEqual(len(notifications), 6)
+        self.assertEqual(
+            [n.originator_id for n in notifications[:3]],
+            [*self.order_ids, self.customer_id],
+        )
+        self.assertIsInstance(notifications[0].originator_id, UUID)
+        recorded_event = next(iter(self.client.read_all()))
+        self.assertEqual(
+            self.orders.construct_notification(recorded_event).originator_id,
+            self.order_ids[0],
+        )
+
+    def test_async_recorder(self) -> None:
+        recorder = AsyncKurrentDBApplicationRecorder(
+            FakeAsyncKurrentDBClient(sync_client=self.client),  # type: ignore[arg-type]
+            stream_naming=CategoryStreamNaming("Order"),
+        )
+        recorder.validate_uuids = True
+        order_id = self.order_ids[1]
+        stored_events = asyncio.run(recorder.select_events(order_id))
+        self.assertEqual([e.originator_id for e in stored_events], [order_id] * 2)
+        notifications = asyncio.run(recorder.select_notifications(None, 10))
+        self.assertEqual(notifications, self.orders.select_notifications(None, 10))
+
+    def test_snapshots(self) -> None:
+        snapshots = KurrentDBAggregateRecorder(
+            self.client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+            stream_naming=CategoryStreamNaming("Order"),
+        )
+        order_id = self.order_ids[0]
+        snapshots.insert_events([new_stored_event(order_id, 1, "app.domain:Snapshot")])
+        self.assertIn(f"snapshot-$Order-{order_id}", self.client._streams)
+        (snapshot,) = snapshots.select_events(order_id, desc=True, limit=1)
+        self.assertEqual(snapshot.originator_id, order_id)
+        self.assertEqual(snapshot.originator_version, 1)
+        # Snapshots aren't notified.
+        self.assertEqual(len(self.orders.select_notifications(None, 10)), 6)
+
+    def test_stream_cache(self) -> None:
+        recorder = self.create_recorder("Order", stream_cache_max_bytes=1000)
+        order_id = self.order_ids[0]
+        self.assertEqual(len(recorder.select_events(order_id)), 2)
+        self.assertEqual(len(recorder.select_events(order_id)), 2)
+        assert recorder.stream_cache is not None
+        self.assertEqual(recorder.stream_cache.metrics().num_hits, 1)
+        self.assertIn(f"Order-{order_id}", recorder.stream_cache._streams)
+        recorder.stream_cache.close()
+
+    def test_select_category_notifications(self) -> None:
+        notifications = self.orders.select_category_notifications("Order", None, 10)
+        self.assertEqual(
+            [n.originator_id for n in notifications], [*self.order_ids] * 2
+        )
+        self.assertEqual(self.client.calls["read_all"], 0)
+
+        # Pages of the category stream.
+        page = self.orders.select_category_notifications(
+            "Order", notifications[1].id, 2, inclusive_of_start=False
+        )
+        self.assertEqual(page, notifications[2:4])
+        page = self.orders.select_category_notifications(
+            "Customer", None, 10, stop=notifications[1].id
+        )
+        self.assertEqual([n.originator_id for n in page], [self.customer_id])
+        with self.assertRaises(ValueError):
+            self.orders.select_category_notifications("", None, 10)
+
+    def test_select_category_notifications_without_projection(self) -> None:
+        expected = self.orders.select_category_notifications("Order", None, 10)
+        self.client.by_category_projection = False
+        self.client._streams = {
+            k: v for k, v in self.client._streams.items() if not k.startswith("$ce-")
+        }
+        self.client.reset_calls()
+        notifications = self.orders.select_category_notifications("Order", None, 10)
+        self.assertEqual(notifications, expected)
+        self.assertEqual(self.client.calls["read_all"], 1)
+
+    def test_subscribe_category(self) -> None:
+        with self.orders.subscribe_category("Customer") as subscription:
+            notifications = [next(subscription), next(subscription)]
+        self.assertEqual(
+            [n.originator_id for n in notifications], [self.customer_id] * 2
+        )
+        self.assertEqual(
+            notifications,
+            list(self.customers.select_category_notifications("Customer", None, 10)),
+        )
+
+
+class TestFactoryStreamNaming(TestCase):
+    def setUp(self) -> None:
+        self.original_pool = KurrentDBFactory.client_pool
+        KurrentDBFactory.client_pool = KurrentDBClientPool()
+        self.env = Environment("TestCase")
+        self.env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        self.env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+
+    def tearDown(self) -> None:
+        KurrentDBFactory.client_pool.close()
+        KurrentDBFactory.client_pool = self.original_pool
+
+    def test_default(self) -> None:
+        factory = KurrentDBFactory(self.env)
+        self.assertIsNone(factory.stream_naming)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertIs(type(recorder.stream_naming), StreamNaming)
+        factory.close()
+
+    def test_category(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_STREAM_CATEGORY] = "Order"
+        factory = KurrentDBFactory(self.env)
+        assert factory.stream_naming is not None
+        self.assertEqual(factory.stream_naming.category, "Order")
+        self.assertEqual(
+            factory.notification_filter,
+            NotificationFilter.include_stream_prefixes("Order-"),
+        )
+        recorders: list[Any] = [
+            factory.aggregate_recorder(),
+            factory.aggregate_recorder("snapshots"),
+            factory.application_recorder(),
+            factory.process_recorder(),
+            factory.async_aggregate_recorder(),
+            factory.async_application_recorder(),
+        ]
+        for recorder in recorders:
+            self.assertIs(recorder.stream_naming, factory.stream_naming)
+            self.assertEqual(recorder.notification_filter, factory.notification_filter)
+        factory.close()
+
+    def test_prefixes_have_priority(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_STREAM_CATEGORY] = "Order"
+        self.env[KurrentDBFactory.KURRENTDB_NOTIFICATION_TYPE_PREFIXES] = "app."
+        factory = KurrentDBFactory(self.env)
+        self.assertEqual(
+            factory.notification_filter,
+            NotificationFilter.include_type_prefixes("app."),
+        )
+        factory.close()
+
+    def test_invalid_category(self) -> None:
+        self.env[KurrentDBFactory.KURRENTDB_STREAM_CATEGORY] = "Order-Line"
+        with self.assertRaises(InfrastructureFactoryError):
+            KurrentDBFactory(self.env)
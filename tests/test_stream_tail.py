@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import ProgrammingError
+
+from eventsourcing_kurrentdb.recorders import KurrentDBAggregateRecorder, StreamTail
+from tests.common import new_stored_event
+from tests.fake_client import FakeKurrentDBClient, FakeReadResponse
+
+
+class TestSelectEventsAfter(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+        )
+        self.originator_id = uuid4()
+
+    def insert(self, *versions: int) -> None:
+        self.recorder.insert_events(
+            [new_stored_event(self.originator_id, v) for v in versions]
+        )
+
+    def select_after(self, version: int | None, page_size: int = 3) -> StreamTail:
+        self.client.reset_calls()
+        return self.recorder.select_events_after(
+            self.originator_id, version, page_size=page_size
+        )
+
+    def test_stream_not_found(self) -> None:
+        self.assertEqual(self.select_after(None), StreamTail([], None))
+        self.assertEqual(self.select_after(5), StreamTail([], None))
+        self.assertEqual(self.client.round_trips, 1)
+
+    def test_stream_has_not_moved(self) -> None:
+        self.insert(0, 1, 2, 3, 4)
+        read_stream = self.client.read_stream
+        num_read: list[int] = []
+
+        def spy(*args: Any, **kwargs: Any) -> FakeReadResponse:
+            recorded_events = list(read_stream(*args, **kwargs))
+            num_read.append(len(recorded_events))
+            return FakeReadResponse(recorded_events)
+
+        self.client.read_stream = spy  # type: ignore[method-assign]
+        tail = self.select_after(4)
+        self.assertEqual(tail.events, [])
+        self.assertEqual(tail.current_version, 4)
+        self.assertEqual(self.client.round_trips, 1)
+        # No events are transferred.
+        self.assertEqual(num_read, [0])
+
+    def test_few_new_events(self) -> None:
+        self.insert(0, 1, 2, 3, 4)
+        tail = self.select_after(2)
+        self.assertEqual([e.originator_version for e in tail.events], [3, 4])
+        self.assertEqual(tail.current_version, 4)
+        self.assertEqual(self.client.round_trips, 1)
+
+        tail = self.select_after(1, page_size=4)
+        self.assertEqual([e.originator_version for e in tail.events], [2, 3, 4])
+        self.assertEqual(self.client.round_trips, 1)
+
+        # A full page needs another read to check for more new events.
+        tail = self.select_after(1)
+        self.assertEqual([e.originator_version for e in tail.events], [2, 3, 4])
+        self.assertEqual(self.client.round_trips, 2)
+        self.assertEqual(
+            tail.events, self.recorder.select_events(self.originator_id, gt=1)
+        )
+
+    def test_many_new_events(self) -> None:
+        self.insert(*range(10))
+        tail = self.select_after(1)
+        self.assertEqual(
+            [e.originator_version for e in tail.events], list(range(2, 10))
+        )
+        self.assertEqual(tail.current_version, 9)
+        self.assertEqual(self.client.round_trips, 2)
+
+        tail = self.select_after(None)
+        self.assertEqual([e.originator_version for e in tail.events], list(range(10)))
+        self.assertEqual(self.client.round_trips, 2)
+
+        tail = self.select_after(None, page_size=11)
+        self.assertEqual(len(tail.events), 10)
+        self.assertEqual(self.client.round_trips, 1)
+
+    def test_snapshot_streams_are_not_supported(self) -> None:
+        recorder = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            for_snapshotting=True,
+        )
+        with self.assertRaises(ProgrammingError):
+            recorder.select_events_after(self.originator_id, 1)
+
+    def test_stream_cache_is_extended(self) -> None:
+        recorder = KurrentDBAggregateRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            stream_cache_max_bytes=1000,
+        )
+        self.insert(0)
+        recorder.select_events(self.originator_id)
+        self.insert(1, 2)
+        tail = recorder.select_events_after(self.originator_id, 0)
+        self.assertEqual(len(tail.events), 2)
+        self.client.reset_calls()
+        self.assertEqual(len(recorder.select_events(self.originator_id, lte=2)), 3)
+        self.assertEqual(self.client.round_trips, 0)
+        assert recorder.stream_cache is not None
+        recorder.stream_cache.close()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from threading import Timer
+from time import monotonic
+from typing import TYPE_CHECKING
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBApplicationRecorder,
+    KurrentDBSubscription,
+)
+from tests.common import new_stored_event
+from tests.fake_client import FakeKurrentDBClient
+
+if TYPE_CHECKING:
+    from eventsourcing.persistence import Notification
+
+
+class TestSubscriptionBatches(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+        )
+        for _ in range(5):
+            self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+        self.expected = self.recorder.select_notifications(start=None, limit=10)
+
+    def subscribe(self, gt: int | None = None) -> KurrentDBSubscription:
+        subscription = self.recorder.subscribe(gt=gt)
+        assert isinstance(subscription, KurrentDBSubscription)
+        return subscription
+
+    def test_next_batch(self) -> None:
+        with self.subscribe() as subscription:
+            batch = subscription.next_batch(max_items=3, max_wait=1)
+            self.assertEqual([n.id for n in batch], [n.id for n in self.expected[:3]])
+            self.assertEqual(subscription._last_notification_id, batch[-1].id)
+
+            batch = subscription.next_batch(max_items=10, max_wait=1)
+            self.assertEqual([n.id for n in batch], [n.id for n in self.expected[3:]])
+            self.assertEqual(subscription._last_notification_id, batch[-1].id)
+
+            # Returns empty list when nothing is received in time.
+            started = monotonic()
+            self.assertEqual(subscription.next_batch(max_wait=0.1), [])
+            self.assertGreaterEqual(monotonic() - started, 0.1)
+
+            # Waits for new notifications.
+            timer = Timer(
+                0.1,
+                self.recorder.insert_events,
+                args=([new_stored_event(uuid4(), 0)],),
+            )
+            timer.start()
+            batch = subscription.next_batch(max_wait=5)
+            timer.join()
+            self.assertEqual(len(batch), 1)
+
+            # Can still iterate.
+            self.recorder.insert_events([new_stored_event(uuid4(), 0)])
+            notification = next(subscription)
+            self.assertGreater(notification.id, batch[0].id)
+
+        self.assertEqual(subscription.next_batch(max_wait=0), [])
+        with self.assertRaises(StopIteration):
+            next(subscription)
+
+    def test_stop_whilst_waiting(self) -> None:
+        with self.subscribe(gt=self.expected[-1].id) as subscription:
+            timer = Timer(0.1, subscription.stop)
+            timer.start()
+            self.assertEqual(subscription.next_batch(), [])
+            timer.join()
+
+    def test_buffer_size(self) -> None:
+        subscription = KurrentDBSubscription(self.recorder, buffer_size=2)
+        batches: list[list[Notification]] = []
+        with subscription:
+            while sum(len(batch) for batch in batches) < len(self.expected):
+                batches.append(subscription.next_batch(max_wait=1))
+        self.assertEqual(
+            [n.id for batch in batches for n in batch],
+            [n.id for n in self.expected],
+        )
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import gc
+import weakref
+from itertools import islice
+from typing import Any
+from unittest import TestCase
+from uuid import uuid4
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    ProgrammingError,
+    StoredEvent,
+)
+from eventsourcing.utils import Environment
+from kurrentdbclient import NewEvent, StreamState
+from kurrentdbclient.exceptions import (
+    AccessDeniedError,
+    DeadlineExceededError,
+    ServiceUnavailableError,
+)
+
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.filters import NotificationFilter
+from eventsourcing_kurrentdb.hub import (
+    KurrentDBHubSubscription,
+    KurrentDBSubscriptionHub,
+    KurrentDBSubscriptionHubPool,
+)
+from eventsourcing_kurrentdb.naming import CategoryStreamNaming
+from eventsourcing_kurrentdb.recorders import KurrentDBApplicationRecorder
+from tests.common import INSECURE_CONNECTION_STRING
+from tests.fake_client import FakeKurrentDBClient, FaultyKurrentDBClient
+
+
+class TestKurrentDBSubscriptionHub(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+        )
+        self.hub = KurrentDBSubscriptionHub(
+            self.client,  # type: ignore[arg-type]
+            self.recorder.notification_filter,
+            queue_maxsize=3,
+        )
+
+    def tearDown(self) -> None:
+        self.hub.stop()
+
+    def insert(self, *topics: str) -> list[int]:
+        notification_ids: list[int] = []
+        for topic in topics:
+            ids = self.recorder.insert_events([StoredEvent(uuid4(), 0, topic, b"{}")])
+            assert ids is not None
+            notification_ids.extend(ids)
+        return notification_ids
+
+    def test_subscriptions_share_one_subscription(self) -> None:
+        subscription1 = self.hub.subscribe(self.recorder)
+        subscription2 = self.hub.subscribe(self.recorder)
+        notification_ids = self.insert("topic1", "topic2", "topic1")
+        self.assertEqual([n.id for n in islice(subscription1, 3)], notification_ids)
+        self.assertEqual([n.id for n in islice(subscription2, 3)], notification_ids)
+        self.assertEqual(self.client.calls["subscribe_to_all"], 1)
+        self.assertEqual(self.hub.metrics().num_live, 2)
+
+        subscription1.stop()
+        with self.assertRaises(StopIteration):
+            next(subscription1)
+        self.assertEqual(self.hub.metrics().num_live, 1)
+
+    def test_system_event_types_are_not_dispatched(self) -> None:
+        subscription = self.hub.subscribe(self.recorder)
+        self.client.append_events(
+            "stream-1",
+            events=[NewEvent(type="$streamDeleted", data=b"")],
+            current_version=StreamState.ANY,
+        )
+        notification_ids = self.insert("topic1")
+        self.assertEqual(next(subscription).id, notification_ids[0])
+
+    def test_subscriptions_with_topics(self) -> None:
+        subscription1 = self.hub.subscribe(self.recorder, topics=["topic1"])
+        subscription2 = self.hub.subscribe(self.recorder, topics=["topic2"])
+        notification_ids = self.insert("topic1", "topic2", "topic3", "topic1")
+        self.assertEqual(
+            [n.id for n in islice(subscription1, 2)],
+            [notification_ids[0], notification_ids[3]],
+        )
+        self.assertEqual(
+            [n.id for n in islice(subscription2, 1)], [notification_ids[1]]
+        )
+
+        # Topics of the first subscription cover the topics of the third.
+        subscription3 = self.hub.subscribe(
+            self.recorder, gt=notification_ids[0], topics=["topic1"]
+        )
+        self.assertEqual(next(subscription3).id, notification_ids[3])
+        self.assertLessEqual(self.client.calls["subscribe_to_all"], 2)
+
+    def test_late_subscription_catches_up_and_merges(self) -> None:
+        subscription1 = self.hub.subscribe(self.recorder)
+        notification_ids = self.insert("topic1", "topic2", "topic1")
+        self.assertEqual([n.id for n in islice(subscription1, 3)], notification_ids)
+
+        subscription2 = self.hub.subscribe(self.recorder, gt=notification_ids[0])
+        notification_ids += self.insert("topic2", "topic1")
+        self.assertEqual([n.id for n in islice(subscription2, 4)], notification_ids[1:])
+        self.assertEqual([n.id for n in islice(subscription1, 2)], notification_ids[3:])
+
+        # Receives new notifications from the hub, without duplicates.
+        notification_ids += self.insert("topic2")
+        self.assertEqual(next(subscription2).id, notification_ids[-1])
+        self.assertEqual(next(subscription1).id, notification_ids[-1])
+        self.assertEqual(self.hub.metrics().num_live, 2)
+
+    def test_slow_subscription_is_detached(self) -> None:
+        slow = self.hub.subscribe(self.recorder)
+        fast = self.hub.subscribe(self.recorder)
+        self.insert("topic1")
+        next(slow)
+        next(fast)
+        self.assertEqual(self.hub.metrics().num_live, 2)
+
+        # Fills the queues.
+        notification_ids = self.insert(*["topic1"] * 3)
+        self.assertEqual([n.id for n in islice(fast, 3)], notification_ids)
+
+        # The hub doesn't wait for the slow subscription.
+        notification_ids += self.insert("topic1")
+        self.assertEqual(next(fast).id, notification_ids[-1])
+        self.assertEqual(self.hub.metrics().num_detached, 1)
+        self.assertEqual(self.hub.metrics().num_live, 1)
+
+        # The slow subscription catches up from the database.
+        self.assertEqual([n.id for n in islice(slow, 4)], notification_ids)
+        notification_ids += self.insert("topic1")
+        self.assertEqual(next(slow).id, notification_ids[-1])
+        self.assertEqual(next(fast).id, notification_ids[-1])
+
+    def test_notifications_are_constructed_by_each_recorder(self) -> None:
+        orders = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            stream_naming=CategoryStreamNaming("Order"),
+        )
+        orders.validate_uuids = True
+        subscription1 = self.hub.subscribe(self.recorder)
+        subscription2 = self.hub.subscribe(orders)
+        order_id = uuid4()
+        orders.insert_events([StoredEvent(order_id, 0, "topic1", b"{}")])
+        self.assertEqual(next(subscription1).originator_id, f"Order-{order_id}")
+        self.assertEqual(next(subscription2).originator_id, order_id)
+        self.assertIs(subscription2._recorder, orders)
+
+        # Late subscriptions catch up with their own recorder.
+        subscription3 = self.hub.subscribe(orders)
+        self.assertEqual(next(subscription3).originator_id, order_id)
+        self.assertEqual(self.client.calls["subscribe_to_all"], 1)
+
+    def test_recorder_must_use_reader_client_and_filter(self) -> None:
+        other_client = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            reader_client=FakeKurrentDBClient(),
+        )
+        with self.assertRaises(ProgrammingError):
+            self.hub.subscribe(other_client)
+        other_filter = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            notification_filter=NotificationFilter.exclude_types(),
+        )
+        with self.assertRaises(ProgrammingError):
+            self.hub.subscribe(other_filter)
+
+    def test_stop(self) -> None:
+        subscription = self.hub.subscribe(self.recorder)
+        self.hub.stop()
+        with self.assertRaises(StopIteration):
+            next(subscription)
+        with self.assertRaises(ProgrammingError):
+            self.hub.subscribe(self.recorder)
+
+
+class TestSubscriptionHubReconnects(TestCase):
+    def setUp(self) -> None:
+        self.client = FaultyKurrentDBClient(resume_inclusive=True)
+        self.recorder = KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+        )
+        self.hub = KurrentDBSubscriptionHub(
+            self.client,  # type: ignore[arg-type]
+            self.recorder.notification_filter,
+            initial_backoff=0.01,
+            max_backoff=0.02,
+        )
+
+    def tearDown(self) -> None:
+        self.hub.stop()
+
+    def insert(self, num: int) -> list[int]:
+        notification_ids: list[int] = []
+        for _ in range(num):
+            ids = self.recorder.insert_events([StoredEvent(uuid4(), 0, "t", b"")])
+            assert ids is not None
+            notification_ids.extend(ids)
+        return notification_ids
+
+    def test_resumes_after_retryable_error_without_duplicates(self) -> None:
+        self.client.fail_subscribe(DeadlineExceededError())
+        self.client.fail_subscription(after=2, error=ServiceUnavailableError())
+        subscription1 = self.hub.subscribe(self.recorder)
+        subscription2 = self.hub.subscribe(self.recorder)
+        notification_ids = self.insert(5)
+        self.assertEqual([n.id for n in islice(subscription1, 5)], notification_ids)
+        self.assertEqual([n.id for n in islice(subscription2, 5)], notification_ids)
+        metrics = self.hub.metrics()
+        self.assertEqual(metrics.num_disconnects, 2)
+        self.assertEqual(metrics.num_restarts, 2)
+        self.assertEqual(metrics.num_live, 2)
+        self.assertEqual(self.client.calls["subscribe_to_all"], 3)
+
+    def test_non_retryable_error_is_raised(self) -> None:
+        self.client.fail_subscription(after=2, error=AccessDeniedError())
+        subscription = self.hub.subscribe(self.recorder)
+        self.insert(1)
+        next(subscription)
+        self.insert(1)
+        next(subscription)
+        with self.assertRaises(AccessDeniedError):
+            next(subscription)
+
+    def test_error_is_raised_after_max_reconnect_attempts(self) -> None:
+        self.hub.max_reconnect_attempts = 2
+        self.client.fail_subscribe(*[ServiceUnavailableError()] * 3)
+        subscription = self.hub.subscribe(self.recorder)
+        with self.assertRaises(ServiceUnavailableError):
+            next(subscription)
+        self.assertEqual(self.client.calls["subscribe_to_all"], 3)
+
+
+class TestSubscriptionHubPool(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.pool = KurrentDBSubscriptionHubPool()
+
+    def create_recorder(self, **kwargs: Any) -> KurrentDBApplicationRecorder:
+        return KurrentDBApplicationRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            **kwargs,
+        )
+
+    def test_hubs_are_shared_by_recorders_with_the_same_clients(self) -> None:
+        hub = self.pool.get_hub(self.create_recorder())
+        self.assertIs(self.pool.get_hub(self.create_recorder()), hub)
+        reader_client = FakeKurrentDBClient()
+        other = self.pool.get_hub(self.create_recorder(reader_client=reader_client))
+        self.assertIsNot(other, hub)
+        self.assertIs(other.reader_client, reader_client)
+        self.pool.put_hub(hub)
+        self.pool.put_hub(hub)
+        self.pool.put_hub(other)
+
+    def test_hub_is_dropped_when_last_reference_is_put_back(self) -> None:
+        hub = self.pool.get_hub(self.create_recorder())
+        self.pool.get_hub(self.create_recorder())
+        self.pool.put_hub(hub)
+        self.assertEqual(len(self.pool._hubs), 1)
+        self.pool.put_hub(hub)
+        self.assertEqual(self.pool._hubs, {})
+        with self.assertRaises(ProgrammingError):
+            self.pool.put_hub(hub)
+        self.assertIsNot(self.pool.get_hub(self.create_recorder()), hub)
+
+    def test_hub_doesnt_keep_recorders_alive(self) -> None:
+        recorder = self.create_recorder()
+        hub = self.pool.get_hub(recorder)
+        hub.subscribe(recorder).stop()
+        recorder_ref = weakref.ref(recorder)
+        del recorder
+        gc.collect()
+        self.assertIsNone(recorder_ref())
+        self.pool.put_hub(hub)
+
+
+class TestFactorySubscriptionHub(TestCase):
+    def test_env_vars(self) -> None:
+        env = Environment("TestCase")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        factory = KurrentDBFactory(env)
+        recorder = factory.application_recorder()
+        assert isinstance(recorder, KurrentDBApplicationRecorder)
+        self.assertIsNone(recorder.subscription_hub)
+        factory.close()
+
+        original_pool = KurrentDBFactory.subscription_hub_pool
+        KurrentDBFactory.subscription_hub_pool = KurrentDBSubscriptionHubPool()
+        try:
+            env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_HUB] = "yes"
+            env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_HUB_QUEUE_MAXSIZE] = "10"
+            env[KurrentDBFactory.KURRENTDB_SUBSCRIPTION_MAX_BACKOFF] = "2"
+            factory1 = KurrentDBFactory(env)
+            factory2 = KurrentDBFactory(env)
+            recorder1 = factory1.application_recorder()
+            recorder2 = factory2.process_recorder()
+            assert isinstance(recorder1, KurrentDBApplicationRecorder)
+            assert isinstance(recorder2, KurrentDBApplicationRecorder)
+            hub = recorder1.subscription_hub
+            assert hub is not None
+            self.assertIs(recorder2.subscription_hub, hub)
+            self.assertEqual(hub.queue_maxsize, 10)
+            self.assertEqual(hub.max_backoff, 2)
+            pool = KurrentDBFactory.subscription_hub_pool
+            factory1.close()
+            self.assertEqual(list(pool._hubs.values()), [hub])
+            factory2.close()
+            self.assertEqual(pool._hubs, {})
+            with self.assertRaises(ProgrammingError):
+                hub.subscribe(recorder2)
+        finally:
+            KurrentDBFactory.subscription_hub_pool = original_pool
+
+    def test_subscribe(self) -> None:
+        recorder = KurrentDBApplicationRecorder(
+            FakeKurrentDBClient()  # type: ignore[arg-type]
+        )
+        hub = KurrentDBSubscriptionHub(
+            recorder.reader_client, recorder.notification_filter
+        )
+        other = KurrentDBApplicationRecorder(recorder.client)
+        other.subscription_hub = hub
+        with other.subscribe(topics=["topic1"]) as subscription:
+            self.assertIsInstance(subscription, KurrentDBHubSubscription)
+            self.assertIs(subscription._recorder, other)
+        hub.stop()
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import json
+from threading import Event, Timer
+from time import monotonic, sleep
+from typing import Any
+from unittest import TestCase
+
+from eventsourcing.persistence import (
+    InfrastructureFactory,
+    IntegrityError,
+    PersistenceError,
+    Tracking,
+    WaitInterruptedError,
+)
+from eventsourcing.tests.persistence import TrackingRecorderTestCase
+from eventsourcing.utils import Environment
+
+from eventsourcing_kurrentdb.factory import KurrentDBFactory
+from eventsourcing_kurrentdb.recorders import (
+    KurrentDBApplicationRecorder,
+    KurrentDBProcessRecorder,
+    KurrentDBTrackingRecorder,
+)
+from tests.common import INSECURE_CONNECTION_STRING
+from tests.fake_client import FakeKurrentDBClient
+
+
+class TestTrackingRecorder(TrackingRecorderTestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+
+    def create_recorder(self) -> KurrentDBTrackingRecorder:
+        return KurrentDBTrackingRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            name="projection",
+        )
+
+
+class TestProcessRecorderTracking(TrackingRecorderTestCase):
+    # The process recorder records tracking objects with its events, and
+    # is also a tracking recorder.
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+
+    def create_recorder(self) -> KurrentDBProcessRecorder:
+        return KurrentDBProcessRecorder(
+            self.client,  # type: ignore[arg-type]
+            name="follower",
+        )
+
+
+class TestKurrentDBTrackingRecorder(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeKurrentDBClient()
+        self.recorder = self.construct_recorder()
+
+    def tearDown(self) -> None:
+        self.recorder.close()
+
+    def construct_recorder(self, **kwargs: Any) -> KurrentDBTrackingRecorder:
+        kwargs.setdefault("checkpoint_interval", 3)
+        kwargs.setdefault("checkpoint_interval_ms", 60000)
+        return KurrentDBTrackingRecorder(
+            client=self.client,  # type: ignore[arg-type]
+            name="projection",
+            **kwargs,
+        )
+
+    def read_checkpoints(self) -> list[int]:
+        stream_name = self.recorder.create_tracking_stream_name("upstream")
+        self.assertEqual(stream_name, "tracking-$projection-upstream")
+        if stream_name not in self.client._streams:
+            return []
+        return [
+            json.loads(e.data)["notification_id"]
+            for e in self.client._streams[stream_name]
+        ]
+
+    def wait_for_checkpoints(self, expected: list[int]) -> None:
+        deadline = monotonic() + 5
+        while self.read_checkpoints() != expected and monotonic() < deadline:
+            sleep(0.01)
+        self.assertEqual(self.read_checkpoints(), expected)
+
+    def test_insert_tracking(self) -> None:
+        self.assertIsNone(self.recorder.max_tracking_id("upstream"))
+        self.recorder.insert_tracking(Tracking("upstream", 10))
+        self.assertEqual(self.recorder.max_tracking_id("upstream"), 10)
+        self.assertTrue(self.recorder.has_tracking_id("upstream", 10))
+        self.assertFalse(self.recorder.has_tracking_id("upstream", 11))
+        with self.assertRaises(IntegrityError):
+            self.recorder.insert_tracking(Tracking("upstream", 10))
+        with self.assertRaises(IntegrityError):
+            self.recorder.insert_tracking(Tracking("upstream", 9))
+
+    def test_checkpoints_are_written_every_n_tracking_objects(self) -> None:
+        for notification_id in range(1, 4):
+            self.assertEqual(self.read_checkpoints(), [])
+            self.recorder.insert_tracking(Tracking("upstream", notification_id))
+        self.wait_for_checkpoints([3])
+        for notification_id in range(4, 7):
+            self.recorder.insert_tracking(Tracking("upstream", notification_id))
+        self.wait_for_checkpoints([3, 6])
+        self.assertEqual(self.client.calls["set_stream_metadata"], 1)
+        stream_name = self.recorder.create_tracking_stream_name("upstream")
+        self.assertEqual(
+            self.client.get_stream_metadata(stream_name)[0], {"$maxCount": 10}
+        )
+
+    def test_checkpoints_are_written_after_interval_ms(self) -> None:
+        self.recorder.close()
+        self.recorder = self.construct_recorder(
+            checkpoint_interval=100, checkpoint_interval_ms=50
+        )
+        self.recorder.insert_tracking(Tracking("upstream", 1))
+        self.recorder.insert_tracking(Tracking("upstream", 2))
+        self.wait_for_checkpoints([2])
+
+    def test_flush_and_close(self) -> None:
+        self.recorder.insert_tracking(Tracking("upstream", 1))
+        self.recorder.flush()
+        self.assertEqual(self.read_checkpoints(), [1])
+        self.recorder.insert_tracking(Tracking("upstream", 2))
+        self.recorder.close()
+        self.assertEqual(self.read_checkpoints(), [1, 2])
+
+        # Checkpoints are written when tracking objects are inserted after close.
+        self.recorder.insert_tracking(Tracking("upstream", 3))
+        self.assertEqual(self.read_checkpoints(), [1, 2, 3])
+
+    def test_checkpoints_are_written_again_after_error(self) -> None:
+        original_append_events = self.client.append_events
+
+        def append_events(*_: Any, **__: Any) -> int:
+            self.client.append_events = original_append_events  # type: ignore[method-assign]
+            msg = "Connection lost"
+            raise ConnectionError(msg)
+
+        self.client.append_events = append_events  # type: ignore[method-assign]
+        self.recorder.insert_tracking(Tracking("upstream", 1))
+        with self.assertRaises(PersistenceError):
+            self.recorder.flush()
+        self.recorder.insert_tracking(Tracking("upstream", 2))
+        self.recorder.flush()
+        self.assertEqual(self.read_checkpoints(), [2])
+
+    def test_max_tracking_id_is_read_from_last_checkpoint(self) -> None:
+        for notification_id in range(1, 31):
+            self.recorder.insert_tracking(Tracking("upstream", notification_id))
+        self.recorder.close()
+
+        recorder = self.construct_recorder(checkpoint_max_count=2)
+        self.assertEqual(recorder.max_tracking_id("upstream"), 30)
+        with self.assertRaises(IntegrityError):
+            recorder.insert_tracking(Tracking("upstream", 30))
+        recorder.insert_tracking(Tracking("upstream", 31))
+        recorder.close()
+
+        # The stream is truncated by its max count.
+        self.client.reset_calls()
+        recorder = self.construct_recorder()
+        self.assertEqual(recorder.max_tracking_id("upstream"), 31)
+        self.assertEqual(self.client.round_trips, 1)
+        stream_name = recorder.create_tracking_stream_name("upstream")
+        self.assertEqual(len(list(self.client.read_stream(stream_name))), 2)
+
+    def test_checkpoints_are_not_notifications(self) -> None:
+        application_recorder = KurrentDBApplicationRecorder(
+            self.client  # type: ignore[arg-type]
+        )
+        self.recorder.insert_tracking(Tracking("upstream", 1))
+        self.recorder.flush()
+        self.assertEqual(application_recorder.select_notifications(None, 10), [])
+        self.assertEqual(application_recorder.max_notification_id(), 0)
+
+    def test_wait(self) -> None:
+        self.recorder.wait("upstream", None)
+        with self.assertRaises(TimeoutError):
+            self.recorder.wait("upstream", 1, timeout=0.05)
+
+        interrupt = Event()
+        interrupt.set()
+        with self.assertRaises(WaitInterruptedError):
+            self.recorder.wait("upstream", 1, interrupt=interrupt)
+
+        # Waiting threads are woken when a tracking object is inserted.
+        timer = Timer(0.05, self.recorder.insert_tracking, [Tracking("upstream", 1)])
+        timer.start()
+        started = monotonic()
+        self.recorder.wait("upstream", 1, timeout=5)
+        self.assertLess(monotonic() - started, 0.1)
+        timer.join()
+
+        # Tracking objects recorded by other recorders are read from the stream.
+        self.recorder.flush()
+        recorder = self.construct_recorder()
+        recorder.wait("upstream", 1, timeout=0)
+
+
+class TestFactoryTrackingRecorder(TestCase):
+    def test_env_vars(self) -> None:
+        env = Environment("Projection")
+        env[InfrastructureFactory.PERSISTENCE_MODULE] = KurrentDBFactory.__module__
+        env[KurrentDBFactory.KURRENTDB_URI] = INSECURE_CONNECTION_STRING
+        factory = KurrentDBFactory(env)
+        recorder: KurrentDBTrackingRecorder = factory.tracking_recorder()
+        self.assertEqual(recorder.name, "Projection")
+        self.assertEqual(recorder.checkpoint_interval, 100)
+        self.assertEqual(recorder.checkpoint_interval_ms, 1000)
+        self.assertEqual(recorder.checkpoint_max_count, 10)
+        factory.close()
+
+        env[KurrentDBFactory.KURRENTDB_CHECKPOINT_INTERVAL] = "10"
+        env[KurrentDBFactory.KURRENTDB_CHECKPOINT_INTERVAL_MS] = "200"
+        env[KurrentDBFactory.KURRENTDB_CHECKPOINT_MAX_COUNT] = "5"
+        factory = KurrentDBFactory(env)
+        recorder = factory.tracking_recorder()
+        self.assertEqual(recorder.checkpoint_interval, 10)
+        self.assertEqual(recorder.checkpoint_interval_ms, 200)
+        self.assertEqual(recorder.checkpoint_max_count, 5)
+
+        # Pending checkpoints are written when the factory is closed.
+        client = FakeKurrentDBClient()
+        recorder.client = client  # type: ignore[assignment]
+        recorder.insert_tracking(Tracking("upstream", 1))
+        factory.close()
+        self.assertEqual(recorder.max_tracking_id("upstream"), 1)
+        self.assertEqual(client.calls["append_events"], 1)
+
+
+del TrackingRecorderTestCase